@@ -1,14 +1,16 @@
 from pathlib import Path
 import numpy as np
 
+from src.QDSim.storage import load_diagram
 from src.utilities.clock import Clock
 
 
 class QDSimulator:
 
     def __init__(self, path: Path):
-        # Load the np.tensor from the path
-        self.__diagram = np.loadtxt(path)
+        # Open the np.tensor from the path, the storage backend is chosen by the path suffix
+        # (.txt, .npy, .bin/.raw or .chunks), see the storage module
+        self.__diagram = load_diagram(path)
 
     def get_shape(self):
         return self.__diagram.shape
@@ -17,4 +19,19 @@ class QDSimulator:
         return str(self.__diagram)
 
     def sample(self, indexes: tuple, clock: Clock = None) -> float:
+        if clock is not None:
+            clock.record((indexes,), self.__diagram.shape)
         return self.__diagram[tuple(indexes)]
+
+    def sample_many(self, indices: np.ndarray, clock: Clock = None) -> np.ndarray:
+        """
+        Sample a batch of points at once with numpy fancy indexing.
+
+        :param indices: integer array of shape (N, d), one row of coordinates per point
+        :param clock: optional clock, the request is recorded on it
+        :return: array of shape (N,) with the CSD values at the given coordinates
+        """
+        indices = np.asarray(indices, dtype=np.intp).reshape(-1, len(self.__diagram.shape))
+        if clock is not None:
+            clock.record(indices, self.__diagram.shape)
+        return self.__diagram[tuple(indices.T)]
@@ -0,0 +1,222 @@
+"""
+Analytic Charge Stability Diagrams (CSD), computed on demand instead of rasterized to a file.
+
+The constant-interaction model of N quantum dots, with e = 1, gives the electrostatic energy of the charge state n,
+the integer number of electrons of each dot, at the gate voltages V:
+    U(n, V) = 1/2 (n - C_g V)^T C^-1 (n - C_g V)
+where C is the N x N capacitance matrix of the dots, their total capacitances on the diagonal and the opposite of their
+mutual capacitances off the diagonal, and C_g the N x d gate capacitance matrix, the lever arms of the d gates.
+The ground state is the charge state of lowest energy, and the transition lines are the boundaries between the regions
+of the voltage space with different ground states.
+
+The energy difference of two charge states is linear in V, so the boundary between them is a hyperplane, and the
+distance of a point to it, in pixels, is the energy difference divided by the norm of its gradient.
+As in the generator module, a point belongs to a transition line if its distance to the nearest boundary of its ground
+state region is less than half the line width, and the CSD values are 1 on the transition lines plus an absolute
+gaussian noise. The noise of a point is a hash of its index and of the seed, so a point always has the same value.
+
+Only the sampled points are evaluated, in vectorized batches, so a high dimensional diagram never needs to fit in
+memory or on disk.
+"""
+
+import itertools
+import math
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+from src.utilities.clock import Clock
+
+
+def hash_uniform(flat: np.ndarray, seed: int) -> np.ndarray:
+    """
+    :param flat: an integer array, e.g. the linear indexes of some points
+    :param seed: the seed of the hash
+    :return: a deterministic uniform number in (0, 1) for each value, the splitmix64 hash of the value and the seed
+    """
+    with np.errstate(over='ignore'):
+        z = np.asarray(flat, dtype=np.uint64) + np.uint64(seed) * np.uint64(0x9e3779b97f4a7c15)
+        z = (z ^ (z >> np.uint64(30))) * np.uint64(0xbf58476d1ce4e5b9)
+        z = (z ^ (z >> np.uint64(27))) * np.uint64(0x94d049bb133111eb)
+        z = z ^ (z >> np.uint64(31))
+    return ((z >> np.uint64(11)).astype(float) + 0.5) / 2 ** 53
+
+
+class ConstantInteractionSimulator:
+    """
+    A simulator computing the CSD of the constant-interaction model on demand, see the analyticSimulator module.
+
+    It implements the get_shape, sample and sample_many interface of the QDSimulator, so a Flooder can run on it.
+    The computed values can be memoized tile by tile: the first sample of a tile computes the whole tile,
+    which pays off for the floods, whose samples are close to each other.
+    An artificial latency per request and per computed point lets it stand in for an expensive external simulator.
+    """
+
+    def __init__(self, shape: tuple, capacitance: np.ndarray = None, gates: np.ndarray = None, v_min=0.0, v_max=4.0,
+                 width: float = 1.0, noise: float = 0.1, seed: int = 0, reach: int = 1, tile=None,
+                 cache_tiles: int = 64, latency: float = 0.0, per_sample_latency: float = 0.0, chunk: int = 2 ** 14):
+        """
+        :param shape: the dimensions of the diagram, one per gate, in pixels
+        :param capacitance: the N x N capacitance matrix of the dots, in units of e / V,
+            defaults to one dot per gate with unit total capacitances and mutual capacitances of 0.2
+        :param gates: the N x d gate capacitance matrix, defaults to the identity, one plunger gate per dot
+        :param v_min: the voltage of the first pixel, a vector or a scalar for all the gates
+        :param v_max: the voltage of the last pixel, a vector or a scalar for all the gates
+        :param width: the width of the transition lines, in pixels
+        :param noise: the standard deviation of the absolute gaussian noise
+        :param seed: the seed of the noise
+        :param reach: the charge states searched for the ground state are the ones within reach electrons of the
+            induced charges C_g V on each dot, 1 is exact unless the mutual capacitances are large
+        :param tile: if given, the shape of the tiles memoized, or their edge length in all the dimensions
+        :param cache_tiles: the maximum number of tiles memoized, the least recently used one is evicted
+        :param latency: the artificial latency of a request, in seconds
+        :param per_sample_latency: the artificial latency of each computed point, in seconds
+        :param chunk: the number of points computed at once, bounds the memory
+        """
+        self.shape = tuple(int(s) for s in shape)
+        dimension = len(self.shape)
+        self.gates = np.eye(dimension) if gates is None else np.asarray(gates, dtype=float)
+        dots = self.gates.shape[0]
+        if capacitance is None:
+            capacitance = np.eye(dots) - 0.2 * (np.ones((dots, dots)) - np.eye(dots))
+        self.capacitance = np.asarray(capacitance, dtype=float)
+        if self.gates.shape != (dots, dimension) or self.capacitance.shape != (dots, dots):
+            raise ValueError('Expected a capacitance matrix of shape ' + str((dots, dots)) + ' and a gate matrix of shape '
+                             + str((dots, dimension)) + ', got ' + str(self.capacitance.shape) + ' and '
+                             + str(self.gates.shape))
+        self.inverse = np.linalg.inv(self.capacitance)
+        v_min = np.broadcast_to(np.asarray(v_min, dtype=float), (dimension,))
+        v_max = np.broadcast_to(np.asarray(v_max, dtype=float), (dimension,))
+        self.v_min = v_min
+        self.step = (v_max - v_min) / np.maximum(np.array(self.shape) - 1, 1)
+        self.width = width
+        self.noise = noise
+        self.seed = seed
+        # the charge states around the floor of the induced charges
+        self.offsets = np.array(list(itertools.product(range(1 - reach, 1 + reach), repeat=dots)), dtype=float)
+        self.__offset_energies = 0.5 * np.sum(self.offsets @ self.inverse * self.offsets, axis=1)
+        # the energy difference of two charge states is linear in the pixel coordinates, the norm of its gradient
+        # only depends on the difference of their offsets
+        differences = self.offsets[None, :, :] - self.offsets[:, None, :]
+        self.__gradient_norms = np.linalg.norm(differences @ self.inverse @ self.gates * self.step, axis=-1)
+        np.fill_diagonal(self.__gradient_norms, 1)
+        self.tile = None if tile is None else tuple(np.broadcast_to(np.asarray(tile, dtype=np.intp), (dimension,)))
+        self.cache_tiles = cache_tiles
+        self.latency = latency
+        self.per_sample_latency = per_sample_latency
+        self.chunk = chunk
+        self.requests = 0
+        self.evaluated = 0
+        self.__tiles = OrderedDict()
+
+    def get_shape(self):
+        return self.shape
+
+    def __str__(self):
+        return 'ConstantInteractionSimulator(shape=' + str(self.shape) + ', dots=' + str(len(self.capacitance)) + ')'
+
+    def voltages(self, indices: np.ndarray) -> np.ndarray:
+        """
+        :param indices: integer array of shape (N, d)
+        :return: the gate voltages of the points, an array of shape (N, d)
+        """
+        return self.v_min + indices * self.step
+
+    def ground_states(self, indices: np.ndarray) -> tuple:
+        """
+        :param indices: integer array of shape (N, d)
+        :return: the ground state of each point, an integer array of shape (N, dots),
+            and the distance of each point to the nearest boundary of its ground state region, in pixels
+        """
+        induced = self.voltages(indices) @ self.gates.T
+        floor = np.floor(induced)
+        # the energies of the charge states floor + offsets, up to the term 1/2 r^T C^-1 r common to all of them,
+        # with r = floor - induced
+        energies = (floor - induced) @ self.inverse @ self.offsets.T + self.__offset_energies
+        energies[np.any(floor[:, None, :] + self.offsets[None, :, :] < 0, axis=-1)] = np.inf
+        rows = np.arange(len(indices))
+        ground = np.argmin(energies, axis=1)
+        distances = (energies - energies[rows, ground][:, None]) / self.__gradient_norms[ground]
+        distances[rows, ground] = np.inf
+        return (floor + self.offsets[ground]).astype(np.intp), np.min(distances, axis=1)
+
+    def evaluate(self, indices: np.ndarray) -> np.ndarray:
+        """
+        Compute the CSD values of some points, without the cache and the latency.
+
+        :param indices: integer array of shape (N, d)
+        :return: array of shape (N,) with the CSD values
+        """
+        values = np.empty(len(indices))
+        for start in range(0, len(indices), self.chunk):
+            batch = indices[start:start + self.chunk]
+            _, distances = self.ground_states(batch)
+            values[start:start + self.chunk] = distances < self.width / 2
+        if self.noise > 0:
+            # the Box-Muller transform of two hashes of the linear index
+            flat = np.ravel_multi_index(tuple(indices.T), self.shape)
+            radius = np.sqrt(-2 * np.log(hash_uniform(flat, self.seed)))
+            angle = 2 * np.pi * hash_uniform(flat, self.seed + 1)
+            values += np.around(abs(self.noise * radius * np.cos(angle)), decimals=2)
+        return values
+
+    def compute(self, indices: np.ndarray) -> np.ndarray:
+        """
+        Compute the CSD values of some points, paying the artificial latency of a request and of each computed point.
+        """
+        self.requests += 1
+        self.evaluated += len(indices)
+        if self.latency or self.per_sample_latency:
+            time.sleep(self.latency + self.per_sample_latency * len(indices))
+        return self.evaluate(indices)
+
+    def sample(self, indexes: tuple, clock: Clock = None) -> float:
+        return float(self.sample_many(np.array([indexes]), clock)[0])
+
+    def sample_many(self, indices: np.ndarray, clock: Clock = None) -> np.ndarray:
+        """
+        Sample a batch of points, computing them or their tiles on demand.
+
+        :param indices: integer array of shape (N, d), one row of coordinates per point
+        :param clock: optional clock, the request is recorded on it
+        :return: array of shape (N,) with the CSD values at the given coordinates
+        """
+        indices = np.asarray(indices, dtype=np.intp).reshape(-1, len(self.shape))
+        if np.any((indices < 0) | (indices >= self.shape)):
+            raise IndexError('Index out of bounds for shape ' + str(self.shape))
+        if clock is not None:
+            clock.record(indices, self.shape)
+        if self.tile is None:
+            return self.compute(indices)
+
+        grid = tuple(math.ceil(s / t) for s, t in zip(self.shape, self.tile))
+        tiles = np.ravel_multi_index(tuple((indices // self.tile).T), grid)
+        local = indices % self.tile
+        values = np.empty(len(indices))
+        missing = [tile for tile in np.unique(tiles).tolist() if tile not in self.__tiles]
+        if missing:
+            # compute all the missing tiles with a single request
+            blocks = []
+            for tile in missing:
+                corner = np.array(np.unravel_index(tile, grid)) * self.tile
+                block = tuple(min(t, s - c) for t, s, c in zip(self.tile, self.shape, corner))
+                blocks.append((tile, block, corner + np.argwhere(np.ones(block, dtype=bool))))
+            computed = self.compute(np.concatenate([points for _, _, points in blocks]))
+            start = 0
+            for tile, block, points in blocks:
+                self.__tiles[tile] = computed[start:start + len(points)].reshape(block)
+                start += len(points)
+        for tile in np.unique(tiles).tolist():
+            self.__tiles.move_to_end(tile)
+            selected = tiles == tile
+            values[selected] = self.__tiles[tile][tuple(local[selected].T)]
+        while len(self.__tiles) > self.cache_tiles:
+            self.__tiles.popitem(last=False)
+        return values
+
+    def rasterize(self) -> np.ndarray:
+        """
+        :return: the whole diagram, computed without the cache and the latency, e.g. to save it with the storage module
+        """
+        return self.evaluate(np.argwhere(np.ones(self.shape, dtype=bool))).reshape(self.shape)
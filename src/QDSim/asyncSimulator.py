@@ -0,0 +1,84 @@
+import asyncio
+import time
+from typing import Protocol
+
+import numpy as np
+
+from src.QDSim.QDSimulator import QDSimulator
+from src.utilities.clock import Clock
+
+
+class AsyncSimulator(Protocol):
+    """
+    The interface of a simulator, or instrument, answering the sample requests asynchronously.
+    Many requests can be in flight at the same time.
+    """
+
+    def get_shape(self) -> tuple:
+        ...
+
+    async def sample_many(self, indices: np.ndarray, clock: Clock = None) -> np.ndarray:
+        ...
+
+
+class LatencySimulator:
+    """
+    A local stand-in for a slow simulator: it wraps a QDSimulator and blocks for an artificial latency on every request,
+    so the synchronous floods can be measured against a high-latency simulator.
+
+    A request costs latency + per_sample_latency * (number of sampled points) seconds.
+    """
+
+    def __init__(self, sim: QDSimulator, latency: float = 1e-3, per_sample_latency: float = 0.0):
+        self.sim = sim
+        self.latency = latency
+        self.per_sample_latency = per_sample_latency
+        self.requests = 0
+        self.samples = 0
+
+    def get_shape(self):
+        return self.sim.get_shape()
+
+    def sample(self, indexes: tuple, clock: Clock = None) -> float:
+        self.requests += 1
+        self.samples += 1
+        time.sleep(self.latency + self.per_sample_latency)
+        return self.sim.sample(indexes, clock)
+
+    def sample_many(self, indices: np.ndarray, clock: Clock = None) -> np.ndarray:
+        self.requests += 1
+        self.samples += len(indices)
+        time.sleep(self.latency + self.per_sample_latency * len(indices))
+        return self.sim.sample_many(indices, clock)
+
+
+class AsyncLatencySimulator:
+    """
+    The asynchronous version of LatencySimulator: a request awaits its artificial latency without blocking,
+    so concurrent requests overlap like the requests to a remote simulator or instrument.
+
+    It records the number of requests, of sampled points, and the highest number of requests in flight at the same time.
+    """
+
+    def __init__(self, sim: QDSimulator, latency: float = 1e-3, per_sample_latency: float = 0.0):
+        self.sim = sim
+        self.latency = latency
+        self.per_sample_latency = per_sample_latency
+        self.requests = 0
+        self.samples = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    def get_shape(self):
+        return self.sim.get_shape()
+
+    async def sample_many(self, indices: np.ndarray, clock: Clock = None) -> np.ndarray:
+        self.requests += 1
+        self.samples += len(indices)
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            await asyncio.sleep(self.latency + self.per_sample_latency * len(indices))
+            return self.sim.sample_many(indices, clock)
+        finally:
+            self.in_flight -= 1
@@ -0,0 +1,132 @@
+"""
+Synthetic N-dimensional Charge Stability Diagrams (CSD).
+
+The transition lines of a CSD are the boundaries between the cells of a lattice:
+- a square grid is the tiling of the space with cubes, the Voronoi cells of the lattice L * Z^d
+- a honeycomb is the tiling with the Voronoi cells of a lattice whose basis vectors are at 60 degrees from each other,
+  hexagons in 2-d, which generalizes to d dimensions with the A_d root lattice.
+
+As in the README, a grid is parametrized by its edge length L, its intercept vector I and its tilt vector Theta,
+the d(d-1)/2 rotation angles in each plane of the space.
+A point belongs to a transition line if its distance to the nearest cell boundary is less than half the line width.
+"""
+
+import argparse
+import itertools
+import math
+from pathlib import Path
+
+import numpy as np
+
+from src.QDSim.storage import save_diagram
+
+KINDS = ('square', 'honeycomb')
+
+
+def rotation(dimension: int, tilt=0.0) -> np.ndarray:
+    """
+    :param dimension: the number of dimensions d of the space
+    :param tilt: the d(d-1)/2 rotation angles in radians, in the planes (0, 1), (0, 2), ..., (d-2, d-1),
+        or a single angle for all the planes
+    :return: the d x d rotation matrix, the product of the rotations in each plane
+    """
+    planes = list(itertools.combinations(range(dimension), 2))
+    angles = np.broadcast_to(np.asarray(tilt, dtype=float), (len(planes),))
+    matrix = np.eye(dimension)
+    for (i, j), angle in zip(planes, angles):
+        givens = np.eye(dimension)
+        givens[[i, j], [i, j]] = math.cos(angle)
+        givens[i, j] = -math.sin(angle)
+        givens[j, i] = math.sin(angle)
+        matrix = givens @ matrix
+    return matrix
+
+
+def lattice_basis(kind: str, dimension: int, edge: float, tilt=0.0) -> np.ndarray:
+    """
+    :param kind: 'square' or 'honeycomb'
+    :param dimension: the number of dimensions d of the space
+    :param edge: the distance between the centers of two neighbor cells, in pixels
+    :param tilt: the rotation angles of the grid, see rotation
+    :return: a d x d matrix whose columns are the basis vectors of the lattice
+    """
+    if kind == 'square':
+        basis = np.eye(dimension)
+    elif kind == 'honeycomb':
+        # the Gram matrix of the A_d root lattice: unit vectors at 60 degrees from each other
+        basis = np.linalg.cholesky(np.full((dimension, dimension), 0.5) + 0.5 * np.eye(dimension)).T
+    else:
+        raise ValueError('Unknown grid kind ' + str(kind) + ', expected one of ' + str(KINDS))
+    return rotation(dimension, tilt) @ (edge * basis)
+
+
+def grid_lines(shape: tuple, basis: np.ndarray, intercept=0.0, width: float = 1.0, chunk: int = 2 ** 14) -> np.ndarray:
+    """
+    Rasterize the boundaries of the Voronoi cells of a lattice.
+
+    :param shape: the dimensions of the diagram
+    :param basis: the lattice basis, see lattice_basis
+    :param intercept: the position of a lattice point, a vector or a scalar for all the dimensions
+    :param width: the width of the transition lines, in pixels
+    :param chunk: the number of points evaluated at once, bounds the memory
+    :return: a boolean array of the given shape, True on the transition lines
+    """
+    dimension = len(shape)
+    intercept = np.broadcast_to(np.asarray(intercept, dtype=float), (dimension,))
+    inverse = np.linalg.inv(basis)
+    # the lattice points around the rounded fractional coordinates of a point
+    neighbors = np.array(list(itertools.product([-1, 0, 1], repeat=dimension)), dtype=float)
+    lines = np.zeros(math.prod(shape), dtype=bool)
+    for start in range(0, len(lines), chunk):
+        flat = np.arange(start, min(start + chunk, len(lines)))
+        points = np.stack(np.unravel_index(flat, shape), axis=-1) - intercept
+        cells = np.rint(points @ inverse.T)[:, None, :] + neighbors[None, :, :]
+        centers = cells @ basis.T
+        distances = np.sum((points[:, None, :] - centers) ** 2, axis=-1)
+        nearest = np.argmin(distances, axis=1)
+        rows = np.arange(len(points))
+        # the distance to the bisector hyperplane between the nearest center and each other center
+        spacing = np.linalg.norm(centers - centers[rows, nearest][:, None, :], axis=-1)
+        spacing[rows, nearest] = 1
+        boundary = (distances - distances[rows, nearest][:, None]) / (2 * spacing)
+        boundary[rows, nearest] = np.inf
+        lines[flat] = np.min(boundary, axis=1) < width / 2
+    return lines.reshape(shape)
+
+
+def generate(kind: str = 'honeycomb', dimension: int = 2, size: int = 64, edge: float = 16.0, tilt=0.0,
+             intercept=0.0, width: float = 1.0, noise: float = 0.1, seed: int = None) -> np.ndarray:
+    """
+    Generate a synthetic CSD, with transition lines of intensity 1 and gaussian noise, like the test1 diagram.
+
+    :param kind: 'square' or 'honeycomb'
+    :param dimension: the number of dimensions d of the diagram
+    :param size: the sensitivity s of each dimension, the diagram has s^d points
+    :param edge: the distance between the centers of two neighbor cells, in pixels
+    :param tilt: the rotation angles of the grid, see rotation
+    :param intercept: the position of a cell center, a vector or a scalar for all the dimensions
+    :param width: the width of the transition lines, in pixels
+    :param noise: the standard deviation of the absolute gaussian noise
+    :param seed: the seed of the noise
+    :return: the diagram, an array of shape (size,) * dimension
+    """
+    shape = (size,) * dimension
+    lines = grid_lines(shape, lattice_basis(kind, dimension, edge, tilt), intercept, width)
+    rng = np.random.default_rng(seed)
+    return lines + np.around(abs(rng.normal(0, noise, shape)), decimals=2)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Generate a synthetic CSD and save it to a file.')
+    parser.add_argument('destination', type=Path, help='the diagram file, .npy, .bin, .raw, .chunks or .txt (2-d only)')
+    parser.add_argument('--kind', choices=KINDS, default='honeycomb')
+    parser.add_argument('--dimension', type=int, default=2)
+    parser.add_argument('--size', type=int, default=64)
+    parser.add_argument('--edge', type=float, default=16.0)
+    parser.add_argument('--tilt', type=float, nargs='+', default=[0.0])
+    parser.add_argument('--width', type=float, default=1.0)
+    parser.add_argument('--noise', type=float, default=0.1)
+    parser.add_argument('--seed', type=int, default=None)
+    args = parser.parse_args()
+    save_diagram(generate(args.kind, args.dimension, args.size, args.edge, args.tilt, 0.0, args.width, args.noise,
+                          args.seed), args.destination)
@@ -0,0 +1,122 @@
+from collections import OrderedDict
+
+import numpy as np
+
+from src.QDSim.QDSimulator import QDSimulator
+from src.utilities.clock import Clock
+
+
+class SampleCache:
+    """
+    This class memoizes the samples of a simulator, so that a point sampled many times, e.g. as the neighbor of many
+    transition line points during a flood, queries the simulator only once.
+
+    The cache stores the raw CSD values, so it stays valid if the rectification threshold changes.
+    Its memory is bounded: when more than maxsize points are stored, the least recently used ones are evicted.
+    It exposes the same get_shape, sample and sample_many interface as the simulator, so it can be used in its place.
+    """
+
+    def __init__(self, sim: QDSimulator, maxsize: int = 2 ** 20):
+        if maxsize <= 0:
+            raise ValueError('The cache size must be a positive integer')
+        self.sim = sim
+        self.maxsize = maxsize
+        self.__values = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        # if it is a list, the samples stored in the cache are also appended to it, e.g. to checkpoint them
+        self.journal = None
+
+    def __len__(self):
+        return len(self.__values)
+
+    def get_shape(self):
+        return self.sim.get_shape()
+
+    def __store(self, key: tuple, value: float):
+        self.__values[key] = value
+        if self.journal is not None:
+            self.journal.append((key, value))
+        if len(self.__values) > self.maxsize:
+            self.__values.popitem(last=False)
+            self.evictions += 1
+
+    def sample(self, indexes: tuple, clock: Clock = None) -> float:
+        """
+        Sample a point, querying the simulator only if the point is not in the cache.
+        The clock is passed to the simulator, so it only counts the actual queries.
+        """
+        key = tuple(int(i) for i in indexes)
+        if key in self.__values:
+            self.hits += 1
+            self.__values.move_to_end(key)
+            return self.__values[key]
+        self.misses += 1
+        value = self.sim.sample(key, clock)
+        self.__store(key, value)
+        return value
+
+    def sample_many(self, indices: np.ndarray, clock: Clock = None) -> np.ndarray:
+        """
+        Sample a batch of points, the points missing from the cache are queried with a single bulk call to the simulator.
+
+        :param indices: integer array of shape (N, d), one row of coordinates per point
+        :param clock: optional clock, passed to the simulator
+        :return: array of shape (N,) with the CSD values at the given coordinates
+        """
+        indices = np.asarray(indices, dtype=np.intp).reshape(-1, len(self.get_shape()))
+        keys = list(map(tuple, indices.tolist()))
+        values = np.empty(len(keys))
+        missing = []
+        for i, key in enumerate(keys):
+            if key in self.__values:
+                self.__values.move_to_end(key)
+                values[i] = self.__values[key]
+            else:
+                missing.append(i)
+        # a point can appear more than once in the batch, the simulator is queried only once per point
+        unique = dict.fromkeys(keys[i] for i in missing)
+        if unique:
+            sampled = self.sim.sample_many(np.array(list(unique), dtype=np.intp), clock)
+            for key, value in zip(unique, sampled.tolist()):
+                unique[key] = value
+                self.__store(key, value)
+            values[missing] = [unique[keys[i]] for i in missing]
+        self.misses += len(unique)
+        self.hits += len(keys) - len(unique)
+        return values
+
+    def load(self, indices: np.ndarray, values: np.ndarray):
+        """
+        Store samples in the cache without querying the simulator, e.g. the samples of a checkpoint.
+
+        :param indices: integer array of shape (N, d), one row of coordinates per point
+        :param values: array of shape (N,) with the CSD values at the given coordinates
+        """
+        indices = np.asarray(indices, dtype=np.intp).reshape(-1, len(self.get_shape()))
+        for key, value in zip(map(tuple, indices.tolist()), np.asarray(values).tolist()):
+            self.__store(key, value)
+
+    def stats(self) -> dict:
+        """
+        :return: a dict with the hit, miss and eviction counters, the hit rate and the current size of the cache
+        """
+        total = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'hit_rate': self.hits / total if total else 0.0,
+            'size': len(self.__values),
+            'maxsize': self.maxsize,
+        }
+
+    def clear(self):
+        """
+        Empty the cache and reset its counters.
+        """
+        self.__values.clear()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
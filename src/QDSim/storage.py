@@ -0,0 +1,201 @@
+"""
+Storage backends for the Charge Stability Diagrams (CSD) of the QDSim library.
+
+A CSD can be stored as:
+- a text file (.txt), parsed with np.loadtxt. This is the original library format, it is slow and only supports 2-d.
+- a numpy file (.npy), opened with mmap_mode so only the pages that are sampled are read from disk.
+- a raw binary file (.bin or .raw), next to a JSON header (e.g. diagram.bin.json) holding its shape and dtype,
+  opened with np.memmap.
+- a chunked directory (.chunks), holding an index.json header and one .npy file per chunk of the N-d diagram.
+  The chunks are opened lazily, the first time one of their points is sampled.
+
+Except for the text format, opening a diagram is O(1) and does not depend on its size.
+"""
+
+import argparse
+import itertools
+import json
+import math
+from pathlib import Path
+
+import numpy as np
+
+RAW_SUFFIXES = ('.bin', '.raw')
+CHUNKED_SUFFIX = '.chunks'
+CHUNKED_INDEX = 'index.json'
+
+
+def raw_header_path(path: Path) -> Path:
+    """
+    :return: the path of the JSON header describing the raw binary file at path
+    """
+    path = Path(path)
+    return path.with_name(path.name + '.json')
+
+
+class ChunkedArray:
+    """
+    A read-only N-d array split in regular chunks, each chunk stored in its own .npy file.
+    It supports the integer and integer array indexing used by the simulator, a chunk is memory-mapped only
+    when one of its points is accessed.
+    """
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        with open(self.path / CHUNKED_INDEX) as f:
+            index = json.load(f)
+        self.shape = tuple(index['shape'])
+        self.chunks = tuple(index['chunks'])
+        self.dtype = np.dtype(index['dtype'])
+        self.ndim = len(self.shape)
+        self.__grid = tuple(math.ceil(s / c) for s, c in zip(self.shape, self.chunks))
+        self.__opened = dict()
+
+    @staticmethod
+    def chunk_name(chunk: tuple) -> str:
+        return '_'.join(str(c) for c in chunk) + '.npy'
+
+    def __chunk(self, chunk: tuple) -> np.ndarray:
+        if chunk not in self.__opened:
+            self.__opened[chunk] = np.load(self.path / self.chunk_name(chunk), mmap_mode='r')
+        return self.__opened[chunk]
+
+    def opened_chunks(self) -> int:
+        """
+        :return: the number of chunks opened so far
+        """
+        return len(self.__opened)
+
+    def __getitem__(self, indexes: tuple):
+        indexes = tuple(np.asarray(i, dtype=np.intp) for i in indexes)
+        if len(indexes) != self.ndim:
+            raise IndexError('Expected ' + str(self.ndim) + ' indexes, got ' + str(len(indexes)))
+        indexes = np.broadcast_arrays(*indexes)
+        for i, s in zip(indexes, self.shape):
+            if np.any((i < 0) | (i >= s)):
+                raise IndexError('Index out of bounds for shape ' + str(self.shape))
+        if indexes[0].ndim == 0:
+            chunk = tuple(int(i) // c for i, c in zip(indexes, self.chunks))
+            local = tuple(int(i) % c for i, c in zip(indexes, self.chunks))
+            return self.__chunk(chunk)[local]
+
+        # group the points by chunk and read each chunk with a single fancy indexing
+        points = np.stack([i.ravel() for i in indexes], axis=-1)
+        chunk_ids = np.ravel_multi_index(tuple((points // self.chunks).T), self.__grid)
+        values = np.empty(len(points), dtype=self.dtype)
+        for chunk_id in np.unique(chunk_ids):
+            mask = chunk_ids == chunk_id
+            chunk = tuple(int(c) for c in np.unravel_index(chunk_id, self.__grid))
+            values[mask] = self.__chunk(chunk)[tuple((points[mask] % self.chunks).T)]
+        return values.reshape(indexes[0].shape)
+
+    def __array__(self, dtype=None, copy=None):
+        array = np.empty(self.shape, dtype=self.dtype)
+        for chunk in itertools.product(*(range(g) for g in self.__grid)):
+            array[tuple(slice(c * s, (c + 1) * s) for c, s in zip(chunk, self.chunks))] = self.__chunk(chunk)
+        return array if dtype is None else array.astype(dtype)
+
+    def __str__(self):
+        return 'ChunkedArray(shape=' + str(self.shape) + ', chunks=' + str(self.chunks) + ', dtype=' + str(self.dtype) + ')'
+
+
+def load_diagram(path: Path):
+    """
+    Open a diagram, the storage backend is chosen by the path suffix.
+
+    :param path: the path of the diagram
+    :return: an array-like supporting the .shape attribute and integer (array) indexing
+    """
+    path = Path(path)
+    suffix = path.suffix.lower()
+    if suffix == '.npy':
+        return np.load(path, mmap_mode='r')
+    if suffix in RAW_SUFFIXES:
+        with open(raw_header_path(path)) as f:
+            header = json.load(f)
+        return np.memmap(path, dtype=np.dtype(header['dtype']), mode='r', shape=tuple(header['shape']),
+                         order=header.get('order', 'C'))
+    if suffix == CHUNKED_SUFFIX or path.is_dir():
+        return ChunkedArray(path)
+    # default to the text format of the library
+    return np.loadtxt(path)
+
+
+def save_npy(diagram: np.ndarray, path: Path):
+    """
+    Save a diagram as a .npy file, to be opened memory-mapped.
+    """
+    np.save(Path(path), diagram)
+
+
+def save_raw(diagram: np.ndarray, path: Path):
+    """
+    Save a diagram as a raw binary file, with its shape and dtype in a JSON header next to it.
+    """
+    path = Path(path)
+    diagram = np.ascontiguousarray(diagram)
+    diagram.tofile(path)
+    with open(raw_header_path(path), 'w') as f:
+        json.dump({'shape': list(diagram.shape), 'dtype': diagram.dtype.str, 'order': 'C'}, f)
+
+
+def save_chunked(diagram: np.ndarray, path: Path, chunks: tuple = None):
+    """
+    Save a diagram as a directory of .npy chunks, with its shape, chunk shape and dtype in an index.json header.
+
+    :param chunks: the shape of a chunk, defaults to 256 points per dimension
+    """
+    path = Path(path)
+    if chunks is None:
+        chunks = tuple(min(256, s) for s in diagram.shape)
+    if len(chunks) != diagram.ndim:
+        raise ValueError('The chunk shape must have one entry per dimension of the diagram')
+    path.mkdir(parents=True, exist_ok=True)
+    grid = tuple(math.ceil(s / c) for s, c in zip(diagram.shape, chunks))
+    for chunk in itertools.product(*(range(g) for g in grid)):
+        block = diagram[tuple(slice(c * s, (c + 1) * s) for c, s in zip(chunk, chunks))]
+        np.save(path / ChunkedArray.chunk_name(chunk), np.ascontiguousarray(block))
+    with open(path / CHUNKED_INDEX, 'w') as f:
+        json.dump({'shape': list(diagram.shape), 'chunks': list(chunks), 'dtype': diagram.dtype.str}, f)
+
+
+def save_diagram(diagram: np.ndarray, path: Path, chunks: tuple = None):
+    """
+    Save a diagram, the storage format is chosen by the path suffix, like in load_diagram.
+
+    :param diagram: the diagram to save
+    :param path: the path of the saved diagram
+    :param chunks: the shape of a chunk, for the chunked format only
+    """
+    suffix = Path(path).suffix.lower()
+    if suffix == '.npy':
+        save_npy(diagram, path)
+    elif suffix in RAW_SUFFIXES:
+        save_raw(diagram, path)
+    elif suffix == CHUNKED_SUFFIX:
+        save_chunked(diagram, path, chunks)
+    elif suffix == '.txt' and np.ndim(diagram) <= 2:
+        np.savetxt(path, diagram)
+    else:
+        raise ValueError('Unknown format ' + suffix + ', expected .npy, .bin, .raw, .chunks or .txt (2-d only)')
+
+
+def convert(source: Path, destination: Path, chunks: tuple = None):
+    """
+    Convert a diagram from a storage format to another, e.g. from the text format of the library to a .npy file.
+    The destination format is chosen by its suffix, like in load_diagram.
+
+    :param source: the path of the diagram to convert
+    :param destination: the path of the converted diagram
+    :param chunks: the shape of a chunk, for the chunked format only
+    """
+    save_diagram(np.asarray(load_diagram(source)), destination, chunks)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Convert a CSD diagram to another storage format.')
+    parser.add_argument('source', type=Path)
+    parser.add_argument('destination', type=Path)
+    parser.add_argument('--chunks', type=int, nargs='+', default=None, help='the chunk shape of the .chunks format')
+    args = parser.parse_args()
+    convert(args.source, args.destination, tuple(args.chunks) if args.chunks else None)
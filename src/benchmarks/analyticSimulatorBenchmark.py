@@ -0,0 +1,51 @@
+import contextlib
+import io
+import math
+import time
+
+import numpy as np
+
+from src.QDSim.analyticSimulator import ConstantInteractionSimulator
+from src.flooder.flooder import Flooder
+from src.utilities.clock import Clock
+
+# the number of points computed to extrapolate the time of a full raster
+RASTER_SAMPLE = 2 ** 16
+
+
+def raster_time(sim: ConstantInteractionSimulator) -> float:
+    """
+    :return: the time to compute the whole diagram, extrapolated from a sample of points if it is large
+    """
+    volume = math.prod(sim.get_shape())
+    flat = np.random.choice(volume, min(volume, RASTER_SAMPLE), replace=False)
+    start = time.perf_counter()
+    sim.evaluate(np.stack(np.unravel_index(flat, sim.get_shape()), axis=-1))
+    return (time.perf_counter() - start) * volume / len(flat)
+
+
+def run_benchmark(diagrams=((2, 1024), (3, 192), (4, 48)), v_max: float = 2.5, tile: int = 8):
+    """
+    Compare the frontier flood of the constant-interaction simulator, which computes only the sampled points,
+    with the full raster of the diagram that a file backed QDSimulator needs.
+    The voltages range from 0 to v_max on each gate, about v_max electrons per dot, whatever the size of the diagram.
+    """
+    print('diagram        volume   samples  flood s  flood+tiles s  raster s  bCSD')
+    for dimension, size in diagrams:
+        times = []
+        for cached in (None, tile):
+            sim = ConstantInteractionSimulator((size,) * dimension, v_max=v_max, noise=0.05, tile=cached,
+                                               cache_tiles=4096)
+            flooder = Flooder(sim, clock=Clock())
+            np.random.seed(0)
+            start = time.perf_counter()
+            with contextlib.redirect_stdout(io.StringIO()):
+                flooder.run('frontier')
+            times.append(time.perf_counter() - start)
+        name = 'd=' + str(dimension) + ' s=' + str(size)
+        print(f'{name:10s}  {size ** dimension:9d}  {flooder.clock.get_time():8d}  {times[0]:7.2f}  {times[1]:13.2f}  '
+              f'{raster_time(sim):8.2f}  {len(flooder.bCSD)}')
+
+
+if __name__ == '__main__':
+    run_benchmark()
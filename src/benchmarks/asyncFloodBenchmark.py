@@ -0,0 +1,106 @@
+import contextlib
+import io
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+from src.QDSim.QDSimulator import QDSimulator
+from src.QDSim.asyncSimulator import AsyncLatencySimulator, LatencySimulator
+from src.QDSim.generator import generate
+from src.QDSim.storage import save_npy
+from src.benchmarks.floodBenchmark import make_diagram
+from src.flooder.asyncFlooder import AsyncFlooder
+from src.flooder.flooder import Flooder
+from src.utilities.clock import Clock
+
+
+def time_flood(flooder: Flooder, mode: str) -> float:
+    """
+    Seed a flooder with a fixed random state and time its flood phase only.
+    The request and sample counters of a LatencySimulator are reset after the seeding, so they count the flood only.
+
+    :return: the flood time in seconds
+    """
+    np.random.seed(0)
+    with contextlib.redirect_stdout(io.StringIO()):
+        to_process = flooder.random_sampling(flooder.estimate_batch_size())
+        if isinstance(flooder.sim, LatencySimulator):
+            flooder.sim.requests = flooder.sim.samples = 0
+        start = time.perf_counter()
+        flooder.flood_modes()[mode](to_process)
+    return time.perf_counter() - start
+
+
+def run_benchmark(size: int = 200, lines: int = 5, latency: float = 1e-3, per_sample_latency: float = 1e-4,
+                  max_in_flight=(1, 4, 16, 64), batch_size: int = 32):
+    """
+    Compare the synchronous floods with the async flood through a simulator with artificial latency.
+    A request costs latency + per_sample_latency * (number of sampled points) seconds.
+    """
+    np.random.seed(0)
+    print('diagram ' + str(size) + 'x' + str(size) + ', latency ' + str(latency) + ' s + '
+          + str(per_sample_latency) + ' s per sample, batches of ' + str(batch_size))
+    print('flood          tl_points  requests  samples  flood_s  samples/s')
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / 'diagonal.txt'
+        np.savetxt(path, make_diagram(size, lines))
+
+        for mode in ['queue', 'frontier']:
+            flooder = Flooder(path)
+            flooder.sim = LatencySimulator(flooder.sim, latency, per_sample_latency)
+            flood_time = time_flood(flooder, mode)
+            print(f'{mode:13s}  {len(flooder.bCSD):9d}  {flooder.sim.requests:8d}  {flooder.sim.samples:7d}  '
+                  f'{flood_time:7.3f}  {flooder.sim.samples / flood_time:9.0f}')
+            reference = set(flooder.bCSD)
+
+        for n in max_in_flight:
+            async_sim = AsyncLatencySimulator(QDSimulator(path), latency, per_sample_latency)
+            flooder = AsyncFlooder(path, async_sim, max_in_flight=n, batch_size=batch_size)
+            flood_time = time_flood(flooder, 'async')
+            assert set(flooder.bCSD) == reference, 'the async flood disagrees with the synchronous one'
+            print(f'async x{n:<5d}  {len(flooder.bCSD):9d}  {async_sim.requests:8d}  {async_sim.samples:7d}  '
+                  f'{flood_time:7.3f}  {async_sim.samples / flood_time:9.0f}')
+
+
+def run_stream_benchmark(diagrams=(('honeycomb', 2, 512, 128.0), ('honeycomb', 2, 512, 32.0), ('square', 3, 64, 32.0)),
+                         latency: float = 1e-2, per_sample_latency: float = 1e-6, max_in_flight: int = 16,
+                         batch_size: int = 256):
+    """
+    Compare the sequential sampling followed by the async flood with the stream mode, which floods while sampling,
+    through simulators with artificial latency: the time to the first transition line point flooded and the total time.
+    """
+    print('latency ' + str(latency) + ' s + ' + str(per_sample_latency) + ' s per sample, ' + str(max_in_flight)
+          + ' requests of ' + str(batch_size) + ' points in flight')
+    print('diagram                   tl_points  async first_s  async total_s  stream first_s  stream total_s')
+    with tempfile.TemporaryDirectory() as tmp:
+        for kind, dimension, size, edge in diagrams:
+            path = Path(tmp) / 'diagram.npy'
+            save_npy(generate(kind, dimension, size, edge, noise=0.05, seed=0), path)
+            times = []
+            for mode in ('async', 'stream'):
+                async_sim = AsyncLatencySimulator(QDSimulator(path), latency, per_sample_latency)
+                flooder = AsyncFlooder(path, async_sim, max_in_flight=max_in_flight, batch_size=batch_size,
+                                       clock=Clock())
+                flooder.sim = LatencySimulator(flooder.sim, latency, per_sample_latency)
+                np.random.seed(0)
+                start = time.perf_counter()
+                with contextlib.redirect_stdout(io.StringIO()):
+                    flooder.run(mode)
+                total = time.perf_counter() - start
+                # the async flood floods nothing before the end of the sampling phase
+                first = flooder.first_result if mode == 'stream' else \
+                    flooder.clock.phases['random_sampling']['wall_time']
+                times.extend([first, total])
+                if mode == 'async':
+                    reference = set(flooder.bCSD)
+            assert set(flooder.bCSD) == reference, 'the stream flood disagrees with the async one'
+            name = kind + ' d=' + str(dimension) + ' s=' + str(size) + ' L=' + str(edge)
+            print(f'{name:24s}  {len(reference):9d}  {times[0]:13.3f}  {times[1]:13.3f}  {times[2]:14.3f}  '
+                  f'{times[3]:14.3f}')
+
+
+if __name__ == '__main__':
+    run_benchmark()
+    run_stream_benchmark()
@@ -0,0 +1,62 @@
+import contextlib
+import io
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+from src.QDSim.generator import generate
+from src.QDSim.storage import save_npy
+from src.flooder.bCSDFile import BCSDFile
+from src.flooder.flooder import Flooder
+
+
+def list_size(bCSD: list) -> int:
+    """
+    :return: the memory size of a bCSD list of coordinate tuples, in bytes
+    """
+    return sys.getsizeof(bCSD) + sum(sys.getsizeof(point) + sum(sys.getsizeof(c) for c in point) for point in bCSD)
+
+
+def run_benchmark(diagrams=(('honeycomb', 2, 512, 32), ('honeycomb', 3, 96, 16), ('square', 3, 128, 32)),
+                  queries: int = 100000):
+    """
+    Compare the size of the .bcsd file with the bCSD list, and measure its encode, decode and query throughputs.
+    """
+    print('diagram                     points  list B/pt  file B/pt  encode pt/s  decode pt/s  dense pt/s  query/s')
+    with tempfile.TemporaryDirectory() as tmp:
+        for kind, dimension, size, edge in diagrams:
+            path = Path(tmp) / (kind + '.npy')
+            save_npy(generate(kind, dimension, size, edge, noise=0.1, seed=0), path)
+            np.random.seed(0)
+            flooder = Flooder(path)
+            with contextlib.redirect_stdout(io.StringIO()):
+                flooder.run('frontier')
+            points = len(flooder.bCSD)
+
+            bcsd_path = Path(tmp) / (kind + '.bcsd')
+            start = time.perf_counter()
+            flooder.save(bcsd_path)
+            encode = points / (time.perf_counter() - start)
+
+            bCSD = BCSDFile(bcsd_path)
+            start = time.perf_counter()
+            bCSD.points()
+            decode = points / (time.perf_counter() - start)
+            start = time.perf_counter()
+            bCSD.to_dense()
+            dense = points / (time.perf_counter() - start)
+            samples = np.random.randint(0, size, (queries, dimension))
+            start = time.perf_counter()
+            bCSD.contains_many(samples)
+            query = queries / (time.perf_counter() - start)
+
+            name = kind + ' d=' + str(dimension) + ' s=' + str(size)
+            print(f'{name:26s}  {points:6d}  {list_size(flooder.bCSD) / points:9.1f}  '
+                  f'{bcsd_path.stat().st_size / points:9.2f}  {encode:11.0f}  {decode:11.0f}  {dense:10.0f}  {query:7.0f}')
+
+
+if __name__ == '__main__':
+    run_benchmark()
@@ -0,0 +1,140 @@
+"""
+Benchmark suite of the compressors on synthetic diagrams.
+
+The suite sweeps the number of dimensions d, the sensitivity s (points per dimension) and the density of the transition
+lines (the cell edge length), and records for each flood mode the simulator samples, the wall time, the peak memory
+and the bCSD size. The results are saved as JSON, to track the regressions across versions:
+
+    python -m src.benchmarks.benchmark --dimensions 2 3 --sizes 32 64 --edges 8 16 --output results.json
+"""
+
+import argparse
+import contextlib
+import datetime
+import io
+import itertools
+import json
+import math
+import platform
+import subprocess
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+import numpy as np
+
+from src.QDSim.generator import KINDS, generate
+from src.QDSim.storage import save_npy
+from src.flooder.flooder import Flooder
+from src.utilities.clock import Clock
+
+# the queue flood is quadratic in the transition line volume, it is skipped on larger diagrams
+QUEUE_MAX_VOLUME = 2 ** 14
+
+
+def flooder_factory(mode: str):
+    """
+    :return: the Flooder class implementing a flood mode
+    """
+    if mode == 'parallel':
+        from src.flooder.parallelFlooder import ParallelFlooder
+        return ParallelFlooder
+    if mode == 'async':
+        from src.flooder.asyncFlooder import AsyncFlooder
+        return AsyncFlooder
+    if mode == 'multiresolution':
+        from src.flooder.multiresolutionFlooder import MultiresolutionFlooder
+        return MultiresolutionFlooder
+    if mode == 'tiled':
+        from src.flooder.tiledFlooder import TiledFlooder
+        return TiledFlooder
+    return Flooder
+
+
+def measure(path: Path, mode: str, seed: int) -> dict:
+    """
+    Run a compression and measure it.
+
+    :param path: the path of the diagram
+    :param mode: the flood mode, see Flooder.run
+    :param seed: the seed of the random sampling
+    :return: the measures of the run: samples, wall time, peak memory (of the main process) and bCSD size
+    """
+    np.random.seed(seed)
+    flooder = flooder_factory(mode)(path, clock=Clock())
+    tracemalloc.start()
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        flooder.run(mode)
+    wall_time = time.perf_counter() - start
+    _, peak_memory = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    report = flooder.report()
+    return {
+        'samples': report['samples'],
+        'unique_samples': report['unique_samples'],
+        'requests': report['requests'],
+        'wall_time': wall_time,
+        'peak_memory': peak_memory,
+        'bCSD_size': report['bCSD_size'],
+        'phases': report['phases'],
+    }
+
+
+def git_revision() -> str:
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True,
+                              cwd=Path(__file__).parent).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def run_suite(kinds=('honeycomb',), dimensions=(2, 3), sizes=(32, 64), edges=(8.0, 16.0), modes=('queue', 'frontier'),
+              noise: float = 0.1, seed: int = 0) -> dict:
+    """
+    Run the benchmark suite.
+
+    :return: the results, with the environment and one entry per diagram and flood mode
+    """
+    results = {
+        'date': datetime.datetime.now().isoformat(),
+        'revision': git_revision(),
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'runs': [],
+    }
+    with tempfile.TemporaryDirectory() as tmp:
+        for kind, dimension, size, edge in itertools.product(kinds, dimensions, sizes, edges):
+            path = Path(tmp) / (kind + '_' + str(dimension) + '_' + str(size) + '_' + str(edge) + '.npy')
+            diagram = generate(kind, dimension, size, edge, noise=noise, seed=seed)
+            save_npy(diagram, path)
+            line_volume = int(np.sum(diagram >= 1))
+            for mode in modes:
+                if mode == 'queue' and math.prod(diagram.shape) > QUEUE_MAX_VOLUME:
+                    continue
+                run = {'kind': kind, 'dimension': dimension, 'size': size, 'edge': edge, 'density': size / edge,
+                       'line_volume': line_volume, 'mode': mode}
+                run.update(measure(path, mode, seed))
+                results['runs'].append(run)
+                print(f"{kind:9s}  d={dimension}  s={size:4d}  edge={edge:5.1f}  {mode:8s}  "
+                      f"samples={run['samples']:8d}  bCSD={run['bCSD_size']:7d}/{line_volume:<7d}  "
+                      f"time={run['wall_time']:7.3f}s  memory={run['peak_memory'] / 2 ** 20:7.1f}MB")
+    return results
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark the compressors on synthetic diagrams.')
+    parser.add_argument('--kinds', choices=KINDS, nargs='+', default=['honeycomb'])
+    parser.add_argument('--dimensions', type=int, nargs='+', default=[2, 3])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[32, 64])
+    parser.add_argument('--edges', type=float, nargs='+', default=[8.0, 16.0])
+    parser.add_argument('--modes', nargs='+', default=['queue', 'frontier'])
+    parser.add_argument('--noise', type=float, default=0.1)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', type=Path, default=Path('benchmark.json'))
+    args = parser.parse_args()
+    suite = run_suite(args.kinds, args.dimensions, args.sizes, args.edges, args.modes, args.noise, args.seed)
+    with open(args.output, 'w') as f:
+        json.dump(suite, f, indent=2)
+    print('results saved to', args.output)
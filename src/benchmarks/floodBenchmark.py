@@ -0,0 +1,63 @@
+import contextlib
+import io
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+from src.flooder.flooder import Flooder
+
+
+def make_diagram(size: int, lines: int) -> np.ndarray:
+    """
+    Create a size x size diagram crossed by some parallel diagonal transition lines, with a little gaussian noise,
+    like the test1 diagram of the library.
+
+    :param size: the edge of the diagram
+    :param lines: the number of diagonal transition lines
+    :return: the diagram
+    """
+    diagram = np.zeros((size, size))
+    for k in np.linspace(-size // 2, size // 2, lines).astype(int):
+        diagram += np.eye(size, k=k)
+    diagram += np.around(abs(np.random.normal(0, 0.1, (size, size))), decimals=2)
+    return diagram
+
+
+def time_flood(path: Path, mode: str) -> tuple:
+    """
+    Seed a flooder with a fixed random state and time its flood phase only.
+
+    :param path: the path of the diagram
+    :param mode: the flood mode, see Flooder.run
+    :return: a tuple containing the flood time in seconds and the bCSD
+    """
+    np.random.seed(0)
+    flooder = Flooder(path)
+    with contextlib.redirect_stdout(io.StringIO()):
+        to_process = flooder.random_sampling(flooder.estimate_batch_size())
+        start = time.perf_counter()
+        flooder.flood_modes()[mode](to_process)
+    return time.perf_counter() - start, flooder.bCSD
+
+
+def run_benchmark(sizes=(50, 100, 200, 400, 800), lines: int = 5):
+    """
+    Compare the queue flood and the frontier flood on diagrams of growing transition line volume.
+    """
+    np.random.seed(0)
+    print('size  tl_points  queue_s  frontier_s  speedup')
+    with tempfile.TemporaryDirectory() as tmp:
+        for size in sizes:
+            path = Path(tmp) / ('diagonal_' + str(size) + '.txt')
+            np.savetxt(path, make_diagram(size, lines))
+            queue_time, queue_bCSD = time_flood(path, 'queue')
+            frontier_time, frontier_bCSD = time_flood(path, 'frontier')
+            assert set(queue_bCSD) == set(frontier_bCSD), 'the two floods disagree'
+            print(f'{size:4d}  {len(frontier_bCSD):9d}  {queue_time:7.3f}  {frontier_time:10.4f}  '
+                  f'{queue_time / frontier_time:7.1f}x')
+
+
+if __name__ == '__main__':
+    run_benchmark()
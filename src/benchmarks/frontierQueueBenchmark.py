@@ -0,0 +1,67 @@
+import time
+import tracemalloc
+
+import numpy as np
+
+from src.utilities.frontierQueue import FrontierQueue
+from src.utilities.orderedSetQueue import OrderedSetQueue
+
+
+def measure(make_queue, points: np.ndarray, bulk: bool) -> tuple:
+    """
+    Push all the points in a queue, then pop them all.
+
+    :return: the push and pop throughputs in points per second, and the memory of the full queue in bytes per point
+    """
+    tuples = list(map(tuple, points.tolist()))
+
+    def fill():
+        queue = make_queue()
+        if bulk:
+            queue.put_many(points)
+        else:
+            for point in tuples:
+                queue.put(point)
+        return queue
+
+    # the memory is measured on a separate run, tracemalloc slows down the allocations
+    tracemalloc.start()
+    queue = fill()
+    memory, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del queue
+    start = time.perf_counter()
+    queue = fill()
+    push = len(points) / (time.perf_counter() - start)
+    start = time.perf_counter()
+    if bulk:
+        queue.get_many()
+    else:
+        while not queue.empty():
+            queue.get()
+    pop = len(points) / (time.perf_counter() - start)
+    return push, pop, memory / len(points)
+
+
+def run_benchmark(shape=(256, 256, 256), sizes=(10 ** 4, 10 ** 5, 10 ** 6)):
+    """
+    Compare the FrontierQueue with the OrderedSetQueue.
+    The memory of the OrderedSetQueue does not count the coordinate tuples, which are shared with the caller.
+    """
+    np.random.seed(0)
+    print('space ' + 'x'.join(map(str, shape)) + ', bitmap ' + str(np.prod(shape) // 8 // 2 ** 20) + 'MB')
+    print('queue                  points   push pt/s    pop pt/s  bytes/pt')
+    for size in sizes:
+        flat = np.random.choice(np.prod(shape), size, replace=False)
+        points = np.stack(np.unravel_index(flat, shape), axis=-1)
+        for name, make_queue, bulk in [('OrderedSetQueue', OrderedSetQueue, False),
+                                       ('FrontierQueue', lambda: FrontierQueue(shape), False),
+                                       ('FrontierQueue bulk', lambda: FrontierQueue(shape), True)]:
+            if not bulk and size > 10 ** 5:
+                continue
+            push, pop, memory = measure(make_queue, points, bulk)
+            print(f'{name:20s}  {size:8d}  {push:10.0f}  {pop:10.0f}  {memory:8.1f}')
+
+
+if __name__ == '__main__':
+    run_benchmark()
@@ -0,0 +1,47 @@
+import contextlib
+import io
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+from src.QDSim.generator import generate
+from src.QDSim.storage import save_npy
+from src.flooder.flooder import Flooder
+from src.flooder.gridFitter import GridFitter
+from src.utilities.clock import Clock
+
+
+def run_benchmark(diagrams=(('square', 2, 1024, 16.0), ('honeycomb', 2, 1024, 16.0), ('honeycomb', 3, 128, 10.0),
+                            ('square', 4, 40, 8.0), ('honeycomb', 4, 40, 8.0)), tilt: float = 0.2):
+    """
+    Compare the grid fit with the frontier flood: the samples, the wall time and the size of the output,
+    the O(d^2) parameters of the grid against the O(s^(d-1)) points of the bCSD.
+    The IoU is the intersection over union of the transition lines of the fitted grid and of the bCSD.
+    """
+    print('diagram                   flood samples  flood s  bCSD     fit samples  fit s  parameters  IoU')
+    for kind, dimension, size, edge in diagrams:
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / 'diagram.npy'
+            save_npy(generate(kind, dimension, size, edge, tilt=tilt, intercept=3.0, noise=0.05, seed=0), path)
+            results = []
+            for flooder, mode in ((Flooder(path, clock=Clock()), 'frontier'),
+                                  (GridFitter(path, kind, clock=Clock()), 'fit')):
+                np.random.seed(0)
+                start = time.perf_counter()
+                with contextlib.redirect_stdout(io.StringIO()):
+                    flooder.run(mode)
+                results.append((flooder, time.perf_counter() - start))
+            (flood, flood_time), (fitter, fit_time) = results
+            lines = np.zeros(flood.sim.get_shape(), dtype=bool)
+            lines[tuple(np.array(flood.bCSD).T)] = True
+            fitted = fitter.rasterize()
+            name = kind + ' d=' + str(dimension) + ' s=' + str(size)
+            print(f'{name:24s}  {flood.clock.get_time():13d}  {flood_time:7.2f}  {len(flood.bCSD):7d}  '
+                  f'{fitter.clock.get_time():11d}  {fit_time:5.2f}  {fitter.report()["parameters"]:10d}  '
+                  f'{np.sum(lines & fitted) / np.sum(lines | fitted):.3f}')
+
+
+if __name__ == '__main__':
+    run_benchmark()
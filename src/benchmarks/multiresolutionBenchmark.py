@@ -0,0 +1,50 @@
+import contextlib
+import io
+import tempfile
+from pathlib import Path
+
+import numpy as np
+
+from src.QDSim.generator import generate
+from src.QDSim.storage import save_npy
+from src.flooder.flooder import Flooder
+from src.flooder.multiresolutionFlooder import MultiresolutionFlooder
+from src.utilities.clock import Clock
+
+
+def count_samples(flooder: Flooder, mode: str) -> tuple:
+    """
+    :return: the number of samples of a run, and the size of its bCSD
+    """
+    np.random.seed(0)
+    with contextlib.redirect_stdout(io.StringIO()):
+        flooder.run(mode)
+    return flooder.clock.get_time(), len(flooder.bCSD)
+
+
+def run_benchmark(diagrams=(('honeycomb', 2, 128, 16), ('honeycomb', 2, 256, 32), ('square', 2, 256, 64),
+                            ('honeycomb', 3, 48, 12)), strides=(8, 32)):
+    """
+    Compare the samples of the multiresolution flood with the plain floods.
+
+    The queue flood samples the 3^d - 1 neighbors of every transition line point,
+    the frontier flood samples each point of the dilated transition lines once, after the random seeding.
+    """
+    print('diagram                        lines  queue(3^d-1)  frontier  multires(leaf 1)  multires(leaf=stride)')
+    with tempfile.TemporaryDirectory() as tmp:
+        for kind, dimension, size, edge in diagrams:
+            path = Path(tmp) / (kind + '.npy')
+            diagram = generate(kind, dimension, size, edge, noise=0.1, seed=0)
+            save_npy(diagram, path)
+            lines = int(np.sum(diagram >= 1))
+            frontier, _ = count_samples(Flooder(path, clock=Clock()), 'frontier')
+            for stride in strides:
+                pixel, _ = count_samples(MultiresolutionFlooder(path, stride, clock=Clock()), 'multiresolution')
+                coarse, _ = count_samples(MultiresolutionFlooder(path, stride, stride, clock=Clock()), 'multiresolution')
+                name = kind + ' d=' + str(dimension) + ' s=' + str(size) + ' stride=' + str(stride)
+                print(f'{name:29s}  {lines:5d}  {(3 ** dimension - 1) * lines:12d}  {frontier:8d}  {pixel:16d}  '
+                      f'{coarse:21d}')
+
+
+if __name__ == '__main__':
+    run_benchmark()
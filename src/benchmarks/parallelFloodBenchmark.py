@@ -0,0 +1,64 @@
+import contextlib
+import io
+import os
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+from src.flooder.flooder import Flooder
+from src.flooder.parallelFlooder import ParallelFlooder
+
+
+def make_grid_diagram(size: int, edge: int) -> np.ndarray:
+    """
+    Create a size x size diagram crossed by a square grid of transition lines, with a little gaussian noise.
+
+    :param size: the edge of the diagram
+    :param edge: the distance between two parallel transition lines
+    :return: the diagram
+    """
+    lines = np.zeros((size, size), dtype=bool)
+    lines[::edge, :] = True
+    lines[:, ::edge] = True
+    return lines + np.around(abs(np.random.normal(0, 0.1, (size, size))), decimals=2)
+
+
+def time_flood(flooder: Flooder, mode: str) -> float:
+    """
+    Seed a flooder with a fixed random state and time its flood phase only.
+
+    :return: the flood time in seconds
+    """
+    np.random.seed(0)
+    with contextlib.redirect_stdout(io.StringIO()):
+        to_process = flooder.random_sampling(flooder.estimate_batch_size())
+        start = time.perf_counter()
+        flooder.flood_modes()[mode](to_process)
+    return time.perf_counter() - start
+
+
+def run_benchmark(size: int = 3000, edge: int = 25, workers=(1, 2, 4, 8)):
+    """
+    Compare the serial frontier flood with the parallel flood on a growing number of workers.
+    """
+    np.random.seed(0)
+    print('diagram ' + str(size) + 'x' + str(size) + ', ' + str(os.cpu_count()) + ' cores')
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / 'grid.npy'
+        np.save(path, make_grid_diagram(size, edge))
+
+        serial = Flooder(path)
+        serial_time = time_flood(serial, 'frontier')
+        print('workers  tl_points  flood_s  speedup')
+        print(f'serial   {len(serial.bCSD):9d}  {serial_time:7.3f}  {1:7.2f}x')
+        for n in workers:
+            parallel = ParallelFlooder(path, workers=n)
+            parallel_time = time_flood(parallel, 'parallel')
+            assert set(parallel.bCSD) == set(serial.bCSD), 'the parallel flood disagrees with the serial one'
+            print(f'{n:7d}  {len(parallel.bCSD):9d}  {parallel_time:7.3f}  {serial_time / parallel_time:7.2f}x')
+
+
+if __name__ == '__main__':
+    run_benchmark()
@@ -0,0 +1,61 @@
+import numpy as np
+
+from src.utilities.sampling import SAMPLERS, make_sampler
+
+
+def make_components(size: int, count: int, length: int, dimension: int = 2) -> np.ndarray:
+    """
+    Create a label map of count disjoint transition line segments, each one in its own cell of a regular grid,
+    with a random position and axis inside the cell.
+
+    :param size: the sensitivity of each dimension
+    :param count: the number of cells per dimension, there are count^d segments
+    :param length: the length of a segment, in pixels, smaller than size / count
+    :param dimension: the number of dimensions d
+    :return: an integer array of shape (size,) * d, 0 on the background and i + 1 on the i-th segment
+    """
+    labels = np.zeros((size,) * dimension, dtype=np.int64)
+    cell = size // count
+    for label, corner in enumerate(np.ndindex(*(count,) * dimension), start=1):
+        start = np.array(corner) * cell + np.random.randint(0, cell - length + 1, size=dimension)
+        axis = np.random.randint(dimension)
+        for step in range(length):
+            point = start.copy()
+            point[axis] += step
+            labels[tuple(point)] = label
+    return labels
+
+
+def samples_to_hit_all(labels: np.ndarray, sampler: str, round_size: int = 256, budget: int = None) -> int:
+    """
+    Draw points in rounds until every component of the label map holds a sampled point.
+
+    :return: the number of points drawn, or the budget if some components were never hit
+    """
+    budget = labels.size if budget is None else budget
+    missing = set(np.unique(labels[labels > 0]).tolist())
+    drawer = make_sampler(sampler, labels.shape)
+    drawn = 0
+    while missing and drawn < budget:
+        indices = drawer.draw(round_size)
+        drawn += round_size
+        missing -= set(labels[tuple(indices.T)].tolist())
+    return drawn
+
+
+def run_benchmark(size: int = 512, count: int = 8, length: int = 12, trials: int = 20):
+    """
+    Compare the samples each strategy needs to hit every transition line component.
+    """
+    np.random.seed(0)
+    print('diagram ' + str(size) + 'x' + str(size) + ', ' + str(count ** 2) + ' segments of ' + str(length)
+          + ' pixels, ' + str(trials) + ' trials')
+    print('sampler          mean_samples  max_samples')
+    labels = [make_components(size, count, length) for _ in range(trials)]
+    for sampler in SAMPLERS:
+        samples = [samples_to_hit_all(label, sampler) for label in labels]
+        print(f'{sampler:15s}  {np.mean(samples):12.0f}  {np.max(samples):11d}')
+
+
+if __name__ == '__main__':
+    run_benchmark()
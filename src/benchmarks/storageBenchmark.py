@@ -0,0 +1,66 @@
+import multiprocessing
+import resource
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+from src.QDSim.QDSimulator import QDSimulator
+from src.QDSim.storage import convert
+
+
+def resident_memory() -> float:
+    """
+    :return: the current resident memory of the process in MB, read from /proc on linux
+    """
+    with open('/proc/self/statm') as f:
+        return int(f.read().split()[1]) * resource.getpagesize() / 2 ** 20
+
+
+def measure(path: Path, samples: int, results):
+    """
+    Open a diagram and sample it at random in a corner window of a tenth of its edge, like a flood that only visits a
+    region of the diagram.
+    This runs in a fresh process, so the resident memory is not shared between backends.
+    The resident memory is the RSS increase of the process after loading and sampling, in MB.
+    """
+    rss_before = resident_memory()
+    start = time.perf_counter()
+    sim = QDSimulator(path)
+    load_time = time.perf_counter() - start
+    shape = sim.get_shape()
+    indices = np.random.randint(0, [s // 10 for s in shape], size=(samples, len(shape)))
+    start = time.perf_counter()
+    sim.sample_many(indices)
+    sample_time = time.perf_counter() - start
+    rss = resident_memory() - rss_before
+    results.put((load_time, sample_time, rss))
+
+
+def run_benchmark(size: int = 2000, samples: int = 10000):
+    """
+    Compare the load time and resident memory of the storage backends on a size x size diagram.
+    """
+    context = multiprocessing.get_context('spawn')
+    with tempfile.TemporaryDirectory() as tmp:
+        text = Path(tmp) / 'diagram.txt'
+        np.savetxt(text, np.random.normal(0, 0.1, (size, size)))
+        paths = [text]
+        for name in ['diagram.npy', 'diagram.bin', 'diagram.chunks']:
+            convert(text, Path(tmp) / name)
+            paths.append(Path(tmp) / name)
+
+        print('diagram ' + str(size) + 'x' + str(size) + ', ' + str(samples) + ' random samples in a corner window')
+        print('backend  load_s    sample_s  rss_MB')
+        for path in paths:
+            results = context.Queue()
+            process = context.Process(target=measure, args=(path, samples, results))
+            process.start()
+            load_time, sample_time, rss = results.get()
+            process.join()
+            print(f'{path.suffix:7s}  {load_time:8.4f}  {sample_time:8.4f}  {rss:6.1f}')
+
+
+if __name__ == '__main__':
+    run_benchmark()
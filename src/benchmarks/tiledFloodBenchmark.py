@@ -0,0 +1,62 @@
+import contextlib
+import io
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+import numpy as np
+
+from src.QDSim.generator import generate
+from src.QDSim.storage import save_npy
+from src.flooder.flooder import Flooder
+from src.flooder.tiledFlooder import TiledFlooder
+
+
+def measure_flood(flooder: Flooder, mode: str) -> tuple:
+    """
+    Seed a flooder, then measure its flood only: the seeding is the same for all the floods.
+
+    :return: the wall time and the peak memory of the flood, and the bCSD as a set of points
+    """
+    np.random.seed(0)
+    with contextlib.redirect_stdout(io.StringIO()):
+        to_process = flooder.random_sampling(flooder.estimate_batch_size())
+        # the memory is measured on a separate run, tracemalloc slows down the allocations
+        tracemalloc.start()
+        flooder.flood_modes()[mode](to_process)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        bCSD = set(flooder.bCSD)
+        flooder.bCSD = []
+        np.random.seed(0)
+        to_process = flooder.random_sampling(flooder.estimate_batch_size())
+        start = time.perf_counter()
+        flooder.flood_modes()[mode](to_process)
+    return time.perf_counter() - start, peak, bCSD
+
+
+def run_benchmark(dimension: int = 4, size: int = 32, edge: float = 10.0, tile: int = 16,
+                  limits=(2 ** 20, 2 ** 22, 2 ** 24)):
+    """
+    Compare the tiled flood with the frontier flood, whose state is a label per point of the diagram.
+    The peak memory of the tiled flood includes its bCSD list, the output.
+    """
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / 'diagram.npy'
+        save_npy(generate('honeycomb', dimension, size, edge, tilt=0.2, noise=0.05, seed=0), path)
+        print('diagram honeycomb d=' + str(dimension) + ' s=' + str(size) + ', tiles of ' + str(tile) + '^' +
+              str(dimension))
+        print('flood                    time s   peak MB  loads  evictions   spilled  same bCSD')
+        seconds, peak, expected = measure_flood(Flooder(path), 'frontier')
+        print(f'frontier               {seconds:8.2f}  {peak / 2 ** 20:8.2f}')
+        for limit in limits:
+            flooder = TiledFlooder(path, tile, limit)
+            seconds, peak, bCSD = measure_flood(flooder, 'tiled')
+            name = 'tiled ' + str(limit // 2 ** 10) + 'KB'
+            print(f'{name:21s}  {seconds:8.2f}  {peak / 2 ** 20:8.2f}  {flooder.store.loads:5d}  '
+                  f'{flooder.store.evictions:9d}  {flooder.store.pending.spilled:8d}  {bCSD == expected}')
+
+
+if __name__ == '__main__':
+    run_benchmark()
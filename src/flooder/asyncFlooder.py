@@ -0,0 +1,261 @@
+import asyncio
+import math
+import queue
+import time
+from pathlib import Path
+
+import numpy as np
+
+from src.QDSim.asyncSimulator import AsyncLatencySimulator, AsyncSimulator
+from src.flooder.components import label_points
+from src.flooder.flooder import Flooder
+from src.utilities.clock import Clock
+from src.utilities.neighbours import unique_neighbors
+
+
+class AsyncFlooder(Flooder):
+    """
+    This class floods the CSD through an asynchronous, high-latency simulator.
+
+    Instead of waiting for each sample, the flood keeps up to max_in_flight requests in flight.
+    The neighbors of the transition line points found by any request are coalesced into batches of at most batch_size
+    points, and a new request is sent as soon as a slot is free, so the flood keeps expanding while the replies come back.
+
+    The random sampling phase still uses the synchronous simulator, the flood uses async_sim.
+    The resulting bCSD holds the same points as the one of the flood method.
+
+    The stream mode also overlaps the random sampling with the flood, see the stream_flood method.
+    """
+
+    def __init__(self, path: Path(), async_sim: AsyncSimulator = None, max_in_flight: int = 8, batch_size: int = 1024,
+                 cache_size: int = None, clock: Clock = None, stencil: np.ndarray = None, stable_rounds: int = 2):
+        """
+        :param path: the path of the CSD to compress
+        :param async_sim: the asynchronous simulator used by the flood, defaults to the simulator of path with no latency
+        :param max_in_flight: the maximum number of sample requests in flight at the same time
+        :param batch_size: the maximum number of points in a sample request
+        :param cache_size: if given, the synchronous samples are memoized in a SampleCache of at most cache_size points
+        :param clock: if given, the samples and the phases of the run are recorded on the clock
+        :param stencil: the neighbor offsets used by the flood, see Flooder
+        :param stable_rounds: the stream mode floods once the threshold did not change for this many seed rounds
+        """
+        super().__init__(path, cache_size, clock, stencil)
+        if max_in_flight <= 0 or batch_size <= 0:
+            raise ValueError('max_in_flight and batch_size must be positive integers')
+        self.async_sim = async_sim if async_sim is not None else AsyncLatencySimulator(self.sim, latency=0)
+        self.max_in_flight = max_in_flight
+        self.batch_size = batch_size
+        self.stable_rounds = stable_rounds
+        self.sampler = 'uniform'
+        # the stream mode measures, in seconds since the start of the flood, and the number of threshold shifts
+        self.first_result = None
+        self.seeding_time = None
+        self.threshold_shifts = 0
+
+    def flood_modes(self) -> dict:
+        modes = super().flood_modes()
+        modes['async'] = self.async_flood
+        modes['stream'] = self.stream_flood
+        return modes
+
+    def run(self, mode: str = 'queue', sampling: str = 'sequential', sampler: str = 'uniform') -> list:
+        """
+        See Flooder.run, the stream mode streams the rounds of the sequential sampling itself, so it skips the sampling
+        phase whatever the sampling argument.
+        """
+        self.sampler = sampler
+        return super().run(mode, None if mode == 'stream' else sampling, sampler)
+
+    def async_flood(self, to_process: queue.Queue):
+        """
+        This method fills the compressed binary CSD (bCSD) like the flood method, running aflood in an event loop.
+
+        :param to_process: the process queue initialized with some transition line points
+        """
+        asyncio.run(self.aflood(to_process))
+
+    async def aflood(self, to_process: queue.Queue):
+        """
+        The coroutine of the async_flood method.
+
+        :param to_process: the process queue initialized with some transition line points
+        """
+        shape = self.async_sim.get_shape()
+        dimension = len(shape)
+        # visited[i] is True if the point of linear index i has already been requested
+        visited = np.zeros(math.prod(shape), dtype=bool)
+
+        def expand(frontier: np.ndarray) -> np.ndarray:
+            # add the frontier to the bCSD and return its neighbors not requested yet, marking them visited
+            self.bCSD.extend(map(tuple, frontier.tolist()))
+            flat = unique_neighbors(frontier, shape, self.stencil)
+            flat = flat[~visited[flat]]
+            visited[flat] = True
+            return flat
+
+        seeds = []
+        while not to_process.empty():
+            seeds.append(to_process.get())
+        seeds = np.array(seeds, dtype=np.intp).reshape(-1, dimension)
+        visited[np.ravel_multi_index(tuple(seeds.T), shape)] = True
+        # the candidates waiting for a request, in linear indexes
+        waiting = expand(seeds)
+        in_flight = dict()
+
+        while len(waiting) or in_flight:
+            # coalesce the waiting candidates in batches and fill the free slots
+            while len(waiting) and len(in_flight) < self.max_in_flight:
+                batch, waiting = waiting[:self.batch_size], waiting[self.batch_size:]
+                points = np.stack(np.unravel_index(batch, shape), axis=-1)
+                in_flight[asyncio.ensure_future(self.async_sim.sample_many(points, self.clock))] = points
+            done, _ = await asyncio.wait(in_flight, return_when=asyncio.FIRST_COMPLETED)
+            for request in done:
+                points = in_flight.pop(request)
+                frontier = points[self.normalize_many(request.result()) == 1]
+                waiting = np.concatenate([waiting, expand(frontier)])
+
+        print('bCSD size is: ', len(self.bCSD))
+
+    def stream_flood(self, to_process: queue.Queue):
+        """
+        This method fills the compressed binary CSD (bCSD) like the frontier_flood method after the sequential_sampling
+        method, but it starts flooding while the random sampling is still running, running astream in an event loop.
+
+        :param to_process: the process queue, unused: the seeds are streamed by the sampling rounds
+        """
+        asyncio.run(self.astream(to_process))
+
+    async def astream(self, to_process: queue.Queue):
+        """
+        The coroutine of the stream_flood method.
+
+        The rounds of the sequential sampling, see the sampling_rounds method, are requested one at a time to async_sim,
+        besides the max_in_flight requests of the flood. Each round updates the max and min values, hence the threshold,
+        as in the sequential sampling: the seeds and the threshold are the same, the flood just does not wait for them.
+        The transition line points are held until the threshold is stable, i.e. did not change for stable_rounds seed
+        rounds, then their neighbors are requested as in async_flood, while the next seed rounds are in flight.
+
+        All the samples are kept, and when a new extreme value shifts the threshold, they are rectified again:
+        the points now above the threshold are flooded as soon as it is stable again, and the points now below it are
+        dropped. At the end, the transition line points not connected to a seed under the final threshold, only reached
+        through dropped points, are dropped too, so the bCSD holds the same points as the one of the frontier flood
+        after the sequential sampling with the same random state.
+
+        The time of the first transition line point flooded and the time the sampling stopped are recorded in the
+        first_result and seeding_time attributes, in seconds since the start of the flood.
+
+        :param to_process: the process queue, unused: the seeds are streamed by the sampling rounds
+        """
+        start = time.perf_counter()
+        shape = self.async_sim.get_shape()
+        # state[i] is the state of the point of linear index i: -2 if it has not been requested yet, -1 if it has been
+        # requested but not sampled yet, 0 if it is below the threshold, 1 if it is a transition line point held
+        # until the threshold is stable, 2 if it is a transition line point whose neighbors have been requested
+        state = np.full(math.prod(shape), -2, dtype=np.int8)
+        # the linear indexes and the values of all the samples, to rectify them again when the threshold shifts
+        sampled, sampled_values = [], []
+        seeds = []
+        held = []
+        # the candidates waiting for a request, in linear indexes
+        waiting = np.empty(0, dtype=np.intp)
+        max_value, min_value = -np.inf, np.inf
+        # the number of seed rounds since the last change of the threshold
+        unchanged = 0
+        # whether a flooded point fell below a shifted threshold
+        dropped = False
+
+        def request(points: np.ndarray) -> asyncio.Future:
+            return asyncio.ensure_future(self.async_sim.sample_many(points, self.clock))
+
+        def rectify(flat: np.ndarray, values: np.ndarray):
+            # set the state of sampled points, holding the transition line points not flooded yet
+            nonlocal dropped
+            line = self.normalize_many(values) == 1
+            dropped = dropped or bool(np.any(state[flat[~line]] == 2))
+            state[flat[~line]] = 0
+            new = flat[line & (state[flat] != 2)]
+            state[new] = 1
+            held.append(new)
+
+        def expand(flat: np.ndarray) -> np.ndarray:
+            # add the transition line points to the bCSD and return their neighbors not requested yet
+            if self.first_result is None and len(flat):
+                self.first_result = time.perf_counter() - start
+            state[flat] = 2
+            points = np.stack(np.unravel_index(flat, shape), axis=-1)
+            self.bCSD.extend(map(tuple, points.tolist()))
+            neighbors = unique_neighbors(points, shape, self.stencil)
+            neighbors = neighbors[state[neighbors] == -2]
+            state[neighbors] = -1
+            return neighbors
+
+        rounds = self.sampling_rounds(sampler=self.sampler)
+        seed_points = next(rounds)
+        seed_request = request(seed_points)
+        in_flight = {seed_request: seed_points}
+        while True:
+            if seed_request is None or unchanged >= self.stable_rounds:
+                # the threshold is stable: flood the held transition line points
+                if held:
+                    flat = np.unique(np.concatenate(held))
+                    held.clear()
+                    waiting = np.concatenate([waiting, expand(flat[state[flat] == 1])])
+                while len(waiting) and len(in_flight) - (seed_request is not None) < self.max_in_flight:
+                    batch, waiting = waiting[:self.batch_size], waiting[self.batch_size:]
+                    points = np.stack(np.unravel_index(batch, shape), axis=-1)
+                    in_flight[request(points)] = points
+            if not in_flight:
+                break
+            done, _ = await asyncio.wait(in_flight, return_when=asyncio.FIRST_COMPLETED)
+            for finished in done:
+                points = in_flight.pop(finished)
+                values = np.asarray(finished.result(), dtype=float)
+                flat = np.ravel_multi_index(tuple(points.T), shape)
+                sampled.append(flat)
+                sampled_values.append(values)
+                if finished is not seed_request:
+                    rectify(flat, values)
+                    continue
+                # a seed round: request the next one and update the threshold
+                seeds.append(flat)
+                try:
+                    seed_points = rounds.send(values)
+                    seed_request = request(seed_points)
+                    in_flight[seed_request] = seed_points
+                except StopIteration:
+                    seed_request = None
+                    self.seeding_time = time.perf_counter() - start
+                max_value = max(float(np.max(values, initial=-np.inf)), max_value)
+                min_value = min(float(np.min(values, initial=np.inf)), min_value)
+                if max_value >= min_value and (max_value, min_value) != (self.max_value, self.min_value):
+                    if self.max_value is not None:
+                        self.threshold_shifts += 1
+                    self.max_value, self.min_value = max_value, min_value
+                    unchanged = 0
+                    # rectify all the samples again with the new threshold
+                    rectify(np.concatenate(sampled), np.concatenate(sampled_values))
+                else:
+                    unchanged += 1
+                    rectify(flat, values)
+
+        if dropped:
+            # keep the transition line points connected to a seed under the final threshold
+            line = np.flatnonzero(state == 2)
+            points = np.stack(np.unravel_index(line, shape), axis=-1)
+            labels = label_points(points, shape, self.stencil)
+            seeds = np.concatenate(seeds)
+            seeds = np.searchsorted(line, seeds[state[seeds] == 2])
+            self.bCSD = list(map(tuple, points[np.isin(labels, labels[seeds])].tolist()))
+        print('first transition line point flooded after ', self.first_result, 's, sampling done after ',
+              self.seeding_time, 's, threshold shifts: ', self.threshold_shifts)
+        print('bCSD size is: ', len(self.bCSD))
+
+    def report(self) -> dict:
+        """
+        :return: the report of the clock, see Flooder.report, with the time to the first result of the stream mode
+        """
+        report = super().report()
+        if report is not None and self.first_result is not None:
+            report['first_result'] = self.first_result
+            report['seeding_time'] = self.seeding_time
+        return report
@@ -0,0 +1,343 @@
+"""
+Compact on-disk format of the compressed binary CSD (bCSD).
+
+The transition line points are sorted in Morton (Z) order, so that the points close in space are close in the file,
+and the differences between consecutive Morton codes are stored as LEB128 varints, most of them in a single byte.
+A .bcsd file holds:
+- the magic bytes BCSD and the length of a JSON header, as a little-endian uint32
+- the JSON header, with the shape, the number of points, the threshold and the user metadata, padded to 8 bytes
+- the block index: the Morton code of the first point of each block of block_size points,
+  and the offset of its first varint in the payload, as two uint64 arrays
+- the payload: the varint deltas of all the points
+
+The writer bounds its memory: the points beyond its buffer are spilled to sorted runs, merged when it is closed.
+The file is memory-mapped: a membership query is a binary search in the block index and the decoding of a single block,
+O(log n + block_size), and the whole file decodes to a dense boolean raster with vectorized numpy operations.
+"""
+
+import json
+import math
+import shutil
+from pathlib import Path
+
+import numpy as np
+
+from src.utilities.morton import morton_bits, morton_decode, morton_encode
+
+MAGIC = b'BCSD'
+VERSION = 1
+BLOCK_SIZE = 256
+
+
+def varint_lengths(values: np.ndarray) -> np.ndarray:
+    """
+    :return: the number of bytes of the varint of each value, see varint_encode
+    """
+    values = np.asarray(values, dtype=np.uint64)
+    lengths = np.ones(len(values), dtype=np.intp)
+    for k in range(1, 10):
+        lengths += (values >> np.uint64(7 * k)) > 0
+    return lengths
+
+
+def varint_encode(values: np.ndarray) -> np.ndarray:
+    """
+    Encode unsigned integers as LEB128 varints: 7 bits per byte, the high bit set on all the bytes but the last one.
+
+    :param values: an unsigned integer array
+    :return: the varints, an uint8 array
+    """
+    values = np.asarray(values, dtype=np.uint64)
+    lengths = varint_lengths(values)
+    starts = np.cumsum(lengths) - lengths
+    encoded = np.empty(int(lengths.sum()), dtype=np.uint8)
+    for k in range(int(lengths.max(initial=0))):
+        selected = lengths > k
+        payload = (values[selected] >> np.uint64(7 * k)) & np.uint64(0x7f)
+        more = (lengths[selected] > k + 1).astype(np.uint64) << np.uint64(7)
+        encoded[starts[selected] + k] = payload | more
+    return encoded
+
+
+def varint_decode(encoded: np.ndarray) -> np.ndarray:
+    """
+    :param encoded: the varints, see varint_encode
+    :return: the decoded values, an uint64 array
+    """
+    encoded = np.asarray(encoded, dtype=np.uint8)
+    if len(encoded) == 0:
+        return np.empty(0, dtype=np.uint64)
+    ends = np.flatnonzero((encoded & 0x80) == 0)
+    starts = np.concatenate([[0], ends[:-1] + 1])
+    # the position of each byte in its varint
+    positions = np.arange(len(encoded)) - np.repeat(starts, ends - starts + 1)
+    parts = (encoded & 0x7f).astype(np.uint64) << (7 * positions).astype(np.uint64)
+    return np.bitwise_or.reduceat(parts, starts)
+
+
+def sorted_unique(codes: np.ndarray) -> np.ndarray:
+    """
+    :param codes: an unsigned integer array
+    :return: the sorted unique codes, by a sort and a comparison of the neighbors, faster than np.unique on large arrays
+    """
+    codes = np.sort(codes)
+    return codes[np.concatenate([[True], codes[1:] != codes[:-1]])] if len(codes) else codes
+
+
+class BCSDWriter:
+    """
+    A writer of a .bcsd file, the transition line points can be appended while the flood runs.
+
+    The points are buffered as Morton codes, 8 bytes per point instead of the 100+ bytes of a tuple of the bCSD list.
+    Beyond buffer_size points, the buffer is sorted, deduplicated and spilled to a run file next to the .bcsd file,
+    so the memory of the writer is bounded whatever the size of the bCSD. When the writer is closed, the runs and the
+    buffer are merged in chunks, and the payload is encoded chunk by chunk.
+
+    with BCSDWriter(path, shape) as writer:
+        writer.append(points)
+    """
+
+    def __init__(self, path: Path, shape: tuple, max_value: float = None, min_value: float = None,
+                 metadata: dict = None, block_size: int = BLOCK_SIZE, buffer_size: int = 2 ** 20):
+        """
+        :param path: the path of the .bcsd file
+        :param shape: the dimensions of the simulated space
+        :param max_value: the max value of the CSD, used with min_value for the threshold of the transition lines
+        :param min_value: the min value of the CSD
+        :param metadata: a JSON serializable dict saved in the header
+        :param block_size: the number of points of a block of the index
+        :param buffer_size: the maximum number of points buffered in memory before a run is spilled to disk,
+            also the number of points merged at once when the writer is closed
+        """
+        if block_size <= 0 or buffer_size <= 0:
+            raise ValueError('block_size and buffer_size must be positive integers')
+        morton_bits(shape)
+        self.path = Path(path)
+        self.shape = tuple(int(s) for s in shape)
+        self.max_value = max_value
+        self.min_value = min_value
+        self.metadata = dict(metadata or {})
+        self.block_size = block_size
+        self.buffer_size = buffer_size
+        self.__codes = []
+        self.__buffered = 0
+        # the paths of the sorted run files spilled to disk
+        self.runs = []
+
+    def append(self, points):
+        """
+        :param points: the transition line points, an integer array of shape (N, d) or a list of coordinate tuples
+        """
+        points = np.asarray(points, dtype=np.intp).reshape(-1, len(self.shape))
+        if np.any((points < 0) | (points >= self.shape)):
+            raise ValueError('Points out of the shape ' + str(self.shape))
+        self.__codes.append(morton_encode(points, self.shape))
+        self.__buffered += len(points)
+        if self.__buffered > self.buffer_size:
+            self.spill()
+
+    def buffered(self) -> np.ndarray:
+        """
+        :return: the sorted unique codes of the buffer, which is emptied
+        """
+        codes = sorted_unique(np.concatenate(self.__codes)) if self.__codes else np.empty(0, dtype=np.uint64)
+        self.__codes = []
+        self.__buffered = 0
+        return codes
+
+    def spill(self):
+        """
+        Sort and deduplicate the buffered points and write them to a new run file.
+        """
+        run = self.path.with_name(self.path.name + '.run' + str(len(self.runs)))
+        self.buffered().astype('<u8').tofile(run)
+        self.runs.append(run)
+
+    def sorted_codes(self):
+        """
+        Merge the runs and the buffer, at most buffer_size codes at a time: each step takes, from every source,
+        the codes up to the smallest last code of their next chunks, so the codes of the following steps are larger.
+
+        :return: a generator of the sorted unique Morton codes of all the points, in chunks
+        """
+        sources = [np.memmap(run, dtype='<u8', mode='r') for run in self.runs] + [self.buffered()]
+        chunk = max(1, self.buffer_size // len(sources))
+        positions = [0] * len(sources)
+        while True:
+            chunks = [source[position:position + chunk] for source, position in zip(sources, positions)]
+            if not any(len(c) for c in chunks):
+                return
+            bound = min(c[-1] for c in chunks if len(c))
+            taken = []
+            for i, c in enumerate(chunks):
+                count = int(np.searchsorted(c, bound, side='right'))
+                taken.append(np.asarray(c[:count], dtype=np.uint64))
+                positions[i] += count
+            yield sorted_unique(np.concatenate(taken))
+
+    def close(self):
+        """
+        Merge, encode and write the points, and remove the run files.
+        """
+        # the payload is encoded chunk by chunk to a temporary file, the header needs the final count first
+        payload_path = self.path.with_name(self.path.name + '.payload')
+        count, size, last = 0, 0, np.uint64(0)
+        first_codes, offsets = [], []
+        try:
+            with open(payload_path, 'wb') as payload:
+                for codes in self.sorted_codes():
+                    deltas = np.diff(codes, prepend=last)
+                    lengths = varint_lengths(deltas)
+                    # the block index: the first code of each block and the offset of its first varint
+                    starts = np.arange(-count % self.block_size, len(codes), self.block_size)
+                    first_codes.append(codes[starts])
+                    offsets.append((size + np.cumsum(lengths) - lengths)[starts].astype(np.uint64))
+                    payload.write(varint_encode(deltas).tobytes())
+                    count += len(codes)
+                    size += int(lengths.sum())
+                    last = codes[-1]
+            first_codes = np.concatenate(first_codes) if first_codes else np.empty(0, dtype=np.uint64)
+            offsets = np.concatenate(offsets) if offsets else np.empty(0, dtype=np.uint64)
+
+            threshold = None
+            if self.max_value is not None and self.min_value is not None:
+                threshold = (self.max_value + self.min_value) / 2
+            header = json.dumps({
+                'version': VERSION,
+                'shape': list(self.shape),
+                'count': count,
+                'block_size': self.block_size,
+                'blocks': len(first_codes),
+                'max_value': self.max_value,
+                'min_value': self.min_value,
+                'threshold': threshold,
+                'metadata': self.metadata,
+            }).encode()
+            header += b' ' * (-(len(MAGIC) + 4 + len(header)) % 8)
+            with open(self.path, 'wb') as f, open(payload_path, 'rb') as payload:
+                f.write(MAGIC)
+                f.write(np.uint32(len(header)).tobytes())
+                f.write(header)
+                f.write(first_codes.astype('<u8').tobytes())
+                f.write(offsets.astype('<u8').tobytes())
+                shutil.copyfileobj(payload, f)
+        finally:
+            self.discard()
+            payload_path.unlink(missing_ok=True)
+
+    def discard(self):
+        """
+        Remove the run files and empty the buffer.
+        """
+        self.__codes = []
+        self.__buffered = 0
+        for run in self.runs:
+            run.unlink(missing_ok=True)
+        self.runs = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+        else:
+            self.discard()
+
+
+class BCSDFile:
+    """
+    A memory-mapped, read-only .bcsd file.
+    """
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.__data = np.memmap(self.path, dtype=np.uint8, mode='r')
+        if bytes(self.__data[:len(MAGIC)]) != MAGIC:
+            raise ValueError(str(self.path) + ' is not a bCSD file')
+        start = len(MAGIC) + 4
+        length = int(self.__data[len(MAGIC):start].view('<u4')[0])
+        self.header = json.loads(bytes(self.__data[start:start + length]).decode())
+        if self.header['version'] != VERSION:
+            raise ValueError('Unsupported bCSD version ' + str(self.header['version']))
+        self.shape = tuple(self.header['shape'])
+        self.threshold = self.header['threshold']
+        self.metadata = self.header['metadata']
+        self.block_size = self.header['block_size']
+        blocks = self.header['blocks']
+        start += length
+        self.__first_codes = self.__data[start:start + 8 * blocks].view('<u8')
+        self.__offsets = self.__data[start + 8 * blocks:start + 16 * blocks].view('<u8')
+        self.__payload = self.__data[start + 16 * blocks:]
+
+    def __len__(self) -> int:
+        return self.header['count']
+
+    def __contains__(self, point: tuple) -> bool:
+        return bool(self.contains_many(np.array([point]))[0])
+
+    def block(self, index: int) -> np.ndarray:
+        """
+        :param index: the index of a block
+        :return: the sorted Morton codes of the points of the block
+        """
+        start = int(self.__offsets[index])
+        end = int(self.__offsets[index + 1]) if index + 1 < len(self.__offsets) else len(self.__payload)
+        deltas = varint_decode(self.__payload[start:end])
+        # the first delta is relative to the last code of the previous block, the index holds the absolute code
+        deltas[:1] = self.__first_codes[index]
+        return np.cumsum(deltas, dtype=np.uint64)
+
+    def contains_many(self, points: np.ndarray) -> np.ndarray:
+        """
+        :param points: integer array of shape (N, d)
+        :return: a boolean array of shape (N,), True for the transition line points
+        """
+        points = np.asarray(points, dtype=np.intp).reshape(-1, len(self.shape))
+        inside = np.all((points >= 0) & (points < self.shape), axis=1)
+        result = np.zeros(len(points), dtype=bool)
+        if len(self) == 0 or not np.any(inside):
+            return result
+        codes = morton_encode(points[inside], self.shape)
+        # the block of each code, by binary search in the first codes of the blocks
+        blocks = np.searchsorted(self.__first_codes, codes, side='right') - 1
+        found = np.zeros(len(codes), dtype=bool)
+        for block in np.unique(blocks[blocks >= 0]):
+            selected = blocks == block
+            block_codes = self.block(block)
+            positions = np.minimum(np.searchsorted(block_codes, codes[selected]), len(block_codes) - 1)
+            found[selected] = block_codes[positions] == codes[selected]
+        result[inside] = found
+        return result
+
+    def codes(self) -> np.ndarray:
+        """
+        :return: the sorted Morton codes of all the points
+        """
+        return np.cumsum(varint_decode(self.__payload), dtype=np.uint64)
+
+    def points(self) -> np.ndarray:
+        """
+        :return: the transition line points in Morton order, an integer array of shape (N, d)
+        """
+        return morton_decode(self.codes(), self.shape)
+
+    def to_dense(self) -> np.ndarray:
+        """
+        :return: the dense boolean raster of the bCSD, True on the transition line points
+        """
+        raster = np.zeros(math.prod(self.shape), dtype=bool)
+        points = self.points()
+        raster[np.ravel_multi_index(tuple(points.T), self.shape)] = True
+        return raster.reshape(self.shape)
+
+
+def save_bCSD(bCSD, path: Path, shape: tuple, max_value: float = None, min_value: float = None,
+              metadata: dict = None, block_size: int = BLOCK_SIZE):
+    """
+    Save a bCSD in a .bcsd file, see BCSDWriter.
+
+    :param bCSD: the transition line points, an integer array of shape (N, d) or a list of coordinate tuples
+    """
+    with BCSDWriter(path, shape, max_value, min_value, metadata, block_size) as writer:
+        writer.append(bCSD)
@@ -0,0 +1,281 @@
+"""
+Compress many Charge Stability Diagrams (CSD), e.g. the thousands of diagrams of a sweep, across a pool of processes.
+
+The diagrams are sent to the workers by path, never pickled: the .npy, .bin/.raw and .chunks diagrams are
+memory-mapped by the QDSimulator of the worker, so their pages are read once from disk and shared through the page
+cache, and a .txt diagram is parsed once, by the worker compressing it.
+Each bCSD is saved in a compact .bcsd file, see the bCSDFile module, and each job appends a JSON line to the
+manifest.jsonl file of the output directory: the diagram, its status, the samples, the time and the size of the bCSD.
+
+A job running longer than the timeout is killed, with its worker, and a new worker takes its place.
+A rerun skips the diagrams whose last manifest line is a success, if their .bcsd file is newer than the diagram,
+so an interrupted sweep resumes where it stopped and the failed or timed out diagrams are retried.
+"""
+
+import argparse
+import contextlib
+import glob
+import io
+import json
+import multiprocessing
+import os
+import time
+import traceback
+from multiprocessing.connection import wait
+from pathlib import Path
+
+import numpy as np
+
+from src.QDSim.storage import CHUNKED_SUFFIX, RAW_SUFFIXES
+from src.flooder.flooder import Flooder
+from src.utilities.clock import Clock
+
+MANIFEST = 'manifest.jsonl'
+SUFFIXES = ('.txt', '.npy', CHUNKED_SUFFIX) + RAW_SUFFIXES
+FLOOD_MODES = ('queue', 'frontier', 'trace')
+# the statuses of the manifest lines
+OK = 'ok'
+ERROR = 'error'
+TIMEOUT = 'timeout'
+
+
+def find_diagrams(inputs) -> list:
+    """
+    :param inputs: paths of diagrams, of directories holding diagrams, or glob patterns
+    :return: the sorted paths of the diagrams, the files and .chunks directories with a diagram suffix
+    """
+    diagrams = set()
+    for pattern in inputs:
+        pattern = str(pattern)
+        paths = [Path(p) for p in glob.glob(pattern)] if glob.has_magic(pattern) else [Path(pattern)]
+        for path in paths:
+            if path.is_dir() and path.suffix.lower() != CHUNKED_SUFFIX:
+                paths.extend(sorted(path.iterdir()))
+            elif path.suffix.lower() in SUFFIXES and path.exists():
+                diagrams.add(path)
+    return sorted(diagrams)
+
+
+def output_path(diagram: Path, output: Path) -> Path:
+    """
+    :return: the path of the .bcsd file of a diagram in the output directory
+    """
+    return Path(output) / (Path(diagram).stem + '.bcsd')
+
+
+def read_manifest(output: Path) -> dict:
+    """
+    :param output: the output directory
+    :return: the last manifest line of each diagram, by diagram path
+    """
+    entries = dict()
+    path = Path(output) / MANIFEST
+    if path.exists():
+        with open(path) as f:
+            for line in f:
+                if line.strip():
+                    entry = json.loads(line)
+                    entries[entry['diagram']] = entry
+    return entries
+
+
+def is_done(diagram: Path, output: Path, entries: dict) -> bool:
+    """
+    :param entries: the manifest lines, see read_manifest
+    :return: whether the diagram was compressed by a previous run and was not modified since
+    """
+    entry = entries.get(str(diagram))
+    compressed = output_path(diagram, output)
+    return (entry is not None and entry['status'] == OK and compressed.exists()
+            and compressed.stat().st_mtime >= Path(diagram).stat().st_mtime)
+
+
+def compress(diagram: Path, output: Path, mode: str = 'frontier', seed: int = 0) -> dict:
+    """
+    Compress a diagram and save its bCSD in the output directory.
+    The .bcsd file is written under a temporary name and renamed, so a killed job never leaves a partial file.
+
+    :param diagram: the path of the diagram
+    :param output: the output directory
+    :param mode: the flood mode, see Flooder.run
+    :param seed: the seed of the random sampling
+    :return: the manifest line of the diagram
+    """
+    start = time.perf_counter()
+    np.random.seed(seed)
+    flooder = Flooder(diagram, clock=Clock())
+    with contextlib.redirect_stdout(io.StringIO()):
+        flooder.run(mode)
+    compressed = output_path(diagram, output)
+    partial = compressed.with_name(compressed.name + '.part')
+    flooder.save(partial, {'diagram': str(diagram), 'mode': mode, 'seed': seed})
+    os.replace(partial, compressed)
+    report = flooder.report()
+    return {
+        'diagram': str(diagram),
+        'status': OK,
+        'output': compressed.name,
+        'shape': list(flooder.sim.get_shape()),
+        'samples': report['samples'],
+        'unique_samples': report['unique_samples'],
+        'raster_samples': report['raster_samples'],
+        'bCSD_size': report['bCSD_size'],
+        'bytes': compressed.stat().st_size,
+        'time': time.perf_counter() - start,
+    }
+
+
+def worker(connection, output: Path, mode: str, seed: int):
+    """
+    The worker process: receive diagram paths from the connection until None, and send back their manifest lines.
+    """
+    while True:
+        diagram = connection.recv()
+        if diagram is None:
+            return
+        start = time.perf_counter()
+        try:
+            entry = compress(diagram, output, mode, seed)
+        except Exception as e:
+            entry = {'diagram': str(diagram), 'status': ERROR, 'error': repr(e), 'time': time.perf_counter() - start}
+            traceback.print_exc()
+        connection.send(entry)
+
+
+class BatchCompressor:
+    """
+    Compress diagrams across a pool of worker processes, see the batchCompressor module.
+    """
+
+    def __init__(self, output: Path, workers: int = None, timeout: float = None, mode: str = 'frontier',
+                 seed: int = 0):
+        """
+        :param output: the output directory, holding the .bcsd files and the manifest
+        :param workers: the number of worker processes, defaults to the number of CPUs
+        :param timeout: the maximum time of a job, in seconds, None for no limit
+        :param mode: the flood mode, see Flooder.run
+        :param seed: the seed of the random sampling, the same for all the diagrams
+        """
+        if mode not in FLOOD_MODES:
+            raise ValueError('Unknown flood mode ' + mode + ', expected one of ' + ', '.join(FLOOD_MODES))
+        self.output = Path(output)
+        self.workers = workers or os.cpu_count()
+        self.timeout = timeout
+        self.mode = mode
+        self.seed = seed
+        self.context = multiprocessing.get_context()
+
+    def start_worker(self) -> tuple:
+        """
+        :return: a new worker process and the parent end of its pipe
+        """
+        parent, child = self.context.Pipe()
+        process = self.context.Process(target=worker, args=(child, self.output, self.mode, self.seed), daemon=True)
+        process.start()
+        child.close()
+        return process, parent
+
+    def run(self, diagrams, force: bool = False) -> dict:
+        """
+        Compress the diagrams, skipping the ones already compressed, and append their lines to the manifest.
+
+        :param diagrams: the paths of the diagrams, see find_diagrams
+        :param force: compress all the diagrams, even the ones already compressed
+        :return: the summary of the run: the number of diagrams compressed, skipped, failed and timed out,
+            the wall time and the throughput, in diagrams and samples per second
+        """
+        self.output.mkdir(parents=True, exist_ok=True)
+        diagrams = [Path(d) for d in diagrams]
+        stems = [d.stem for d in diagrams]
+        if len(set(stems)) != len(stems):
+            duplicates = sorted({s for s in stems if stems.count(s) > 1})
+            raise ValueError('The diagrams must have distinct names, found ' + str(len(duplicates))
+                             + ' duplicated: ' + ', '.join(duplicates[:5]))
+        entries = read_manifest(self.output)
+        todo = [d for d in diagrams if force or not is_done(d, self.output, entries)]
+        summary = {'diagrams': len(diagrams), 'skipped': len(diagrams) - len(todo), OK: 0, ERROR: 0, TIMEOUT: 0,
+                   'samples': 0, 'raster_samples': 0, 'bytes': 0}
+        print('compressing', len(todo), 'diagrams,', summary['skipped'], 'already done, with',
+              min(self.workers, len(todo)), 'workers')
+        start = time.perf_counter()
+        pool = [self.start_worker() for _ in range(min(self.workers, len(todo)))]
+        # the job of each busy worker, by the parent end of its pipe: the diagram and its start time
+        jobs = dict()
+        pending = list(reversed(todo))
+        with open(self.output / MANIFEST, 'a') as manifest:
+            def record(entry: dict):
+                manifest.write(json.dumps(entry) + '\n')
+                manifest.flush()
+                summary[entry['status']] += 1
+                if entry['status'] == OK:
+                    for key in ('samples', 'raster_samples', 'bytes'):
+                        summary[key] += entry[key]
+                done = summary[OK] + summary[ERROR] + summary[TIMEOUT]
+                print(f"[{done}/{len(todo)}] {entry['diagram']}  {entry['status']}  {entry['time']:.2f}s")
+
+            try:
+                while pending or jobs:
+                    for i, (process, connection) in enumerate(pool):
+                        if connection not in jobs and pending:
+                            diagram = pending.pop()
+                            connection.send(diagram)
+                            jobs[connection] = (i, diagram, time.perf_counter())
+                    wait_time = None
+                    if self.timeout is not None:
+                        deadline = min(started for _, _, started in jobs.values()) + self.timeout
+                        wait_time = max(0.0, deadline - time.perf_counter())
+                    for connection in wait(list(jobs), wait_time):
+                        i, diagram, started = jobs.pop(connection)
+                        try:
+                            record(connection.recv())
+                        except EOFError:
+                            # the worker died, e.g. killed by the OS when out of memory
+                            record({'diagram': str(diagram), 'status': ERROR, 'error': 'worker died',
+                                    'time': time.perf_counter() - started})
+                            pool[i][0].join()
+                            connection.close()
+                            pool[i] = self.start_worker()
+                    now = time.perf_counter()
+                    for connection, (i, diagram, started) in list(jobs.items()):
+                        if self.timeout is not None and now - started >= self.timeout:
+                            del jobs[connection]
+                            pool[i][0].kill()
+                            pool[i][0].join()
+                            connection.close()
+                            record({'diagram': str(diagram), 'status': TIMEOUT, 'time': now - started})
+                            pool[i] = self.start_worker()
+            finally:
+                for process, connection in pool:
+                    if process.is_alive():
+                        if connection in jobs:
+                            process.kill()
+                        else:
+                            connection.send(None)
+                    process.join()
+                    connection.close()
+        summary['time'] = time.perf_counter() - start
+        summary['diagrams_per_second'] = summary[OK] / summary['time'] if summary['time'] > 0 else 0.0
+        summary['samples_per_second'] = summary['samples'] / summary['time'] if summary['time'] > 0 else 0.0
+        print(f"compressed {summary[OK]} diagrams in {summary['time']:.2f}s: "
+              f"{summary['diagrams_per_second']:.2f} diagrams/s, {summary['samples_per_second']:.0f} samples/s, "
+              f"{summary['samples']}/{summary['raster_samples']} points sampled, {summary['bytes']} bytes of bCSD, "
+              f"{summary['skipped']} skipped, {summary[ERROR]} failed, {summary[TIMEOUT]} timed out")
+        return summary
+
+
+def main(argv=None) -> dict:
+    parser = argparse.ArgumentParser(description='Compress the CSD diagrams of a directory or of a glob pattern.')
+    parser.add_argument('inputs', nargs='+', help='diagrams, directories of diagrams or glob patterns')
+    parser.add_argument('--output', type=Path, required=True, help='the directory of the .bcsd files and manifest')
+    parser.add_argument('--workers', type=int, default=None, help='the number of processes, defaults to the CPUs')
+    parser.add_argument('--timeout', type=float, default=None, help='the maximum time of a diagram, in seconds')
+    parser.add_argument('--mode', choices=FLOOD_MODES, default='frontier', help='the flood mode, see Flooder.run')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--force', action='store_true', help='compress again the diagrams already compressed')
+    args = parser.parse_args(argv)
+    compressor = BatchCompressor(args.output, args.workers, args.timeout, args.mode, args.seed)
+    return compressor.run(find_diagrams(args.inputs), args.force)
+
+
+if __name__ == '__main__':
+    main()
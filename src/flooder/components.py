@@ -0,0 +1,116 @@
+"""
+Connected components of the bCSD, the transition lines.
+
+Two transition line points are connected if one is in the stencil of the other, the d-infinity neighbors by default.
+The components are labeled with a union-find over the pairs of connected points, without sampling the simulator.
+The tiled variant labels each tile on its own, e.g. in a process pool, then merges the labels across the tile borders.
+"""
+
+import itertools
+import math
+
+import numpy as np
+
+from src.utilities.neighbours import neighbor_offsets, neighbor_pairs
+from src.utilities.unionFind import UnionFind
+
+
+def connected_pairs(points: np.ndarray, shape: tuple, stencil: np.ndarray, sources: np.ndarray = None) -> tuple:
+    """
+    :param points: the transition line points, an integer array of shape (N, d)
+    :param shape: the dimensions of the simulated space
+    :param stencil: the neighbor offsets
+    :param sources: if given, the indexes of the points whose neighbors are searched, defaults to all the points
+    :return: two integer arrays i and j of the indexes of the connected points points[i] and points[j]
+    """
+    flat = np.ravel_multi_index(tuple(points.T), shape)
+    order = np.argsort(flat)
+    sorted_flat = flat[order]
+    sources = np.arange(len(points)) if sources is None else sources
+    pairs, neighbors = neighbor_pairs(points[sources], shape, stencil)
+    neighbors = np.ravel_multi_index(tuple(neighbors.T), shape)
+    positions = np.minimum(np.searchsorted(sorted_flat, neighbors), max(len(points) - 1, 0))
+    found = sorted_flat[positions] == neighbors
+    return sources[pairs[found]], order[positions[found]]
+
+
+def label_points(points: np.ndarray, shape: tuple, stencil: np.ndarray = None) -> np.ndarray:
+    """
+    :param points: the transition line points, an integer array of shape (N, d)
+    :param shape: the dimensions of the simulated space
+    :param stencil: the neighbor offsets, defaults to the d-infinity neighbors
+    :return: the component of each point, numbered from 0
+    """
+    points = np.asarray(points, dtype=np.intp).reshape(-1, len(shape))
+    stencil = neighbor_offsets(len(shape)) if stencil is None else stencil
+    union_find = UnionFind(len(points))
+    if len(points):
+        union_find.union(*connected_pairs(points, shape, stencil))
+    return union_find.compact(np.arange(len(points)))
+
+
+def label_tiles(points: np.ndarray, shape: tuple, stencil: np.ndarray = None, tile=64, executor=None) -> np.ndarray:
+    """
+    This method labels the points like label_points, tile by tile.
+    Each tile is labeled on its own, then the labels of the points connected across the tile borders are merged.
+
+    :param points: the transition line points, an integer array of shape (N, d)
+    :param shape: the dimensions of the simulated space
+    :param stencil: the neighbor offsets, defaults to the d-infinity neighbors
+    :param tile: the shape of a tile, or its edge length in all the dimensions
+    :param executor: if given, a concurrent.futures executor labeling the tiles in parallel
+    :return: the component of each point, numbered from 0
+    """
+    dimension = len(shape)
+    points = np.asarray(points, dtype=np.intp).reshape(-1, dimension)
+    stencil = neighbor_offsets(dimension) if stencil is None else stencil
+    tile = np.broadcast_to(np.asarray(tile, dtype=np.intp), (dimension,))
+    grid = tuple(math.ceil(s / t) for s, t in zip(shape, tile))
+    tiles = np.ravel_multi_index(tuple((points // tile).T), grid)
+
+    # label each tile on its own
+    order = np.argsort(tiles, kind='stable')
+    starts = np.flatnonzero(np.diff(tiles[order], prepend=-1))
+    groups = np.split(order, starts[1:]) if len(points) else []
+    mapper = map if executor is None else executor.map
+    local_labels = mapper(label_points, [points[group] for group in groups], itertools.repeat(shape),
+                          itertools.repeat(stencil))
+    labels = np.empty(len(points), dtype=np.int64)
+    count = 0
+    for group, local in zip(groups, local_labels):
+        labels[group] = local + count
+        count += int(local.max(initial=-1)) + 1
+
+    # merge the labels across the tile borders, only the points within the stencil reach of a border have such pairs
+    reach = np.max(np.abs(stencil), axis=0)
+    position = points % tile
+    border = np.flatnonzero(np.any((position < reach) | (position >= tile - reach), axis=1))
+    union_find = UnionFind(count)
+    if len(border):
+        i, j = connected_pairs(points, shape, stencil, border)
+        across = tiles[i] != tiles[j]
+        union_find.union(labels[i[across]], labels[j[across]])
+    return union_find.compact(labels)
+
+
+def split_components(points: np.ndarray, labels: np.ndarray) -> list:
+    """
+    :param points: the transition line points, an integer array of shape (N, d)
+    :param labels: the component of each point, see label_points
+    :return: a list with a dict per component, sorted by label, holding its label, its size, its points
+        and its bounding box, the min and max coordinates of its points
+    """
+    points = np.asarray(points, dtype=np.intp)
+    labels = np.asarray(labels)
+    order = np.argsort(labels, kind='stable')
+    starts = np.flatnonzero(np.diff(labels[order], prepend=-1))
+    result = []
+    for group in (np.split(order, starts[1:]) if len(points) else []):
+        component = points[group]
+        result.append({
+            'label': int(labels[group[0]]),
+            'size': len(group),
+            'points': component,
+            'bounding_box': (component.min(axis=0), component.max(axis=0)),
+        })
+    return result
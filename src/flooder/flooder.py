@@ -1,3 +1,4 @@
+import contextlib
 import math
 from pathlib import Path
 import queue
@@ -5,9 +6,45 @@ import queue
 import numpy as np
 
 from src.QDSim.QDSimulator import QDSimulator
-from src.utilities.sampling import batch_random_sampling
-from src.utilities.neighbours import d_infinity_neighbors
-from src.utilities.orderedSetQueue import OrderedSetQueue
+from src.QDSim.sampleCache import SampleCache
+from src.flooder.bCSDFile import save_bCSD
+from src.flooder.checkpoint import Checkpointer, read_records
+from src.flooder.components import label_points, label_tiles, split_components
+from src.utilities.clock import Clock
+from src.utilities.frontierQueue import FrontierQueue
+from src.utilities.sampling import SampledSet, batch_random_sampling, make_sampler
+from src.utilities.neighbours import neighbor_offsets, neighbor_pairs, neighbors_many
+from src.utilities.unionFind import UnionFind
+
+# the states of a point in the visited array of the frontier flood, 0 if the point has not been sampled yet
+SAMPLED = 1
+LINE = 2
+
+
+def lookup(keys: np.ndarray, values: np.ndarray) -> tuple:
+    """
+    :param keys: a sorted integer array
+    :param values: an integer array
+    :return: the position of each value in keys, and whether it is found there
+    """
+    position = np.minimum(np.searchsorted(keys, values), max(len(keys) - 1, 0))
+    found = keys[position] == values if len(keys) else np.zeros(len(values), dtype=bool)
+    return position, found
+
+
+def neighbor_table(points: np.ndarray, shape: tuple, offsets: np.ndarray) -> tuple:
+    """
+    :param points: integer array of shape (N, d)
+    :param shape: the dimensions of the space
+    :param offsets: the stencil, an integer array of shape (k, d)
+    :return: the linear index of each neighbor, an integer array of shape (N, k),
+        and whether the neighbor is inside the space, a boolean array of shape (N, k).
+        The index of a neighbor outside the space is the one of the nearest point inside
+    """
+    neighbors = points[:, None, :] + offsets[None, :, :]
+    inside = np.all((neighbors >= 0) & (neighbors < shape), axis=-1)
+    clipped = np.clip(neighbors, 0, np.array(shape) - 1)
+    return np.ravel_multi_index(tuple(np.moveaxis(clipped, -1, 0)), shape), inside
 
 
 class Flooder:
@@ -21,12 +58,49 @@ class Flooder:
     - The compression process is O(volume_(transition line)) = O(d * s ^ (d-1))
     """
 
-    def __init__(self, path: Path()):
-        self.sim = QDSimulator(path)
+    def __init__(self, path: Path(), cache_size: int = None, clock: Clock = None, stencil: np.ndarray = None,
+                 checkpoint: Path = None, checkpoint_interval: float = 60.0):
+        """
+        :param path: the path of the CSD to compress, or a simulator with the get_shape, sample and sample_many methods,
+            e.g. a ConstantInteractionSimulator computing the CSD on demand
+        :param cache_size: if given, the simulator samples are memoized in a SampleCache of at most cache_size points
+        :param clock: if given, the samples and the phases of the run are recorded on the clock, see the report method
+        :param stencil: the neighbor offsets used by the floods, an integer array of shape (n, d),
+            defaults to the d-infinity neighbors at distance 1. A wider stencil, e.g. neighbor_offsets(d, 2),
+            lets the flood jump the gaps of noisy transition lines, at the cost of more samples
+        :param checkpoint: if given, the frontier flood appends its state to this checkpoint file,
+            to continue with the resume method if the process dies, see the checkpoint module.
+            The file is started anew by each frontier flood, and only the frontier flood writes checkpoints:
+            a run dying before its flood, e.g. in the random sampling, has no checkpoint and is run again
+        :param checkpoint_interval: the minimum time between two checkpoints, in seconds
+        """
+        self.clock = clock
+        self.sim = QDSimulator(path) if isinstance(path, (str, Path)) else path
+        if cache_size is not None:
+            self.sim = SampleCache(self.sim, cache_size)
+        dimension = len(self.sim.get_shape())
+        self.stencil = neighbor_offsets(dimension) if stencil is None else np.asarray(stencil, dtype=np.intp)
+        if self.stencil.ndim != 2 or self.stencil.shape[1] != dimension:
+            raise ValueError('The stencil must have shape (n, ' + str(dimension) + '), got ' + str(self.stencil.shape))
         self.max_value = None
         self.min_value = None
-        self.to_process = OrderedSetQueue()
+        self.to_process = self.make_queue()
         self.bCSD = []
+        # the component of each point of the bCSD, an array per step of the flood, if the flood labels the components,
+        # see the components method
+        self.labels = []
+        self.union_find = UnionFind()
+        self.checkpointer = None
+        if checkpoint is not None:
+            self.checkpointer = Checkpointer(checkpoint, checkpoint_interval)
+            if isinstance(self.sim, SampleCache):
+                self.sim.journal = []
+
+    def make_queue(self) -> queue.Queue:
+        """
+        :return: the process queue of the floods, a FrontierQueue with a bitmap of the simulated space
+        """
+        return FrontierQueue(self.sim.get_shape())
 
     def estimate_batch_size(self) -> int:
         """
@@ -87,6 +161,7 @@ class Flooder:
         This is wrong for two reasons:
         First, I don't expect the result to be a function of just d and l, without s. I would rather expect d and a tile density factor l/s.
         Second, if I plot the solution (see screenshot) I see that the solution does not grows with d, on the contrary it decreases exponentially, which is wrong.
+        The sequential_sampling method avoids the estimate: it measures p while sampling, see its docstring.
 
         :return: the estimated batch size
         """
@@ -99,7 +174,7 @@ class Flooder:
         print('sampling batch size is ', batch_size)
         return batch_size
 
-    def random_sampling(self, batch_size: int) -> queue.Queue():
+    def random_sampling(self, batch_size: int, sampler: str = 'uniform') -> queue.Queue():
         """
         This method samples the simulator at random to get some transition line points.
         Sampled points are used to normalize the CSD values and initiate the compression process queue.
@@ -107,27 +182,114 @@ class Flooder:
         TODO parallelize the sampling process
 
         :param batch_size: the size of the batch to sample
+        :param sampler: the strategy drawing the points, one of the SAMPLERS of the sampling module
         :return: the process queue initialized with some transition line points
         """
 
         # sample the batch
-        batch_sample = batch_random_sampling(self.sim, batch_size)
+        sampler = make_sampler(sampler, self.sim.get_shape())
+        coords, values = batch_random_sampling(self.sim, batch_size, self.clock, sampler)
+        return self.seed(coords, values)
 
-        # extract the max and min values of the batch sample dict values
-        self.max_value = max(batch_sample.values())
+    def sequential_sampling(self, round_size: int = 64, confidence: float = 0.99, min_seeds: int = 1,
+                            budget: int = None, sampler: str = 'uniform') -> queue.Queue():
+        """
+        This method samples the simulator at random in small vectorized rounds, until it has enough transition line seeds,
+        instead of sampling a batch whose size is guessed in advance by estimate_batch_size.
+
+        After each round the max and min values, hence the threshold, and the transition line points are updated.
+        The sampling stops when:
+        - the threshold did not change in the last round, i.e. no new extreme value was sampled, and
+        - at least min_seeds transition line points were sampled, and
+        - the samples reach the confidence level of the estimate_batch_size proof, with the probability p of sampling a
+          transition line point estimated by the fraction of transition line points sampled so far:
+          1 - (1 - p) ^ b >= confidence, where b is the number of samples.
+          Since p = k / b for k seeds, this requires about k >= -log(1 - confidence) seeds, e.g. 5 seeds for 99%.
+        or when the budget of samples is exhausted.
+        A point is never sampled twice, and the samples stop as soon as the seeding is reliable,
+        instead of over-sampling large diagrams or missing the transition lines of small ones.
+
+        :param round_size: the number of points drawn in a round
+        :param confidence: the confidence level of sampling the transition lines
+        :param min_seeds: the minimum number of transition line points to sample
+        :param budget: the maximum number of samples, defaults to the volume of the simulator
+        :param sampler: the strategy drawing the points, one of the SAMPLERS of the sampling module,
+            the rounds continue the same sequence
+        :return: the process queue initialized with some transition line points
+        """
+        rounds = self.sampling_rounds(round_size, confidence, min_seeds, budget, sampler)
+        coords, values = [], []
+        try:
+            points = next(rounds)
+            while True:
+                coords.append(points)
+                values.append(self.sim.sample_many(points, self.clock))
+                points = rounds.send(values[-1])
+        except StopIteration:
+            pass
+        return self.seed(np.concatenate(coords), np.concatenate(values))
+
+    def sampling_rounds(self, round_size: int = 64, confidence: float = 0.99, min_seeds: int = 1, budget: int = None,
+                        sampler: str = 'uniform'):
+        """
+        The rounds of the sequential_sampling method, as a generator decoupled from the simulator:
+        it yields the points of a round and is sent back their values, until the sampling stops.
+        The rounds can then be sampled by a synchronous or an asynchronous simulator, see sequential_sampling.
+
+        :return: a generator yielding the integer array of shape (n, d) of the points of each round
+        """
+        shape = self.sim.get_shape()
+        sampler = make_sampler(sampler, shape)
+        volume = math.prod(shape)
+        budget = volume if budget is None else min(budget, volume)
+        sampled = SampledSet(shape)
+        values = []
+        samples = seeds = 0
+        max_value, min_value, threshold = -np.inf, np.inf, None
+        while samples < budget:
+            # draw a round of new points
+            points = sampled.add(sampler.draw(min(round_size, budget - samples)))
+            # the caller samples the round and sends back its values
+            round_values = yield points
+            values.append(np.asarray(round_values))
+            samples += len(points)
+
+            # update the threshold and count the transition line points
+            max_value = max(float(np.max(values[-1], initial=-np.inf)), max_value)
+            min_value = min(float(np.min(values[-1], initial=np.inf)), min_value)
+            previous, threshold = threshold, (max_value + min_value) / 2
+            if threshold == previous:
+                seeds += int(np.count_nonzero(values[-1] >= threshold))
+            else:
+                # a new extreme value moved the threshold, the earlier rounds are counted again
+                seeds = sum(int(np.count_nonzero(v >= threshold)) for v in values)
+            p = seeds / samples
+            # no transition line point sampled yet, p = 0, never reaches the confidence level
+            if threshold == previous and seeds >= min_seeds and p > 0 \
+                    and (p >= 1 or samples >= math.log(1 - confidence) / math.log(1 - p)):
+                break
+
+        print('sequential sampling samples are ', samples)
+
+    def seed(self, coords: np.ndarray, values: np.ndarray) -> queue.Queue():
+        """
+        This method uses a batch of samples to normalize the CSD values and initiate the compression process queue.
+
+        :param coords: integer array of shape (n, d), the sampled points
+        :param values: array of shape (n,), the sampled values
+        :return: the process queue initialized with the transition line points of the batch
+        """
+        # extract the max and min values of the batch sample
+        self.max_value = float(values.max())
         print('max value is ', self.max_value)
-        self.min_value = min(batch_sample.values())
+        self.min_value = float(values.min())
         print('min value is ', self.min_value)
 
         # rectify the batch sample
-        rectified_batch_sample = dict()
-        for key, value in batch_sample.items():
-            rectified_batch_sample[key] = self.normalize(value)
+        rectified_batch_sample = self.normalize_many(values)
 
         # extract the transition line points from the batch sample
-        for key, value in rectified_batch_sample.items():
-            if value == 1:
-                self.to_process.put(key)
+        self.to_process.put_many(coords[rectified_batch_sample == 1])
 
         return self.to_process
 
@@ -147,18 +309,33 @@ class Flooder:
         else:
             return 1
 
-    def get_transition_line_neighbors(self, point: tuple, distance: int = 1) -> list:
+    def normalize_many(self, values: np.ndarray) -> np.ndarray:
+        """
+        Vectorized version of the normalize method, rectifies a whole array of CSD values at once.
+
+        :param values: the CSD values to normalize
+        :return: an integer array of the same shape as values, with the normalized values, either 0 or 1
+        """
+        if self.max_value is None or self.min_value is None:
+            raise ValueError('Max and min values are not set. Please run the sample method first')
+
+        average = (self.max_value + self.min_value) / 2
+        return (np.asarray(values) >= average).astype(np.int8)
+
+    def get_transition_line_neighbors(self, point: tuple, distance: int = None) -> list:
         """
         This method returns the neighbors of a given point if such neighbors are in the transition line.
-        A d-infinity norm is used, see the d_infinity_neighbors method in the utilities module for more details.
+        The neighbors are given by the stencil of the flooder, see the neighbor_offsets method in the utilities module.
 
         :param point: the coordinates of the target point
-        :param distance: the distance from the point
+        :param distance: if given, the d-infinity neighbors at this distance are used instead of the stencil
         :return: the coordinates of the transition line neighbors of the given point
         """
+        shape = self.sim.get_shape()
+        offsets = self.stencil if distance is None else neighbor_offsets(len(shape), distance)
         neighbors = []
-        for neighbor in d_infinity_neighbors(point, self.sim.get_shape(), distance):
-            if self.normalize(self.sim.sample(neighbor)) == 1:
+        for neighbor in map(tuple, neighbors_many(np.array([point]), shape, offsets).tolist()):
+            if self.normalize(self.sim.sample(neighbor, self.clock)) == 1:
                 neighbors.append(neighbor)
         return neighbors
 
@@ -180,7 +357,7 @@ class Flooder:
             # get a point in the queue to be processed
             # TODO add mutex on the following two lines to prevent the race condition at:
             #  if neighbor not in self.bCSD: to_process.put(neighbor) ????
-            #  or perhaps implement the following two lines in the OrderedSetQueue class
+            #  or perhaps implement the following two lines in the FrontierQueue class
             point = to_process.get()
             self.bCSD.append(point)
             # get the neighbors of the point
@@ -197,12 +374,376 @@ class Flooder:
 
         print('bCSD is: ', self.bCSD)
 
-    def run(self) -> list:
+    def frontier_flood(self, to_process: queue.Queue):
+        """
+        This method fills the compressed binary CSD (bCSD) like the flood method, but it expands the whole frontier at once
+        instead of one point at a time.
+
+        At each step, the neighbor offsets of the stencil are broadcast over the frontier array, the neighbors outside the
+        simulated space are dropped and the remaining ones are deduplicated against a dense boolean visited array.
+        All the new candidates are then sampled and rectified with a single bulk call, and the transition line points
+        among them become the next frontier.
+        A point is sampled at most once, and a membership check costs O(1) instead of O(len(bCSD)),
+        so the flood is linear in the volume of the transition lines instead of quadratic.
+
+        The resulting bCSD holds the same points as the one of the flood method, possibly in a different order.
+
+        The flood also labels the connected components of the bCSD: each seed starts a component, a new transition line
+        point joins the component of a frontier point it is a neighbor of, and the components of two neighbor
+        transition line points are merged with a union-find, e.g. when the floods of two seeds meet.
+        Two neighbor transition line points are at most one step apart in the flood, so the labels are only looked up
+        in the frontier and in the new transition line points: the visited array takes a byte per point of the
+        simulated space, and the labels a label per transition line point and a union-find entry per seed.
+
+        :param to_process: the process queue initialized with some transition line points
+        """
+        shape = self.sim.get_shape()
+        dimension = len(shape)
+        # visited[i] is SAMPLED if the point of linear index i has been sampled and is not a transition line point,
+        # LINE if it is a transition line point, or 0 if it has not been sampled yet
+        visited = np.zeros(math.prod(shape), dtype=np.uint8)
+
+        # the seeds are the first frontier, each one starts a component
+        seeds = []
+        while not to_process.empty():
+            seeds.append(to_process.get())
+        frontier = np.ravel_multi_index(tuple(np.array(seeds, dtype=np.intp).reshape(-1, dimension).T), shape)
+        visited[frontier] = LINE
+        labels = self.union_find.add(len(frontier))
+        self.bCSD.extend(seeds)
+        self.labels.append(labels)
+        # the frontier is kept sorted, to look its points up
+        order = np.argsort(frontier, kind='stable')
+        self.expand_frontier(visited, frontier[order], labels[order], [frontier])
+
+    def expand_frontier(self, visited: np.ndarray, frontier: np.ndarray, frontier_labels: np.ndarray, sampled: list,
+                        resumed: bool = False):
+        """
+        The loop of the frontier_flood method, which writes the checkpoints.
+
+        :param visited: the state of each point, see frontier_flood
+        :param frontier: the sorted linear indexes of the frontier
+        :param frontier_labels: the component of each point of the frontier
+        :param sampled: the linear indexes of the points sampled since the last checkpoint
+        :param resumed: True if the flood is resumed from a checkpoint, False if it is starting
+        """
+        shape = self.sim.get_shape()
+        if self.checkpointer is not None and not resumed:
+            # a new flood does not continue the records of a previous run
+            self.checkpointer.start()
+            self.write_checkpoint('start', visited, frontier, frontier_labels, sampled)
+
+        while len(frontier):
+            # broadcast the stencil over the frontier, deduplicate the candidates and skip the points already sampled
+            sources, neighbors = neighbor_pairs(np.stack(np.unravel_index(frontier, shape), axis=-1), shape,
+                                                self.stencil)
+            neighbors = np.ravel_multi_index(tuple(neighbors.T), shape)
+            # the components of two neighbor frontier points merge
+            position, found = lookup(frontier, neighbors)
+            self.union_find.union(frontier_labels[sources[found]], frontier_labels[position[found]])
+            flat = np.unique(neighbors[visited[neighbors] == 0])
+            candidates = np.stack(np.unravel_index(flat, shape), axis=-1)
+            # sample and rectify all the candidates at once, the transition line points are the next frontier
+            line = self.normalize_many(self.sim.sample_many(candidates, self.clock)) == 1
+            visited[flat] = np.where(line, LINE, SAMPLED)
+            # a new transition line point joins the component of one of its frontier neighbors,
+            # and the components of all its frontier neighbors merge
+            new = flat[line]
+            position, found = lookup(new, neighbors)
+            labels = np.empty(len(new), dtype=np.int64)
+            labels[position[found]] = frontier_labels[sources[found]]
+            self.union_find.union(frontier_labels[sources[found]], labels[position[found]])
+            frontier, frontier_labels = new, labels
+            self.bCSD.extend(map(tuple, candidates[line].tolist()))
+            self.labels.append(labels)
+            if self.checkpointer is not None:
+                sampled.append(flat)
+                if self.checkpointer.due():
+                    self.write_checkpoint('step', visited, frontier, frontier_labels, sampled)
+
+        if self.checkpointer is not None:
+            self.write_checkpoint('done', visited, frontier, frontier_labels, sampled)
+        print('bCSD size is: ', len(self.bCSD))
+
+    def write_checkpoint(self, kind: str, visited: np.ndarray, frontier: np.ndarray, frontier_labels: np.ndarray,
+                         sampled: list):
+        """
+        This method appends the delta of the flood state since the last checkpoint to the checkpoint file.
+        The points added to the bCSD since then are the transition line points among the sampled ones,
+        in the same order, so they are not written twice.
+
+        :param kind: 'start', 'step' or 'done'
+        :param visited: the state of each point, see frontier_flood
+        :param frontier: the linear indexes of the frontier
+        :param frontier_labels: the component of each point of the frontier
+        :param sampled: the linear indexes of the points sampled at each step since the last checkpoint, emptied
+        """
+        with self.checkpointer.measure():
+            shape = self.sim.get_shape()
+            sampled_flat = np.concatenate(sampled) if sampled else np.empty(0, dtype=np.intp)
+            # the labels of the transition line points of the same steps
+            line_labels = np.concatenate(self.labels[len(self.labels) - len(sampled):]) if sampled \
+                else np.empty(0, dtype=np.int64)
+            sampled.clear()
+            rng = np.random.get_state()
+            meta = {
+                'kind': kind,
+                'shape': list(shape),
+                'max_value': self.max_value,
+                'min_value': self.min_value,
+                'rng': [rng[0], int(rng[2]), int(rng[3]), float(rng[4])],
+                'clock': None if self.clock is None else [self.clock.time, self.clock.requests, self.clock.unique],
+            }
+            arrays = {
+                'sampled': sampled_flat,
+                'sampled_line': visited[sampled_flat] == LINE,
+                'line_labels': line_labels,
+                'frontier': frontier,
+                'frontier_labels': frontier_labels,
+                'parent': self.union_find.parent,
+                'stencil': self.stencil,
+                'rng_keys': rng[1],
+            }
+            if kind == 'start' and self.clock is not None:
+                # the points sampled before the flood, the later ones are the sampled points of the records
+                arrays['clock_seen'] = self.clock.get_seen()
+            if isinstance(self.sim, SampleCache) and self.sim.journal is not None:
+                journal = self.sim.journal
+                arrays['cache_points'] = np.array([key for key, _ in journal], dtype=np.intp).reshape(-1, len(shape))
+                arrays['cache_values'] = np.array([value for _, value in journal], dtype=float)
+                journal.clear()
+            self.checkpointer.write(meta, arrays)
+
+    def resume(self, path: Path) -> list:
+        """
+        This method restores the state of a frontier flood from its checkpoint file, and continues the flood exactly
+        where it stopped: the bCSD, its components, the threshold, the sampled points, the frontier,
+        the samples of the cache, the clock counters
+        and the points the clock has seen, and the state of the random generator.
+        The new checkpoints are appended to the checkpoint file of the flooder, if any.
+
+        :param path: the path of the checkpoint file
+        :return: the compressed binary CSD (bCSD)
+        """
+        records = read_records(path)
+        if not records:
+            raise ValueError('No checkpoint in ' + str(path))
+        shape = self.sim.get_shape()
+        if tuple(records[0][0]['shape']) != tuple(shape):
+            raise ValueError('The checkpoint shape ' + str(records[0][0]['shape']) + ' does not match ' + str(shape))
+        visited = np.zeros(math.prod(shape), dtype=np.uint8)
+        for meta, arrays in records:
+            line = arrays['sampled_line']
+            visited[arrays['sampled']] = np.where(line, LINE, SAMPLED)
+            self.bCSD.extend(map(tuple, np.stack(np.unravel_index(arrays['sampled'][line], shape), axis=-1).tolist()))
+            self.labels.append(arrays['line_labels'])
+            if isinstance(self.sim, SampleCache) and 'cache_points' in arrays:
+                self.sim.load(arrays['cache_points'], arrays['cache_values'])
+        if isinstance(self.sim, SampleCache) and self.sim.journal is not None:
+            # the samples of the checkpoint file are not written again
+            self.sim.journal.clear()
+        meta, arrays = records[-1]
+        self.max_value, self.min_value = meta['max_value'], meta['min_value']
+        self.stencil = arrays['stencil']
+        self.union_find.parent = arrays['parent'].copy()
+        name, position, has_gauss, cached_gaussian = meta['rng']
+        np.random.set_state((name, arrays['rng_keys'], position, has_gauss, cached_gaussian))
+        if self.clock is not None and meta['clock'] is not None:
+            # the unique samples of the continued flood are counted against the points sampled before the checkpoint
+            seen = [record['sampled'] for _, record in records] + [records[0][1].get('clock_seen', [])]
+            self.clock.mark(np.concatenate(seen).astype(np.intp), shape)
+            self.clock.add(*meta['clock'])
+        print('resumed from ', len(records), ' checkpoints, bCSD size is: ', len(self.bCSD))
+
+        if meta['kind'] != 'done':
+            with self.phase('flood'):
+                self.expand_frontier(visited, arrays['frontier'], arrays['frontier_labels'], [], resumed=True)
+        return self.bCSD
+
+    def trace_flood(self, to_process: queue.Queue, smoothing: float = 0.3, window: int = 2,
+                    collinearity: float = 0.2, margin: float = 0.1):
+        """
+        This method fills the compressed binary CSD (bCSD) like the frontier_flood method, but it follows thin
+        transition lines along their direction instead of sampling the whole stencil around each point.
+
+        Each transition line point carries the direction the line was followed in: the step from the point it was found
+        from, smoothed with the direction of that point. Where the transition line points already found in the window
+        around a point are collinear, the line is predicted to continue in this direction, and only the stencil offsets
+        of the unit cell around it are sampled, e.g. the 2 ^ (d - 1) offsets ahead of a diagonal line,
+        and only one ahead of a line along an axis, instead of the 3 ^ d - 1 offsets of the stencil.
+        The rest of the stencil is sampled only where the prediction finds no new transition line point,
+        at the endpoints of the lines and at their bends, and the whole stencil is sampled around the seeds,
+        and where the known points are not collinear, at the junctions and on the transition planes.
+        Like in the frontier_flood method, the points of a step are sampled with a bulk call, at most two per step,
+        and each point is sampled at most once.
+
+        The bCSD holds the same points as the one of the frontier_flood method on clean diagrams of thin lines,
+        with about 0.5 to 0.8 of its samples on generated polylines and honeycombs, in 2 to 4 dimensions,
+        and about 0.25 to 0.55 of them on straight lines. On transition planes the whole stencil is sampled.
+        It is an approximation: a transition line leaving a followed line where the known points are still collinear
+        is only found from its own seeds, e.g. a line crossing straight through another one in a square diagram,
+        and so is a point of a noisy line beside the predicted cell.
+        The frontier_flood method is exact, the trace_flood method trades this for fewer samples on thin lines.
+
+        :param to_process: the process queue initialized with some transition line points
+        :param smoothing: the weight of the last step in the direction of a point, between 0 and 1,
+            the direction of the point it was found from weighs 1 - smoothing
+        :param window: the d-infinity radius of the window of the collinearity check
+        :param collinearity: the points of the window are collinear if the second largest eigenvalue of their
+            covariance is at most collinearity times the largest one
+        :param margin: an offset is in the predicted cell if it is at most 1 - margin from the predicted continuation
+            in each dimension, the margin drops the offsets the direction only grazes
+        """
+        shape = self.sim.get_shape()
+        dimension = len(shape)
+        visited = np.zeros(math.prod(shape), dtype=np.uint8)
+        stencil = self.stencil
+        # the window of the collinearity check, centered on the point
+        around = np.concatenate([neighbor_offsets(dimension, window), np.zeros((1, dimension), dtype=np.intp)])
+
+        seeds = []
+        while not to_process.empty():
+            seeds.append(to_process.get())
+        frontier = np.unique(np.ravel_multi_index(tuple(np.array(seeds, dtype=np.intp).reshape(-1, dimension).T),
+                                                  shape))
+        visited[frontier] = LINE
+        self.bCSD.extend(map(tuple, np.stack(np.unravel_index(frontier, shape), axis=-1).tolist()))
+        # the seeds have no direction, the whole stencil is sampled around them
+        direction = np.zeros((len(frontier), dimension))
+
+        while len(frontier):
+            points = np.stack(np.unravel_index(frontier, shape), axis=-1)
+            # the collinearity of the transition line points found in the window around each point
+            indexes, inside = neighbor_table(points, shape, around)
+            known = (inside & (visited[indexes] == LINE)).astype(float)
+            mean = known @ around / known.sum(axis=1)[:, None]
+            centered = around[None, :, :] - mean[:, None, :]
+            eigenvalues = np.linalg.eigvalsh(np.einsum('nw,nwi,nwj->nij', known, centered, centered))
+            collinear = eigenvalues[:, -2] <= collinearity * eigenvalues[:, -1] if dimension > 1 else True
+            # the predicted cell of each point, the whole stencil if the direction is unknown or not reliable
+            norm = np.max(np.abs(direction), axis=1)
+            guided = (norm > 0) & collinear
+            continuation = direction / np.where(guided, norm, 1)[:, None]
+            predicted = np.all(np.abs(stencil[None, :, :] - continuation[:, None, :]) < 1 - margin, axis=-1)
+            predicted |= ~guided[:, None]
+
+            indexes, inside = neighbor_table(points, shape, stencil)
+            probed = predicted & inside & (visited[indexes] == 0)
+            self.sample_flat(visited, indexes[probed])
+            found = probed & (visited[indexes] == LINE)
+            # the rest of the stencil of the points whose prediction found no new transition line point
+            fallback = guided & ~np.any(found, axis=1)
+            probed = fallback[:, None] & ~predicted & inside & (visited[indexes] == 0)
+            self.sample_flat(visited, indexes[probed])
+            found |= probed & (visited[indexes] == LINE)
+
+            # the direction of each new transition line point, from the first point it was found from
+            rows, columns = np.nonzero(found)
+            steps = stencil[columns] / np.linalg.norm(stencil[columns], axis=1)[:, None]
+            previous = np.linalg.norm(direction[rows], axis=1)[:, None]
+            directions = np.where(previous > 0,
+                                  (1 - smoothing) * direction[rows] / np.where(previous > 0, previous, 1)
+                                  + smoothing * steps, steps)
+            frontier, first = np.unique(indexes[rows, columns], return_index=True)
+            direction = directions[first]
+            self.bCSD.extend(map(tuple, np.stack(np.unravel_index(frontier, shape), axis=-1).tolist()))
+
+        print('bCSD size is: ', len(self.bCSD))
+
+    def sample_flat(self, visited: np.ndarray, flat: np.ndarray):
+        """
+        This method samples and rectifies the given points with a single bulk call, and marks them in visited.
+
+        :param visited: the state of each point, see frontier_flood
+        :param flat: the linear indexes of the points to sample, possibly repeated
+        """
+        flat = np.unique(flat)
+        if len(flat):
+            candidates = np.stack(np.unravel_index(flat, self.sim.get_shape()), axis=-1)
+            line = self.normalize_many(self.sim.sample_many(candidates, self.clock)) == 1
+            visited[flat] = np.where(line, LINE, SAMPLED)
+
+    def flood_modes(self) -> dict:
+        """
+        :return: a dict mapping the name of each flood mode to the method implementing it
+        """
+        return {'queue': self.flood, 'frontier': self.frontier_flood, 'trace': self.trace_flood}
+
+    def run(self, mode: str = 'queue', sampling: str = 'sequential', sampler: str = 'uniform') -> list:
         """
         This method runs the compression process and returns the compressed binary CSD (bCSD).
+        :param mode: the flood implementation, one of flood_modes, e.g. 'queue' for the flood method,
+            'frontier' for the frontier_flood method or 'trace' for the trace_flood method
+        :param sampling: 'sequential' for the sequential_sampling method,
+            or 'batch' for the random_sampling method with the batch size of estimate_batch_size,
+            or None to skip the random sampling, for the flood modes finding their own transition line points
+        :param sampler: the strategy drawing the random samples, one of the SAMPLERS of the sampling module
         :return: the compressed binary CSD (bCSD)
         """
-        batch_size = self.estimate_batch_size()
-        to_process = self.random_sampling(batch_size)
-        self.flood(to_process)
+        floods = self.flood_modes()
+        if mode not in floods:
+            raise ValueError('Unknown flood mode ' + str(mode) + ', expected one of ' + str(list(floods)))
+        if self.checkpointer is not None and mode != 'frontier':
+            raise ValueError('Only the frontier flood writes checkpoints, got mode ' + str(mode))
+        if sampling is None:
+            to_process = self.to_process
+        elif sampling == 'batch':
+            with self.phase('estimate'):
+                batch_size = self.estimate_batch_size()
+            with self.phase('random_sampling'):
+                to_process = self.random_sampling(batch_size, sampler)
+        elif sampling == 'sequential':
+            with self.phase('random_sampling'):
+                to_process = self.sequential_sampling(sampler=sampler)
+        else:
+            raise ValueError('Unknown sampling ' + str(sampling) + ', expected sequential, batch or None')
+        with self.phase('flood'):
+            floods[mode](to_process)
         return self.bCSD
+
+    def phase(self, name: str):
+        """
+        :param name: the name of a phase of the run
+        :return: a context manager measuring the phase on the clock, or doing nothing if there is no clock
+        """
+        if self.clock is None:
+            return contextlib.nullcontext()
+        return self.clock.phase(name)
+
+    def components(self, tile=None, executor=None) -> list:
+        """
+        This method returns the connected components of the bCSD, the transition lines, without sampling the simulator.
+        The components labeled by the flood are used if any, otherwise the bCSD is labeled with the stencil,
+        tile by tile if tile is given, see the components module.
+
+        :param tile: the shape of a tile, or its edge length in all the dimensions, for the tiled labeling
+        :param executor: if given, a concurrent.futures executor labeling the tiles in parallel
+        :return: a list with a dict per component, holding its label, its size, its points and its bounding box
+        """
+        shape = self.sim.get_shape()
+        points = np.array(self.bCSD, dtype=np.intp).reshape(-1, len(shape))
+        if self.labels and sum(len(labels) for labels in self.labels) == len(self.bCSD) and tile is None:
+            labels = self.union_find.compact(np.concatenate(self.labels))
+        elif tile is None:
+            labels = label_points(points, shape, self.stencil)
+        else:
+            labels = label_tiles(points, shape, self.stencil, tile, executor)
+        return split_components(points, labels)
+
+    def save(self, path: Path, metadata: dict = None):
+        """
+        This method saves the bCSD in a compact .bcsd file, with the shape and the threshold of the CSD,
+        see the bCSDFile module.
+
+        :param path: the path of the .bcsd file
+        :param metadata: a JSON serializable dict saved in the header of the file
+        """
+        save_bCSD(self.bCSD, path, self.sim.get_shape(), self.max_value, self.min_value, metadata)
+
+    def report(self) -> dict:
+        """
+        :return: the machine-readable report of the clock, with the bCSD size, or None if there is no clock
+        """
+        if self.clock is None:
+            return None
+        return dict(self.clock.report(), bCSD_size=len(self.bCSD))
@@ -0,0 +1,544 @@
+"""
+Parametric compression of a Charge Stability Diagram (CSD): fit a square or honeycomb grid to transition line points.
+
+As in the README and the generator module, a grid of kind 'square' or 'honeycomb' is parametrized by its edge length L,
+its intercept vector I and its tilt vector Theta, d + 1 + d(d-1)/2 parameters, O(d^2), instead of the O(s^(d-1))
+transition line points of the bCSD. Its basis is B = L R(Theta) B0, where B0 is the unit basis of the kind, and its
+transition lines are the boundaries of the Voronoi cells of the lattice I + B Z^d.
+
+The residual of a point x is its distance to the nearest cell boundary: the bisector hyperplane between the lattice
+point nearest to x, B n0, and the neighbor B n1 whose bisector is the closest. With g = B0 (n1 - n0) and
+h = B0 (n0 + n1) / 2, the vectors of the boundary in the unit lattice, and y = x - I:
+    r = (L h.g - y^T R g) / |g|
+which is linear in L and I. Its gradients are
+    dr/dL = h.g / |g|,  dr/dI = R g / |g|,  dr/dTheta_k = -y^T (dR/dTheta_k) g / |g|
+The least squares solver is Levenberg-Marquardt, the nearest boundaries are assigned again at every iteration.
+
+The solver needs a start close to the solution. The transition lines are periodic on the lattice, so the power spectrum
+of the rasterized points peaks on the reciprocal lattice B^-T Z^d: the strongest peak gives the edge length, up to the
+reciprocal shell it belongs to, and the directions of the strongest peaks give the tilt, matched to the reciprocal
+vectors of the unit basis. The intercept is searched on a coarse grid of the unit cell.
+"""
+
+import itertools
+import json
+import math
+import queue
+from pathlib import Path
+
+import numpy as np
+
+from src.QDSim.generator import KINDS, grid_lines, lattice_basis, rotation
+from src.flooder.flooder import Flooder
+from src.utilities.clock import Clock
+from src.utilities.sampling import SampledSet, make_sampler
+
+# the maximum number of cells of the raster whose power spectrum estimates the period
+SPECTRUM_CELLS = 2 ** 20
+
+
+def rotation_derivatives(dimension: int, tilt=0.0) -> np.ndarray:
+    """
+    :param dimension: the number of dimensions d of the space
+    :param tilt: the d(d-1)/2 rotation angles, see generator.rotation
+    :return: the derivatives of the rotation matrix by each angle, an array of shape (d(d-1)/2, d, d)
+    """
+    planes = list(itertools.combinations(range(dimension), 2))
+    angles = np.broadcast_to(np.asarray(tilt, dtype=float), (len(planes),))
+    givens, derivatives = [], []
+    for (i, j), angle in zip(planes, angles):
+        cos, sin = math.cos(angle), math.sin(angle)
+        matrix = np.eye(dimension)
+        matrix[[i, j], [i, j]] = cos
+        matrix[i, j], matrix[j, i] = -sin, sin
+        givens.append(matrix)
+        derivative = np.zeros((dimension, dimension))
+        derivative[[i, j], [i, j]] = -sin
+        derivative[i, j], derivative[j, i] = -cos, cos
+        derivatives.append(derivative)
+    # the rotation is the product G_{K-1} ... G_1 G_0 of the rotations in each plane
+    result = np.empty((len(planes), dimension, dimension))
+    before = np.eye(dimension)
+    for k in range(len(planes)):
+        after = np.eye(dimension)
+        for matrix in givens[k + 1:]:
+            after = matrix @ after
+        result[k] = after @ derivatives[k] @ before
+        before = givens[k] @ before
+    return result
+
+
+def nearest_boundaries(points: np.ndarray, basis: np.ndarray, intercept: np.ndarray, chunk: int = 2 ** 14) -> tuple:
+    """
+    Find the nearest cell boundary of each point, as in generator.grid_lines.
+
+    :param points: array of shape (N, d)
+    :param basis: the lattice basis, see generator.lattice_basis
+    :param intercept: the position of a lattice point
+    :param chunk: the number of points processed at once, bounds the memory
+    :return: the lattice coordinates of the middle of the nearest lattice point n0 and of its neighbor n1 across the
+        boundary, (n0 + n1) / 2, and their difference n1 - n0, two arrays of shape (N, d)
+    """
+    dimension = basis.shape[0]
+    inverse = np.linalg.inv(basis)
+    # the lattice points around the rounded lattice coordinates of a point, their positions and the distances between
+    # each pair of them
+    neighbors = np.array(list(itertools.product([-1, 0, 1], repeat=dimension)), dtype=float)
+    centers = neighbors @ basis.T
+    squares = np.sum(centers ** 2, axis=1)
+    spacing = np.linalg.norm(centers[:, None, :] - centers[None, :, :], axis=-1)
+    np.fill_diagonal(spacing, 1)
+    middles = np.empty((len(points), dimension))
+    differences = np.empty((len(points), dimension))
+    for start in range(0, len(points), chunk):
+        shifted = points[start:start + chunk] - intercept
+        rounded = np.rint(shifted @ inverse.T)
+        offsets = shifted - rounded @ basis.T
+        # the squared distances to the lattice points, up to the squared norm of the offsets, common to all of them
+        distances = squares[None, :] - 2 * offsets @ centers.T
+        rows = np.arange(len(shifted))
+        nearest = np.argmin(distances, axis=1)
+        boundary = (distances - distances[rows, nearest][:, None]) / spacing[nearest]
+        boundary[rows, nearest] = np.inf
+        other = np.argmin(boundary, axis=1)
+        middles[start:start + chunk] = rounded + (neighbors[nearest] + neighbors[other]) / 2
+        differences[start:start + chunk] = neighbors[other] - neighbors[nearest]
+    return middles, differences
+
+
+def split_parameters(parameters: np.ndarray, dimension: int) -> tuple:
+    """
+    :param parameters: the vector of the grid parameters, [L, I_1 ... I_d, Theta_1 ... Theta_d(d-1)/2]
+    :return: the edge length L, the intercept vector I and the tilt vector Theta
+    """
+    return parameters[0], parameters[1:1 + dimension], parameters[1 + dimension:]
+
+
+def grid_residuals(points: np.ndarray, kind: str, parameters: np.ndarray, jacobian: bool = True) -> tuple:
+    """
+    The signed distance of each point to its nearest cell boundary, see the gridFitter module.
+
+    :param points: array of shape (N, d)
+    :param kind: 'square' or 'honeycomb'
+    :param parameters: the vector of the grid parameters, see split_parameters
+    :param jacobian: if False, only the residuals are computed
+    :return: the residuals, an array of shape (N,), and their Jacobian by the parameters, of shape (N, P), or None
+    """
+    dimension = points.shape[1]
+    edge, intercept, tilt = split_parameters(parameters, dimension)
+    unit = lattice_basis(kind, dimension, 1.0)
+    turn = rotation(dimension, tilt)
+    middles, differences = nearest_boundaries(points, edge * turn @ unit, intercept)
+    g = differences @ unit.T
+    norms = np.linalg.norm(g, axis=1)
+    hg = np.sum(middles @ unit.T * g, axis=1) / norms
+    shifted = points - intercept
+    normals = g @ turn.T / norms[:, None]
+    residuals = edge * hg - np.sum(shifted * normals, axis=1)
+    if not jacobian:
+        return residuals, None
+    derivatives = rotation_derivatives(dimension, tilt)
+    columns = [hg[:, None], normals]
+    columns.extend(-np.sum(shifted * (g @ derivative.T), axis=1)[:, None] / norms[:, None]
+                   for derivative in derivatives)
+    return residuals, np.concatenate(columns, axis=1)
+
+
+def spectrum_peaks(points: np.ndarray, shape: tuple, count: int) -> tuple:
+    """
+    Rasterize the points, binned so that the raster has at most SPECTRUM_CELLS cells, and find the strongest peaks of
+    its power spectrum, smoothed by a gaussian low-pass filter of the width of a bin which dampens the harmonics of the
+    thin transition lines. The periods longer than a third of the diagram are ignored.
+
+    :param points: integer array of shape (N, d)
+    :param shape: the dimensions of the diagram
+    :param count: the number of peaks
+    :return: the frequency vectors of the peaks, in cycles per pixel, an array of shape (count, d), and their powers,
+        the strongest first
+    """
+    dimension = len(shape)
+    size = max(1, math.ceil((math.prod(shape) / SPECTRUM_CELLS) ** (1 / dimension)))
+    grid = tuple(math.ceil(s / size) for s in shape)
+    raster = np.bincount(np.ravel_multi_index(tuple((points // size).T), grid), minlength=math.prod(grid))
+    raster = raster.reshape(grid) - raster.mean()
+    # a Hann window dampens the leakage of the edges of the diagram
+    for axis, g in enumerate(grid):
+        raster *= np.hanning(g + 2)[1:-1].reshape([-1 if a == axis else 1 for a in range(dimension)])
+    power = np.abs(np.fft.fftn(raster)) ** 2
+    frequencies = np.stack(np.meshgrid(*(np.fft.fftfreq(g, size) for g in grid), indexing='ij'), axis=-1)
+    magnitudes = np.linalg.norm(frequencies, axis=-1)
+    power *= np.exp(-(np.pi * magnitudes) ** 2)
+    power[magnitudes < 3 / min(shape)] = 0
+    maxima = power > 0
+    for offset in itertools.product([-1, 0, 1], repeat=dimension):
+        if any(offset):
+            maxima &= power >= np.roll(power, offset, axis=tuple(range(dimension)))
+    flat = np.flatnonzero(maxima)
+    flat = flat[np.argsort(power.ravel()[flat])[::-1][:count]]
+    return frequencies.reshape(-1, dimension)[flat], power.ravel()[flat]
+
+
+def rotation_angles(matrix: np.ndarray, iterations: int = 50) -> np.ndarray:
+    """
+    :param matrix: a d x d rotation matrix
+    :return: the d(d-1)/2 angles whose generator.rotation is the closest to the matrix, by Gauss-Newton from 0
+    """
+    dimension = matrix.shape[0]
+    tilt = np.zeros(dimension * (dimension - 1) // 2)
+    for _ in range(iterations):
+        residuals = (rotation(dimension, tilt) - matrix).ravel()
+        jacobian = rotation_derivatives(dimension, tilt).reshape(len(tilt), -1).T
+        step = np.linalg.lstsq(jacobian, -residuals, rcond=None)[0]
+        tilt += step
+        if np.max(np.abs(step), initial=0) < 1e-12:
+            break
+    return tilt
+
+
+def refine_peaks(points: np.ndarray, peaks: np.ndarray, shape: tuple, iterations: int = 3) -> np.ndarray:
+    """
+    Refine the frequencies of the spectrum peaks, whose precision is a bin of the raster, with the exact discrete
+    Fourier transform of the points: each coordinate is moved to the vertex of the parabola through the power at
+    the frequency and at half a bin of the diagram on each side.
+
+    :param points: array of shape (N, d)
+    :param peaks: the frequency vectors of the peaks, in cycles per pixel, an array of shape (M, d)
+    :param shape: the dimensions of the diagram
+    :return: the refined frequency vectors
+    """
+    def power(frequencies: np.ndarray) -> np.ndarray:
+        return np.abs(np.sum(np.exp(-2j * np.pi * points @ frequencies.T), axis=0)) ** 2
+
+    peaks = np.array(peaks, dtype=float)
+    for iteration in range(iterations):
+        for axis, size in enumerate(shape):
+            step = np.zeros(len(shape))
+            step[axis] = 0.5 / size / 2 ** iteration
+            low, middle, high = power(peaks - step), power(peaks), power(peaks + step)
+            curvature = low - 2 * middle + high
+            shift = np.where(curvature < 0, (low - high) / (2 * np.where(curvature < 0, curvature, -1)), 0)
+            peaks[:, axis] += np.clip(shift, -1, 1) * step[axis]
+    return peaks
+
+
+def match_peaks(peaks: np.ndarray, reciprocal: np.ndarray, edge: float, tolerance: float = 0.05) -> list:
+    """
+    Match the spectrum peaks, the strongest first, to the reciprocal vectors of the unit lattice scaled by the edge
+    length: a peak is matched to a reciprocal vector of the same length whose angles with the vectors already matched
+    are the angles of the peak with their peaks. The lattices are symmetric, so the first peak can be matched to any
+    vector of its length.
+
+    :param peaks: the frequency vectors of the peaks, the strongest first, an array of shape (M, d)
+    :param reciprocal: the reciprocal vectors of the unit lattice, an array of shape (K, d)
+    :param edge: the edge length of the lattice
+    :param tolerance: the relative tolerance on the lengths and on the cosines of the angles
+    :return: the pairs of indexes of a peak and of its reciprocal vector
+    """
+    lengths = np.linalg.norm(reciprocal, axis=1) / edge
+    directions = reciprocal / np.linalg.norm(reciprocal, axis=1)[:, None]
+    matches = []
+    for index, peak in enumerate(peaks):
+        length = np.linalg.norm(peak)
+        candidates = np.flatnonzero(np.abs(lengths - length) < tolerance * length)
+        if len(candidates) == 0:
+            continue
+        errors = np.zeros(len(candidates))
+        for other, vector in matches:
+            cos = peak @ peaks[other] / length / np.linalg.norm(peaks[other])
+            errors = np.maximum(errors, np.abs(directions[candidates] @ directions[vector] - cos))
+        if errors.min() < tolerance:
+            matches.append((index, candidates[np.argmin(errors)]))
+    return matches
+
+
+def estimate_grid(points: np.ndarray, shape: tuple, kind: str, shells: int = 2, steps: int = 4,
+                  subset: int = 512) -> list:
+    """
+    Estimate the grid parameters from the power spectrum of the points, to start the least squares solver,
+    see the gridFitter module.
+
+    :param points: integer array of shape (N, d), transition line points
+    :param shape: the dimensions of the diagram
+    :param kind: 'square' or 'honeycomb'
+    :param shells: the strongest spectrum peak is assumed to be on one of the first shells of the reciprocal lattice,
+        one estimate per shell
+    :param steps: the intercept is searched on a grid of steps^d points of the unit cell
+    :param subset: the number of points scoring the intercepts, the nearest to their centroid
+    :return: the estimated parameter vectors, see split_parameters, one per shell
+    """
+    dimension = len(shape)
+    peaks, weights = spectrum_peaks(points, shape, 4 * dimension)
+    if len(peaks) == 0:
+        return []
+    peaks = refine_peaks(points.astype(float), peaks, shape)
+    unit = lattice_basis(kind, dimension, 1.0)
+    integers = np.array([n for n in itertools.product(range(-3, 4), repeat=dimension) if any(n)], dtype=float)
+    reciprocal = integers @ np.linalg.inv(unit)
+    norms = np.unique(np.round(np.linalg.norm(reciprocal, axis=1), 9))
+    # the intercept is scored on the points nearest to their centroid, the least affected by an error of the edge length
+    sample = points[np.argsort(np.linalg.norm(points - points.mean(axis=0), axis=1))[:subset]].astype(float)
+    offsets = np.array(list(itertools.product(range(steps), repeat=dimension)), dtype=float) / steps
+    estimates = []
+    for norm in norms[:shells]:
+        edge = norm / np.linalg.norm(peaks[0])
+        matches = match_peaks(peaks, reciprocal, edge)
+        if len(matches) < 2:
+            continue
+        # the rotation of the matched reciprocal vectors onto the directions of their peaks, by the Kabsch algorithm
+        indexes, vectors = (np.array(column) for column in zip(*matches))
+        directions = peaks[indexes] / np.linalg.norm(peaks[indexes], axis=1)[:, None]
+        matched = reciprocal[vectors] / np.linalg.norm(reciprocal[vectors], axis=1)[:, None]
+        u, _, vt = np.linalg.svd((weights[indexes, None] * directions).T @ matched)
+        turn = u @ np.diag([1] * (dimension - 1) + [np.linalg.det(u @ vt)]) @ vt
+        tilt = rotation_angles(turn)
+        basis = lattice_basis(kind, dimension, edge, tilt)
+        scores = []
+        for offset in offsets:
+            parameters = np.concatenate([[edge], basis @ offset, tilt])
+            residuals, _ = grid_residuals(sample, kind, parameters, jacobian=False)
+            scores.append(np.sum(np.minimum(residuals ** 2, (edge / 4) ** 2)))
+        estimates.append(np.concatenate([[edge], basis @ offsets[np.argmin(scores)], tilt]))
+    return estimates
+
+
+def solve_grid(points: np.ndarray, kind: str, start: np.ndarray, iterations: int = 100,
+               tolerance: float = 1e-10) -> tuple:
+    """
+    Fit the grid parameters to the points with the Levenberg-Marquardt algorithm, see the gridFitter module.
+
+    :param points: array of shape (N, d), transition line points
+    :param kind: 'square' or 'honeycomb'
+    :param start: the initial parameter vector, see split_parameters
+    :param iterations: the maximum number of iterations
+    :param tolerance: the solver stops when the relative decrease of the sum of squares is smaller
+    :return: the fitted parameter vector, its residuals and the number of iterations
+    """
+    parameters = np.array(start, dtype=float)
+    residuals, jacobian = grid_residuals(points, kind, parameters)
+    cost = residuals @ residuals
+    damping = 1e-3
+    iteration = 0
+    for iteration in range(1, iterations + 1):
+        hessian = jacobian.T @ jacobian
+        gradient = jacobian.T @ residuals
+        step = np.linalg.solve(hessian + damping * np.diag(np.diag(hessian) + 1e-12), -gradient)
+        trial = parameters + step
+        if trial[0] <= 0:
+            damping *= 4
+            continue
+        trial_residuals, trial_jacobian = grid_residuals(points, kind, trial)
+        trial_cost = trial_residuals @ trial_residuals
+        if trial_cost < cost:
+            converged = cost - trial_cost <= tolerance * cost
+            parameters, residuals, jacobian, cost = trial, trial_residuals, trial_jacobian, trial_cost
+            damping = max(damping / 3, 1e-9)
+            if converged:
+                break
+        else:
+            damping *= 4
+            if damping > 1e9:
+                break
+    return parameters, residuals, iteration
+
+
+def fit_grid(points: np.ndarray, shape: tuple, kind: str, subset: int = 2048, stages: int = 4) -> tuple:
+    """
+    Fit a grid to transition line points: solve from each estimate of estimate_grid on a subset of the points,
+    then refine the best solution on all the points.
+    A small error of the estimated edge length shifts the far cells of a large diagram by a whole line,
+    so the subset is solved coarse to fine: first on the points nearest to its centroid, then on twice as many
+    points at each stage.
+
+    :param points: integer array of shape (N, d), transition line points
+    :param shape: the dimensions of the diagram
+    :param kind: 'square' or 'honeycomb'
+    :param subset: the number of points of the subset
+    :param stages: the number of stages of the coarse to fine solve
+    :return: the fitted parameter vector, see split_parameters, with the intercept in the cell of the lattice point
+        nearest to the origin, and the residuals of the points, or None and None if there is no estimate
+    """
+    dimension = len(shape)
+    points = np.asarray(points, dtype=float).reshape(-1, dimension)
+    sample = points[np.random.choice(len(points), subset, replace=False)] if len(points) > subset else points
+    sample = sample[np.argsort(np.linalg.norm(sample - sample.mean(axis=0), axis=1))]
+    # each stage needs a few points per parameter
+    counts = [count for count in (len(sample) >> stage for stage in reversed(range(stages)))
+              if count >= 4 * (1 + dimension) ** 2 or count == len(sample)]
+    best, best_cost = None, np.inf
+    for start in estimate_grid(sample.astype(np.intp), shape, kind):
+        parameters = start
+        for count in counts:
+            parameters, residuals, _ = solve_grid(sample[:count], kind, parameters)
+        if residuals @ residuals < best_cost:
+            best, best_cost = parameters, residuals @ residuals
+    if best is None:
+        return None, None
+    if len(sample) < len(points):
+        best, _, _ = solve_grid(points, kind, best)
+    edge, intercept, tilt = split_parameters(best, dimension)
+    basis = lattice_basis(kind, dimension, edge, tilt)
+    intercept = basis @ (np.linalg.solve(basis, intercept) % 1)
+    tilt = np.angle(np.exp(1j * tilt))
+    if dimension == 2:
+        # the plane lattices are symmetric under the rotations of a quarter turn, square, or a sixth, honeycomb
+        period = np.pi / 2 if kind == 'square' else np.pi / 3
+        tilt = (tilt + period / 2) % period - period / 2
+    best = np.concatenate([[edge], intercept, tilt])
+    residuals, _ = grid_residuals(points, kind, best, jacobian=False)
+    return best, residuals
+
+
+class GridFitter(Flooder):
+    """
+    This class compresses a CSD into the O(d^2) parameters of a square or honeycomb grid, see the gridFitter module,
+    instead of the O(s^(d-1)) transition line points found by the floods.
+
+    The simulator is sampled at random until enough transition line points are found, the grid is fitted to them,
+    then a few points on the fitted transition lines are sampled to check it. If too few of them are transition line
+    points, twice as many transition line points are sampled and the grid is fitted again.
+    """
+
+    def __init__(self, path: Path(), kind: str = 'honeycomb', points: int = None, accuracy: float = 0.9,
+                 checks: int = 256, fits: int = 8, round_size: int = 256, cache_size: int = None, clock: Clock = None):
+        """
+        :param path: the path of the CSD to compress, or a simulator, see Flooder
+        :param kind: the kind of the grid, 'square' or 'honeycomb'
+        :param points: the number of transition line points of the first fit, defaults to 16 (d + 1)^2,
+            it is doubled at each new fit
+        :param accuracy: the minimum fraction of the checked points which are transition line points
+        :param checks: the number of points on the fitted transition lines sampled to check the grid
+        :param fits: the maximum number of fits, the last grid is kept even if it is not accurate
+        :param round_size: the number of points drawn at once by the random sampling
+        :param cache_size: if given, the simulator samples are memoized in a SampleCache of at most cache_size points
+        :param clock: if given, the samples and the phases of the run are recorded on the clock
+        """
+        super().__init__(path, cache_size, clock)
+        if kind not in KINDS:
+            raise ValueError('Unknown grid kind ' + str(kind) + ', expected one of ' + str(KINDS))
+        self.kind = kind
+        self.points = 16 * (len(self.sim.get_shape()) + 1) ** 2 if points is None else points
+        self.accuracy = accuracy
+        self.checks = checks
+        self.fits = fits
+        self.round_size = round_size
+        self.sampler = 'uniform'
+        # the fitted grid, see the fit_flood method
+        self.grid = None
+
+    def flood_modes(self) -> dict:
+        modes = super().flood_modes()
+        modes['fit'] = self.fit_flood
+        return modes
+
+    def run(self, mode: str = 'fit', sampling: str = None, sampler: str = 'uniform') -> dict:
+        """
+        See Flooder.run, the fit mode does its own random sampling.
+
+        :return: the fitted grid in the fit mode, see the fit_flood method, otherwise the bCSD
+        """
+        self.sampler = sampler
+        bCSD = super().run(mode, sampling, sampler)
+        return self.grid if mode == 'fit' else bCSD
+
+    def fit_flood(self, to_process: queue.Queue):
+        """
+        This method fits the grid, see the class docstring, and sets the grid attribute to a dict holding the kind,
+        the edge length, the intercept, the tilt and the width of the grid, the RMS of the residuals, the number of
+        transition line points fitted and the fraction of the checked points which are transition line points.
+        The grid is None if no transition line point is found.
+
+        :param to_process: the process queue, its transition line points are fitted with the sampled ones
+        """
+        shape = self.sim.get_shape()
+        dimension = len(shape)
+        volume = math.prod(shape)
+        sampler = make_sampler(self.sampler, shape)
+        seeds = []
+        while not to_process.empty():
+            seeds.append(to_process.get())
+        lines = [np.array(seeds, dtype=np.intp).reshape(-1, dimension)]
+        # the sampled points, and the points and values of the random samples
+        sampled = SampledSet(shape)
+        coords, values = [], []
+        # the transition line points among the random samples, for the current threshold
+        line_points = 0
+        target = self.points
+
+        def sample(points: np.ndarray) -> tuple:
+            points = sampled.add(points)
+            return points, self.sim.sample_many(points, self.clock)
+
+        for _ in range(self.fits):
+            # sample at random until there are enough transition line points
+            while len(sampled) < volume:
+                points, sampled_values = sample(sampler.draw(self.round_size))
+                coords.append(points)
+                values.append(sampled_values)
+                previous = (-np.inf, np.inf) if self.max_value is None else (self.max_value, self.min_value)
+                self.max_value = float(np.max(sampled_values, initial=previous[0]))
+                self.min_value = float(np.min(sampled_values, initial=previous[1]))
+                if (self.max_value, self.min_value) == previous:
+                    line_points += int(np.count_nonzero(self.normalize_many(sampled_values)))
+                else:
+                    # a new extreme value moved the threshold, the earlier rounds are counted again
+                    line_points = sum(int(np.count_nonzero(self.normalize_many(v))) for v in values)
+                if self.max_value > self.min_value and line_points + sum(len(line) for line in lines) >= target:
+                    break
+            found = np.concatenate([np.concatenate(coords)[self.normalize_many(np.concatenate(values)) == 1]] + lines)
+            if len(found) == 0:
+                print('no transition line point found')
+                return
+            parameters, residuals = fit_grid(found, shape, self.kind)
+            if parameters is None:
+                print('no grid found')
+                return
+            edge, intercept, tilt = split_parameters(parameters, dimension)
+            width = 2 * float(np.quantile(np.abs(residuals), 0.99))
+            # check the grid on random points of its transition lines
+            candidates = np.random.randint(0, shape, size=(self.checks * 64, dimension))
+            distances, _ = grid_residuals(candidates.astype(float), self.kind, parameters, jacobian=False)
+            checked, checked_values = sample(candidates[np.abs(distances) < width / 2][:self.checks])
+            hits = self.normalize_many(checked_values) == 1
+            lines.append(checked[hits])
+            accuracy = float(np.mean(hits)) if len(hits) else 0.0
+            self.grid = {
+                'kind': self.kind,
+                'shape': list(shape),
+                'edge': float(edge),
+                'intercept': intercept.tolist(),
+                'tilt': tilt.tolist(),
+                'width': width,
+                'rms': float(np.sqrt(np.mean(residuals ** 2))),
+                'points': len(found),
+                'accuracy': accuracy,
+            }
+            print('grid fitted to', len(found), 'points, edge', round(float(edge), 3), 'accuracy', accuracy)
+            if accuracy >= self.accuracy or len(sampled) >= volume:
+                return
+            target = 2 * len(found)
+
+    def rasterize(self) -> np.ndarray:
+        """
+        :return: the transition lines of the fitted grid, a boolean array of the shape of the CSD,
+            see generator.grid_lines
+        """
+        grid = self.grid
+        basis = lattice_basis(grid['kind'], len(grid['shape']), grid['edge'], grid['tilt'])
+        return grid_lines(tuple(grid['shape']), basis, grid['intercept'], grid['width'])
+
+    def save_grid(self, path: Path):
+        """
+        This method saves the fitted grid in a JSON file, with the threshold of the CSD.
+        """
+        with open(path, 'w') as f:
+            json.dump(dict(self.grid, max_value=self.max_value, min_value=self.min_value), f, indent=2)
+
+    def report(self) -> dict:
+        """
+        :return: the report of the clock, see Flooder.report, with the number of parameters of the grid
+        """
+        report = super().report()
+        if report is not None and self.grid is not None:
+            report['parameters'] = 1 + len(self.grid['intercept']) + len(self.grid['tilt'])
+            report['accuracy'] = self.grid['accuracy']
+        return report
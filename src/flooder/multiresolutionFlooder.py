@@ -0,0 +1,147 @@
+import itertools
+import math
+import queue
+from pathlib import Path
+
+import numpy as np
+
+from src.flooder.flooder import Flooder
+from src.utilities.clock import Clock
+from src.utilities.neighbours import unique_neighbors
+
+
+def cell_skeleton(dimension: int, size: int) -> np.ndarray:
+    """
+    The skeleton of a cell is the set of the points on its edges, i.e. the points varying along one axis
+    with all the other coordinates on a corner of the cell.
+
+    :param dimension: the number of dimensions d of the space
+    :param size: the edge length of the cell
+    :return: the offsets of the skeleton points from the lowest corner of the cell, an integer array of shape (n, d)
+    """
+    corners = [0, size]
+    edges = []
+    for axis in range(dimension):
+        ranges = [range(size + 1) if i == axis else corners for i in range(dimension)]
+        edges.extend(itertools.product(*ranges))
+    return np.unique(np.array(edges, dtype=np.intp).reshape(-1, dimension), axis=0)
+
+
+class MultiresolutionFlooder(Flooder):
+    """
+    This class finds the bCSD coarse to fine, without random seeding.
+
+    The simulated space is tiled with cells of edge stride, which are split recursively in 2^d children of half the edge,
+    a quadtree in 2-d, an octree in 3-d, down to the pixel resolution. Only the cells crossed by a transition line
+    are split, so the large empty regions of the diagram are sampled only on a coarse lattice.
+
+    A cell is crossed by a transition line if a transition line point lies on its skeleton, the points on its edges.
+    The CSD stores thin transition lines rather than the charge state regions they separate, so the corners alone
+    cannot tell if a line crosses a cell, while a hyperplane crossing a cell separates its corners, hence crosses its edges.
+    Lines bending in and out of a cell through its faces, or closed cells smaller than the stride, can be missed:
+    the transition line points found are then closed under the flooder stencil with a frontier flood, so the result
+    holds the same points as the frontier_flood method.
+    """
+
+    def __init__(self, path: Path(), stride: int = 8, leaf: int = 1, close: bool = True, cache_size: int = None,
+                 clock: Clock = None, stencil: np.ndarray = None):
+        """
+        :param path: the path of the CSD to compress
+        :param stride: the edge length of the coarse cells, a power of 2
+        :param leaf: the edge length of the cells which are not split anymore, a power of 2, 1 for the pixel resolution.
+            With a larger leaf the closing flood, rather than the refinement, finds the transition line points
+            around the crossed cells, which costs fewer samples on thin transition lines
+        :param close: if True, the transition line points found are closed under the stencil with a frontier flood
+        :param cache_size: if given, the simulator samples are memoized in a SampleCache of at most cache_size points
+        :param clock: if given, the samples and the phases of the run are recorded on the clock
+        :param stencil: the neighbor offsets used by the closing flood, see Flooder
+        """
+        super().__init__(path, cache_size, clock, stencil)
+        if stride <= 0 or stride & (stride - 1):
+            raise ValueError('The stride must be a power of 2, got ' + str(stride))
+        if leaf <= 0 or leaf & (leaf - 1) or leaf > stride:
+            raise ValueError('The leaf must be a power of 2 not larger than the stride, got ' + str(leaf))
+        self.stride = stride
+        self.leaf = leaf
+        self.close = close
+
+    def flood_modes(self) -> dict:
+        modes = super().flood_modes()
+        modes['multiresolution'] = self.multiresolution_flood
+        return modes
+
+    def run(self, mode: str = 'multiresolution', sampling: str = None, sampler: str = 'uniform') -> list:
+        """
+        See Flooder.run, the multiresolution mode does not need the random sampling.
+        """
+        return super().run(mode, sampling, sampler)
+
+    def multiresolution_flood(self, to_process: queue.Queue):
+        """
+        This method fills the compressed binary CSD (bCSD) by refining the cells crossed by the transition lines.
+
+        If the threshold is not set by a previous sampling, it is set by the samples of the coarse lattice.
+        The seeds in the process queue, if any, are only used by the closing flood.
+
+        :param to_process: the process queue, possibly initialized with some transition line points
+        """
+        shape = self.sim.get_shape()
+        dimension = len(shape)
+        upper = np.array(shape, dtype=np.intp) - 1
+        # state[i] is the rectified value of the point of linear index i, or -1 if it has not been sampled yet
+        state = np.full(math.prod(shape), -1, dtype=np.int8)
+
+        def sample(flat: np.ndarray):
+            # sample and rectify the points not sampled yet
+            flat = np.unique(flat)
+            flat = flat[state[flat] < 0]
+            values = self.sim.sample_many(np.stack(np.unravel_index(flat, shape), axis=-1), self.clock)
+            if self.max_value is None or self.min_value is None:
+                self.max_value = float(np.max(values, initial=-np.inf))
+                self.min_value = float(np.min(values, initial=np.inf))
+            state[flat] = self.normalize_many(values)
+
+        seeds = []
+        while not to_process.empty():
+            seeds.append(to_process.get())
+        seeds = np.array(seeds, dtype=np.intp).reshape(-1, dimension)
+        state[np.ravel_multi_index(tuple(seeds.T), shape)] = 1
+
+        # the lowest corners of the coarse cells
+        size = self.stride
+        axes = [np.arange(0, max(n - 1, 1), size) for n in shape]
+        lows = np.stack(np.meshgrid(*axes, indexing='ij'), axis=-1).reshape(-1, dimension)
+        children = np.array(list(itertools.product([0, 1], repeat=dimension)), dtype=np.intp)
+        cells = 0
+        while len(lows):
+            cells += len(lows)
+            highs = np.minimum(lows + size, upper)
+            points = np.minimum(lows[:, None, :] + cell_skeleton(dimension, size)[None, :, :], highs[:, None, :])
+            flat = np.ravel_multi_index(tuple(points.reshape(-1, dimension).T), shape)
+            sample(flat)
+            if self.max_value == self.min_value:
+                # a flat diagram has no transition lines
+                break
+            if size <= self.leaf:
+                break
+            # split the crossed cells in 2^d children, dropping the children out of their parent
+            crossed = np.any(state[flat].reshape(len(lows), -1) == 1, axis=1)
+            lows, highs = lows[crossed], highs[crossed]
+            size //= 2
+            lows = (lows[:, None, :] + size * children[None, :, :]).reshape(-1, dimension)
+            highs = np.repeat(highs, len(children), axis=0)
+            lows = lows[np.all((lows < highs) | (np.tile(children, (len(highs) // len(children), 1)) == 0), axis=1)]
+        print('multiresolution cells are ', cells)
+
+        if self.close and self.max_value != self.min_value:
+            frontier = np.flatnonzero(state == 1)
+            while len(frontier):
+                flat = unique_neighbors(np.stack(np.unravel_index(frontier, shape), axis=-1), shape, self.stencil)
+                flat = flat[state[flat] < 0]
+                sample(flat)
+                frontier = flat[state[flat] == 1]
+
+        if self.max_value != self.min_value:
+            flat = np.flatnonzero(state == 1)
+            self.bCSD.extend(map(tuple, np.stack(np.unravel_index(flat, shape), axis=-1).tolist()))
+        print('bCSD size is: ', len(self.bCSD))
@@ -0,0 +1,223 @@
+import math
+import multiprocessing
+import os
+import queue
+from multiprocessing import shared_memory
+from pathlib import Path
+
+import numpy as np
+
+from src.flooder.flooder import Flooder
+from src.utilities.clock import Clock
+from src.utilities.neighbours import neighbors_many
+
+
+def shard_boundaries(shape: tuple, shards: int) -> np.ndarray:
+    """
+    Split the simulated space in slabs along the first dimension, one per shard.
+
+    :param shape: the dimensions of the simulated space
+    :param shards: the number of shards
+    :return: an array of shards + 1 increasing row indexes, shard i owns the rows [boundaries[i], boundaries[i + 1])
+    """
+    return np.linspace(0, shape[0], shards + 1).astype(np.intp)
+
+
+def shard_owner(points: np.ndarray, boundaries: np.ndarray) -> np.ndarray:
+    """
+    :param points: integer array of shape (N, d)
+    :param boundaries: the shard boundaries, see shard_boundaries
+    :return: the shard owning each of the points
+    """
+    return np.searchsorted(boundaries, points[:, 0], side='right') - 1
+
+
+def flood_shard(shard: int, path: Path, cache_size: int, clocked: bool, stencil: np.ndarray, min_value: float,
+                max_value: float, boundaries: np.ndarray, visited_name: str, inboxes: list, pending, done, results: multiprocessing.Queue):
+    """
+    The worker process owning a shard of the simulated space.
+
+    The worker receives messages holding seeds, i.e. transition line points already sampled, and candidates,
+    i.e. points to be sampled, of its shard. It floods its shard with the frontier method, and sends the candidates
+    crossing the shard boundaries to the inboxes of their owners.
+
+    The shared visited bitmap is only written by the owner of a point, so a point is claimed exactly once without locks.
+    The other workers read it to drop the candidates already visited before sending them, a stale read only costs a
+    redundant message.
+
+    The pending counter holds the number of messages sent but not yet fully processed, the worker processing the last
+    one sets the done event.
+
+    If clocked, the worker records its samples on its own clock, and returns its counters and the points it sampled with
+    its transition line points, so that the points also sampled by another process are counted once as unique samples.
+    """
+    flooder = Flooder(path, cache_size, Clock() if clocked else None, stencil)
+    flooder.min_value = min_value
+    flooder.max_value = max_value
+    shape = flooder.sim.get_shape()
+    visited_memory = shared_memory.SharedMemory(name=visited_name)
+    visited = np.ndarray((math.prod(shape),), dtype=bool, buffer=visited_memory.buf)
+    bCSD = []
+
+    def claim(flat: np.ndarray) -> np.ndarray:
+        # keep the points not visited yet, and mark them visited
+        flat = np.unique(flat)
+        flat = flat[~visited[flat]]
+        visited[flat] = True
+        return flat
+
+    while True:
+        message = inboxes[shard].get()
+        if message is None:
+            break
+        seeds, candidates = message
+        frontier = claim(seeds)
+        candidates = claim(candidates)
+        points = np.stack(np.unravel_index(candidates, shape), axis=-1)
+        values = flooder.sim.sample_many(points, flooder.clock)
+        frontier = np.concatenate([frontier, candidates[flooder.normalize_many(values) == 1]])
+
+        while len(frontier):
+            bCSD.append(frontier)
+            points = np.stack(np.unravel_index(frontier, shape), axis=-1)
+            neighbors = neighbors_many(points, shape, flooder.stencil)
+            flat = np.ravel_multi_index(tuple(neighbors.T), shape)
+            keep = ~visited[flat]
+            neighbors, flat = neighbors[keep], flat[keep]
+            owners = shard_owner(neighbors, boundaries)
+            # send the candidates crossing the boundaries to their owners
+            for owner in np.unique(owners):
+                if owner != shard:
+                    with pending.get_lock():
+                        pending.value += 1
+                    inboxes[owner].put((np.empty(0, dtype=np.intp), np.unique(flat[owners == owner])))
+            # sample the local candidates
+            local = claim(flat[owners == shard])
+            points = np.stack(np.unravel_index(local, shape), axis=-1)
+            frontier = local[flooder.normalize_many(flooder.sim.sample_many(points, flooder.clock)) == 1]
+
+        with pending.get_lock():
+            pending.value -= 1
+            if pending.value == 0:
+                done.set()
+
+    counters = (flooder.clock.time, flooder.clock.requests, flooder.clock.get_seen()) if clocked else None
+    results.put((np.concatenate(bCSD) if bCSD else np.empty(0, dtype=np.intp), counters))
+    del visited
+    visited_memory.close()
+
+
+def check_workers(processes: list):
+    """
+    Raise an error if a worker process died, e.g. on an exception or killed by the OS:
+    without the check the parent would wait forever for the messages or the results of a crashed worker.
+
+    :param processes: the worker processes
+    """
+    for shard, process in enumerate(processes):
+        if process.exitcode not in (None, 0):
+            raise RuntimeError('The worker of shard ' + str(shard) + ' died with exit code ' + str(process.exitcode))
+
+
+class ParallelFlooder(Flooder):
+    """
+    This class floods the CSD on all the cores.
+
+    The simulated space is split in spatial shards, slabs along the first dimension, each owned by a worker process with
+    its own frontier. The points crossing a shard boundary are sent to the owner shard through its queue,
+    and the visits are recorded in a shared memory bitmap so that each point is claimed, and sampled, exactly once.
+    Each worker opens the diagram on its own, with a memory-mapped storage backend the diagram is loaded only once.
+
+    The resulting bCSD holds the same points as the serial floods, sorted in C order.
+    """
+
+    def __init__(self, path: Path(), workers: int = None, cache_size: int = None, clock: Clock = None,
+                 stencil: np.ndarray = None, poll_interval: float = 0.1):
+        """
+        :param path: the path of the CSD to compress, or a simulator, see Flooder, which must be picklable
+            if the processes are not forked
+        :param workers: the number of worker processes, defaults to the number of cores
+        :param cache_size: if given, the samples of each worker are memoized in a SampleCache of at most cache_size points
+        :param clock: if given, the samples and the phases of the run are recorded on the clock,
+            the workers sample disjoint sets of points so their unique samples add up
+        :param stencil: the neighbor offsets used by the flood, see Flooder
+        :param poll_interval: the time between two checks that the workers are alive, in seconds
+        """
+        super().__init__(path, cache_size, clock, stencil)
+        self.path = path
+        self.poll_interval = poll_interval
+        self.cache_size = cache_size
+        self.workers = workers if workers is not None else os.cpu_count()
+
+    def flood_modes(self) -> dict:
+        modes = super().flood_modes()
+        modes['parallel'] = self.parallel_flood
+        return modes
+
+    def parallel_flood(self, to_process: queue.Queue):
+        """
+        This method fills the compressed binary CSD (bCSD) like the flood method, with a process per shard.
+
+        :param to_process: the process queue initialized with some transition line points
+        """
+        shape = self.sim.get_shape()
+        shards = max(1, min(self.workers, shape[0]))
+        boundaries = shard_boundaries(shape, shards)
+
+        seeds = []
+        while not to_process.empty():
+            seeds.append(to_process.get())
+        seeds = np.array(seeds, dtype=np.intp).reshape(-1, len(shape))
+
+        visited_memory = shared_memory.SharedMemory(create=True, size=math.prod(shape))
+        processes = []
+        try:
+            np.ndarray((math.prod(shape),), dtype=bool, buffer=visited_memory.buf)[:] = False
+            inboxes = [multiprocessing.Queue() for _ in range(shards)]
+            pending = multiprocessing.Value('q', 0)
+            done = multiprocessing.Event()
+            results = multiprocessing.Queue()
+            processes += [multiprocessing.Process(
+                target=flood_shard,
+                args=(shard, self.path, self.cache_size, self.clock is not None, self.stencil, self.min_value, self.max_value,
+                      boundaries, visited_memory.name, inboxes, pending, done, results))
+                for shard in range(shards)]
+            for process in processes:
+                process.start()
+
+            # send the seeds to their owners, all the seed messages are counted before the first one is sent,
+            # otherwise a shard could process its seeds and bring the counter to 0 before the other seeds are counted
+            owners = shard_owner(seeds, boundaries)
+            flat = np.ravel_multi_index(tuple(seeds.T), shape)
+            pending.value = len(np.unique(owners))
+            for owner in np.unique(owners):
+                inboxes[owner].put((flat[owners == owner], np.empty(0, dtype=np.intp)))
+            if len(seeds) == 0:
+                done.set()
+
+            while not done.wait(self.poll_interval):
+                check_workers(processes)
+            for inbox in inboxes:
+                inbox.put(None)
+            shard_results = []
+            while len(shard_results) < len(processes):
+                try:
+                    shard_results.append(results.get(timeout=self.poll_interval))
+                except queue.Empty:
+                    check_workers(processes)
+            flat = np.sort(np.concatenate([points for points, _ in shard_results]))
+            if self.clock is not None:
+                for _, (samples, requests, seen) in shard_results:
+                    self.clock.add(samples, requests, self.clock.mark(seen, shape))
+            for process in processes:
+                process.join()
+        finally:
+            for process in processes:
+                if process.is_alive():
+                    process.kill()
+                    process.join()
+            visited_memory.close()
+            visited_memory.unlink()
+
+        self.bCSD.extend(map(tuple, np.stack(np.unravel_index(flat, shape), axis=-1).tolist()))
+        print('bCSD size is: ', len(self.bCSD))
@@ -0,0 +1,420 @@
+"""
+Out-of-core flood of the diagrams larger than the memory.
+
+The frontier flood keeps a byte per point of the simulated space, its visited state, and the FrontierQueue a bit per
+point, so their memory grows with the volume s^d of the diagram. The tiled flood splits the index space in tiles and keeps in memory
+only a bounded working set of them:
+- each tile has a visited bitmap, 1 bit per point of the tile. At most max_tiles bitmaps are resident,
+  the least recently used one is written to disk to make room for another one, and read back when it is needed again.
+- the pending points, i.e. the points routed to a tile to be processed, are buffered in memory as int64 linear indexes,
+  up to buffer_limit bytes in total. Beyond, the largest buffers are appended to per-tile spill files.
+- the transition line points found are buffered and spilled the same way, and read back at the end of the flood.
+
+The next tile to process is a resident tile with pending points if any, so that its bitmap is not reloaded,
+otherwise the tile with the most pending points, so that a reload is amortized over as many points as possible.
+The diagram itself is sampled through the simulator, use a memory-mapped storage backend (.npy, .bin/.raw or .chunks)
+so that it is not loaded in memory either, see the storage module.
+"""
+
+import math
+import queue
+import shutil
+import sys
+import tempfile
+from collections import OrderedDict
+from pathlib import Path
+
+import numpy as np
+
+from src.flooder.bCSDFile import BCSDWriter
+from src.flooder.flooder import Flooder
+from src.utilities.clock import Clock
+from src.utilities.neighbours import neighbors_many
+
+LINES = 'lines'
+# the memory size of a buffered array besides its values: the numpy object and its reference in the buffer
+ARRAY_OVERHEAD = sys.getsizeof(np.empty(0, dtype=np.int64)) + 8
+# the memory size of the buffer of a key: the list and its entry in the dict of the buffers
+BUFFER_OVERHEAD = sys.getsizeof([]) + 64
+# the memory size of the state of a tile: its number of pending points and whether it is resident
+TILE_OVERHEAD = 9
+
+
+class SeedQueue(queue.Queue):
+    """
+    A plain queue of the seeds of the tiled flood, with the put_many method of the FrontierQueue
+    but without its bitmap of the whole space. The duplicate seeds are dropped by the flood.
+    """
+
+    def put_many(self, points: np.ndarray):
+        for point in map(tuple, np.asarray(points, dtype=np.intp).tolist()):
+            self.put(point)
+
+
+class SpillBuffer:
+    """
+    Lists of int64 arrays, one per key, buffered in memory up to limit bytes in total.
+    Beyond the limit the largest lists are appended to a file per key, in the directory.
+    """
+
+    def __init__(self, directory: Path, limit: int):
+        """
+        :param directory: the directory of the spill files
+        :param limit: the maximum memory size of the buffered arrays, in bytes
+        """
+        self.directory = Path(directory)
+        self.limit = limit
+        self.nbytes = 0
+        self.spilled = 0
+        self.__buffers = dict()
+
+    def path(self, key) -> Path:
+        return self.directory / ('pending_' + str(key) + '.bin')
+
+    def push(self, key, values: np.ndarray):
+        """
+        :param key: the key of the list, e.g. a tile
+        :param values: an int64 array appended to the list
+        """
+        if len(values) == 0:
+            return
+        if key not in self.__buffers:
+            self.__buffers[key] = []
+            self.nbytes += BUFFER_OVERHEAD
+        self.__buffers[key].append(values)
+        self.nbytes += values.nbytes + ARRAY_OVERHEAD
+        if self.nbytes > self.limit:
+            # spill the largest lists until half of the buffer is free
+            sizes = {key: sum(values.nbytes + ARRAY_OVERHEAD for values in buffer)
+                     for key, buffer in self.__buffers.items()}
+            for key in sorted(sizes, key=sizes.get, reverse=True):
+                if self.nbytes <= self.limit // 2:
+                    break
+                self.spill(key)
+
+    def spill(self, key):
+        """
+        Append the buffered arrays of a key to its file.
+        """
+        buffer = self.__buffers.pop(key)
+        self.nbytes -= BUFFER_OVERHEAD
+        with open(self.path(key), 'ab') as f:
+            for values in buffer:
+                f.write(values.data)
+                self.nbytes -= values.nbytes + ARRAY_OVERHEAD
+                self.spilled += len(values)
+
+    def drain(self, key, n: int):
+        """
+        Remove the arrays of a key, from its file then from the memory, and yield them in chunks of at most n values.
+        The values pushed to the same key while draining are kept for the next drain.
+
+        :param key: the key of the list
+        :param n: the maximum size of a chunk
+        """
+        if key in self.__buffers:
+            self.nbytes -= BUFFER_OVERHEAD
+        buffer = self.__buffers.pop(key, [])
+        path = self.path(key)
+        if path.exists():
+            draining = path.with_name('draining_' + path.name)
+            path.replace(draining)
+            try:
+                with open(draining, 'rb') as f:
+                    while True:
+                        values = np.frombuffer(f.read(8 * n), dtype=np.int64)
+                        if len(values) == 0:
+                            break
+                        yield values
+            finally:
+                draining.unlink()
+        # coalesce the small arrays in chunks of n values, an array is released when it is consumed
+        buffer.reverse()
+        chunk, size = [], 0
+        while buffer:
+            values = buffer.pop()
+            self.nbytes -= values.nbytes + ARRAY_OVERHEAD
+            start = 0
+            while start < len(values):
+                chunk.append(values[start:start + n - size])
+                start += len(chunk[-1])
+                size += len(chunk[-1])
+                if size == n:
+                    yield np.concatenate(chunk)
+                    chunk, size = [], 0
+        if chunk:
+            yield np.concatenate(chunk)
+
+
+class TileStore:
+    """
+    The tiles of the index space of a tiled flood: their visited bitmaps, at most max_tiles of them in memory,
+    and their pending points, in a SpillBuffer.
+    """
+
+    def __init__(self, shape: tuple, tile: tuple, directory: Path, max_tiles: int, buffer_limit: int):
+        """
+        :param shape: the dimensions of the simulated space
+        :param tile: the shape of a tile
+        :param directory: the directory of the spilled bitmaps and points
+        :param max_tiles: the maximum number of bitmaps in memory
+        :param buffer_limit: the maximum memory size of the buffered points, in bytes
+        """
+        self.shape = tuple(shape)
+        self.tile = np.asarray(tile, dtype=np.intp)
+        self.grid = tuple(math.ceil(s / t) for s, t in zip(self.shape, tile))
+        self.directory = Path(directory)
+        self.max_tiles = max_tiles
+        self.tile_bytes = (math.prod(tile) + 7) // 8
+        self.pending = SpillBuffer(directory, buffer_limit)
+        self.loads = 0
+        self.evictions = 0
+        # the number of pending points of each tile, and whether its bitmap is resident
+        self.__counts = np.zeros(math.prod(self.grid), dtype=np.int64)
+        self.__resident = np.zeros(math.prod(self.grid), dtype=bool)
+        # the resident bitmaps, the least recently used first
+        self.__bitmaps = OrderedDict()
+
+    def locate(self, flat: np.ndarray) -> tuple:
+        """
+        :param flat: the linear indexes of some points of the simulated space
+        :return: the tile of each point, and its linear index in its tile
+        """
+        points = np.stack(np.unravel_index(flat, self.shape), axis=-1).reshape(-1, len(self.shape))
+        tiles = np.ravel_multi_index(tuple((points // self.tile).T), self.grid)
+        local = np.ravel_multi_index(tuple((points % self.tile).T), tuple(self.tile))
+        return tiles, local
+
+    def bitmap_path(self, tile: int) -> Path:
+        return self.directory / ('visited_' + str(tile) + '.bin')
+
+    def bitmap(self, tile: int) -> np.ndarray:
+        """
+        :param tile: a tile
+        :return: its visited bitmap, loaded from disk if it is not resident, evicting the least recently used bitmap
+        """
+        if tile in self.__bitmaps:
+            self.__bitmaps.move_to_end(tile)
+            return self.__bitmaps[tile]
+        if len(self.__bitmaps) >= self.max_tiles:
+            evicted, bitmap = self.__bitmaps.popitem(last=False)
+            self.__resident[evicted] = False
+            with open(self.bitmap_path(evicted), 'wb') as f:
+                f.write(bitmap.data)
+            self.evictions += 1
+        path = self.bitmap_path(tile)
+        bitmap = np.zeros(self.tile_bytes, dtype=np.uint8)
+        if path.exists():
+            with open(path, 'rb') as f:
+                f.readinto(bitmap.data)
+            self.loads += 1
+        self.__bitmaps[tile] = bitmap
+        self.__resident[tile] = True
+        return bitmap
+
+    @staticmethod
+    def visited(bitmap: np.ndarray, local: np.ndarray) -> np.ndarray:
+        """
+        :return: a boolean array, True for the points of the tile already visited
+        """
+        return ((bitmap[local >> 3] >> (local & 7).astype(np.uint8)) & 1).astype(bool)
+
+    @staticmethod
+    def visit(bitmap: np.ndarray, local: np.ndarray):
+        np.bitwise_or.at(bitmap, local >> 3, np.left_shift(1, local & 7).astype(np.uint8))
+
+    def push(self, flat: np.ndarray, seeds: bool = False):
+        """
+        Route some points to the pending points of their tiles, the points of the resident tiles already visited
+        are dropped.
+
+        :param flat: the linear indexes of the points to process
+        :param seeds: True for transition line points already sampled, False for the points to sample
+        """
+        flat = np.unique(np.asarray(flat, dtype=np.int64))
+        tiles, local = self.locate(flat)
+        # the unique linear indexes are sorted, so the points of a tile are sorted too, but not contiguous in general
+        order = np.argsort(tiles, kind='stable')
+        tiles, local, flat = tiles[order], local[order], flat[order]
+        starts = np.flatnonzero(np.diff(tiles, prepend=-1))
+        ends = np.append(starts[1:], len(tiles))
+        for start, end in zip(starts, ends):
+            tile = int(tiles[start])
+            # a copy, a view would keep the whole array in memory
+            values = flat[start:end].copy()
+            if tile in self.__bitmaps:
+                values = values[~self.visited(self.__bitmaps[tile], local[start:end])]
+            if len(values):
+                # the seeds are stored as -(index + 1)
+                self.pending.push(tile, -values - 1 if seeds else values)
+                self.__counts[tile] += len(values)
+
+    def drain(self, tile: int, n: int):
+        """
+        :return: the pending points of the tile, in chunks of at most n values, see SpillBuffer.drain
+        """
+        self.__counts[tile] = 0
+        return self.pending.drain(tile, n)
+
+    def next_tile(self) -> int:
+        """
+        :return: the next tile to process, a resident tile with pending points if any, otherwise the tile with the most
+            pending points, or None if there are no pending points left
+        """
+        resident = np.where(self.__resident, self.__counts, 0)
+        counts = resident if resident.any() else self.__counts
+        tile = int(np.argmax(counts))
+        return tile if counts[tile] > 0 else None
+
+
+class TiledFlooder(Flooder):
+    """
+    This class floods the CSD out of core, tile by tile, with a bounded memory, see the tiledFlooder module.
+
+    The memory limit is split between the resident bitmaps, at most half of it, and in equal parts the buffered points
+    and the arrays of a batch of points processed at once.
+    The resulting bCSD holds the same points as the frontier_flood method, each point being sampled at most once.
+    """
+
+    def __init__(self, path: Path(), tile=32, memory_limit: int = 2 ** 28, spill_dir: Path = None,
+                 output: Path = None, cache_size: int = None, clock: Clock = None, stencil: np.ndarray = None):
+        """
+        :param path: the path of the CSD to compress
+        :param tile: the shape of a tile, or its edge length in all the dimensions
+        :param memory_limit: the maximum memory of the flood, in bytes, the bCSD aside, see the collect method.
+            The simulator and its SampleCache, if any, are not counted
+        :param spill_dir: the directory of the spill files, defaults to a temporary directory removed after the flood
+        :param output: if given, the bCSD is written to this .bcsd file instead of the bCSD list,
+            see the bCSDFile module
+        :param cache_size: if given, the simulator samples are memoized in a SampleCache of at most cache_size points
+        :param clock: if given, the samples and the phases of the run are recorded on the clock.
+            Note that the clock keeps the linear index of every sampled point to count the unique samples,
+            about 60 bytes per sample, which is not counted in memory_limit either
+        :param stencil: the neighbor offsets used by the flood, see Flooder
+        """
+        super().__init__(path, cache_size, clock, stencil)
+        dimension = len(self.sim.get_shape())
+        self.tile = tuple(int(t) for t in np.broadcast_to(np.asarray(tile, dtype=np.intp), (dimension,)))
+        if min(self.tile) <= 0:
+            raise ValueError('The tile shape must be positive, got ' + str(self.tile))
+        self.memory_limit = memory_limit
+        # the state of the tiles, then at most half of the memory for the bitmaps,
+        # the rest is split between the buffered points and the batches
+        tile_bytes = (math.prod(self.tile) + 7) // 8 + ARRAY_OVERHEAD + BUFFER_OVERHEAD
+        tiles = math.prod(math.ceil(s / t) for s, t in zip(self.sim.get_shape(), self.tile))
+        available = memory_limit - tiles * TILE_OVERHEAD
+        self.max_tiles = min(tiles, max(0, available // 2) // tile_bytes)
+        if self.max_tiles < 1:
+            raise ValueError('The memory limit ' + str(memory_limit) + ' is too small for the bitmap of a tile of shape '
+                             + str(self.tile) + ' and the state of ' + str(tiles) + ' tiles')
+        self.buffer_limit = (available - self.max_tiles * tile_bytes) // 2
+        # a batch of points takes two int64 arrays of the coordinates of their neighbors, plus their indexes and masks
+        self.batch_size = max(1, self.buffer_limit // (len(self.stencil) * (2 * dimension + 8) * 8))
+        self.spill_dir = spill_dir
+        self.output = output
+        self.store = None
+
+    def make_queue(self) -> queue.Queue:
+        return SeedQueue()
+
+    def flood_modes(self) -> dict:
+        modes = super().flood_modes()
+        modes['tiled'] = self.tiled_flood
+        return modes
+
+    def run(self, mode: str = 'tiled', sampling: str = 'sequential', sampler: str = 'uniform') -> list:
+        """
+        See Flooder.run, the tiled mode by default.
+        """
+        return super().run(mode, sampling, sampler)
+
+    def tiled_flood(self, to_process: queue.Queue):
+        """
+        This method fills the compressed binary CSD (bCSD) like the frontier_flood method, tile by tile,
+        see the flood_tiles method, then it collects the transition line points found, see the collect method.
+
+        :param to_process: the process queue initialized with some transition line points
+        """
+        directory = Path(tempfile.mkdtemp(prefix='tiledFlooder') if self.spill_dir is None else self.spill_dir)
+        directory.mkdir(parents=True, exist_ok=True)
+        try:
+            self.flood_tiles(to_process, directory)
+            size = self.collect()
+        finally:
+            if self.spill_dir is None:
+                shutil.rmtree(directory, ignore_errors=True)
+            else:
+                for pattern in ('pending_*.bin', 'visited_*.bin'):
+                    for path in directory.glob(pattern):
+                        path.unlink()
+        print('bCSD size is: ', size)
+        print('tiles loaded ', self.store.loads, ', evicted ', self.store.evictions, ', points spilled ',
+              self.store.pending.spilled)
+
+    def flood_tiles(self, to_process: queue.Queue, directory: Path):
+        """
+        The flood of the tiled_flood method, its memory is bounded by the memory limit.
+
+        The pending points of a tile are processed in batches: the new transition line points are the seeds not visited
+        yet, and the points to sample not visited yet which are on a transition line. Their neighbors are routed to the
+        pending points of their tiles, until no tile has pending points left.
+        The transition line points found are kept in the store, under the LINES key.
+
+        :param to_process: the process queue initialized with some transition line points
+        :param directory: the directory of the spill files
+        """
+        shape = self.sim.get_shape()
+        self.store = store = TileStore(shape, self.tile, directory, self.max_tiles, self.buffer_limit)
+        seeds = []
+        while not to_process.empty():
+            seeds.append(to_process.get())
+            if len(seeds) == self.batch_size or to_process.empty():
+                store.push(np.ravel_multi_index(tuple(np.array(seeds, dtype=np.intp).T), shape), seeds=True)
+                seeds = []
+
+        while True:
+            tile = store.next_tile()
+            if tile is None:
+                break
+            bitmap = store.bitmap(tile)
+            for values in store.drain(tile, self.batch_size):
+                # the pending points may have been visited since they were routed, or be routed more than once
+                flat = np.where(values < 0, -values - 1, values)
+                flat, first = np.unique(flat, return_index=True)
+                is_seed = values[first] < 0
+                _, local = store.locate(flat)
+                new = ~store.visited(bitmap, local)
+                store.visit(bitmap, local[new])
+                flat, is_seed = flat[new], is_seed[new]
+                candidates = np.stack(np.unravel_index(flat[~is_seed], shape), axis=-1)
+                line = self.normalize_many(self.sim.sample_many(candidates, self.clock)) == 1
+                found = np.concatenate([flat[is_seed], flat[~is_seed][line]])
+                store.pending.push(LINES, found)
+                points = np.stack(np.unravel_index(found, shape), axis=-1)
+                neighbors = neighbors_many(points, shape, self.stencil)
+                store.push(np.ravel_multi_index(tuple(neighbors.T), shape))
+
+    def collect(self) -> int:
+        """
+        This method moves the transition line points found by flood_tiles to the bCSD list, or to the output .bcsd file.
+        The .bcsd writer buffers the Morton codes of the points, 8 bytes per point, up to the buffer limit,
+        and spills sorted runs to disk beyond, see the bCSDFile module.
+
+        :return: the number of transition line points
+        """
+        shape = self.sim.get_shape()
+        size = 0
+        writer = None
+        if self.output is not None:
+            writer = BCSDWriter(self.output, shape, self.max_value, self.min_value,
+                                buffer_size=max(1, self.buffer_limit // 8))
+        for found in self.store.pending.drain(LINES, self.batch_size):
+            points = np.stack(np.unravel_index(found, shape), axis=-1)
+            if writer is None:
+                self.bCSD.extend(map(tuple, points.tolist()))
+            else:
+                writer.append(points)
+            size += len(found)
+        if writer is not None:
+            writer.close()
+        return size
@@ -1,9 +1,20 @@
+import sys
+from pathlib import Path
+
+from src.flooder.batchCompressor import main
 from src.flooder.flooder import Flooder
+from src.utilities.clock import Clock
 
 def run_test1():
-    path = '/Users/corrado/Desktop/CSDcompressor/src/QDSim/library/test1.txt'
-    flooder = Flooder(path)
+    path = Path(__file__).parent / 'QDSim' / 'library' / 'test1.txt'
+    flooder = Flooder(path, clock=Clock())
     flooder.run()
+    print(flooder.clock.to_json())
 
 if __name__ == '__main__':
-    run_test1()
+    # python -m src.main <diagrams, directories or glob patterns> --output <directory> compresses a batch of diagrams,
+    # see the batchCompressor module
+    if len(sys.argv) > 1:
+        main()
+    else:
+        run_test1()
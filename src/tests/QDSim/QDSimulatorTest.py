@@ -1,16 +1,34 @@
 import unittest
+from pathlib import Path
+
+import numpy as np
+
 from src.QDSim.QDSimulator import QDSimulator
+from src.utilities.clock import Clock
+
+TEST1 = Path(__file__).parents[2] / 'QDSim' / 'library' / 'test1.txt'
+
 
 class QDSimulatorTest(unittest.TestCase):
 
     def test_init(self):
-        sim = QDSimulator('/Users/corrado/Desktop/CSDcompressor/src/QDSim/library/test1.txt')
+        sim = QDSimulator(TEST1)
         print(sim)
 
     def test_sample(self):
-        sim = QDSimulator('/Users/corrado/Desktop/CSDcompressor/src/QDSim/library/test1.txt')
+        sim = QDSimulator(TEST1)
         print(sim.sample((0, 0)))
 
+    def test_sample_many(self):
+        sim = QDSimulator(TEST1)
+        indices = np.array([[0, 0], [1, 1], [2, 3]])
+        clock = Clock()
+        values = sim.sample_many(indices, clock)
+        self.assertEqual(values.shape, (3,))
+        for i, v in zip(indices, values):
+            self.assertEqual(sim.sample(i), v)
+        self.assertEqual(clock.get_time(), 3)
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,75 @@
+import tempfile
+import time
+import unittest
+from pathlib import Path
+
+import numpy as np
+
+from src.QDSim.analyticSimulator import ConstantInteractionSimulator
+from src.QDSim.storage import save_npy
+from src.flooder.flooder import Flooder
+from src.utilities.clock import Clock
+
+
+class ConstantInteractionSimulatorTest(unittest.TestCase):
+
+    def test_ground_states(self):
+        # two uncoupled dots: the ground state is the induced charge rounded to the nearest integer
+        sim = ConstantInteractionSimulator((41, 41), capacitance=np.eye(2), v_max=4.0, noise=0)
+        states, distances = sim.ground_states(np.array([[0, 0], [10, 31], [6, 4]]))
+        self.assertEqual(states.tolist(), [[0, 0], [1, 3], [1, 0]])
+        # the point (6, 4) is at 0.6 V and 0.4 V, 1 pixel from the transitions at 0.5 V
+        self.assertAlmostEqual(distances[2], 1.0)
+        values = sim.rasterize()
+        self.assertTrue(np.all(values[5]) and np.all(values[:, 15]))
+        # the other lines crossing the row 7 are the transitions of the second dot
+        self.assertEqual(np.flatnonzero(values[7]).tolist(), [5, 15, 25, 35])
+
+    def test_sample_many(self):
+        sim = ConstantInteractionSimulator((30, 30, 30), seed=1)
+        indices = np.array([[0, 0, 0], [5, 17, 29], [29, 29, 29], [5, 17, 29]])
+        clock = Clock()
+        values = sim.sample_many(indices, clock)
+        self.assertEqual(values.shape, (4,))
+        self.assertEqual(values[1], values[3])
+        for i, v in zip(indices, values):
+            self.assertEqual(sim.sample(tuple(i)), v)
+        self.assertEqual(clock.get_time(), 4)
+        with self.assertRaises(IndexError):
+            sim.sample((30, 0, 0))
+
+        # the tile cache computes whole tiles, with the same values
+        cached = ConstantInteractionSimulator((30, 30, 30), seed=1, tile=8, cache_tiles=2)
+        np.testing.assert_array_equal(cached.sample_many(indices), values)
+        self.assertEqual(cached.requests, 1)
+        # the last tile is only 6 points wide
+        self.assertEqual(cached.evaluated, 8 ** 3 + 8 * 8 * 6 + 6 ** 3)
+        cached.sample_many(indices)
+        self.assertEqual(cached.requests, 2)
+        np.testing.assert_array_equal(cached.rasterize(), sim.rasterize())
+
+    def test_latency(self):
+        sim = ConstantInteractionSimulator((20, 20), latency=0.01, per_sample_latency=0.001)
+        start = time.perf_counter()
+        sim.sample_many(np.zeros((10, 2), dtype=np.intp))
+        self.assertGreaterEqual(time.perf_counter() - start, 0.02)
+
+    def test_flood(self):
+        sim = ConstantInteractionSimulator((40, 40, 40), noise=0.05, tile=16)
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / 'diagram.npy'
+            save_npy(sim.rasterize(), path)
+            np.random.seed(0)
+            expected = Flooder(path)
+            expected.run('frontier', 'batch')
+            # the Flooder runs on the simulator instead of the rasterized diagram
+            np.random.seed(0)
+            flooder = Flooder(sim, clock=Clock())
+            flooder.run('frontier', 'batch')
+            self.assertEqual(set(flooder.bCSD), set(expected.bCSD))
+            self.assertGreater(len(flooder.bCSD), 0)
+            self.assertLess(flooder.clock.unique, np.prod(sim.get_shape()))
+
+
+if __name__ == '__main__':
+    unittest.main()
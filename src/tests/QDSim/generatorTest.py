@@ -0,0 +1,51 @@
+import tempfile
+import unittest
+from pathlib import Path
+
+import numpy as np
+
+from src.QDSim.generator import generate, grid_lines, lattice_basis, rotation
+from src.QDSim.storage import save_npy
+from src.flooder.flooder import Flooder
+
+
+class GeneratorTest(unittest.TestCase):
+
+    def test_rotation(self):
+        matrix = rotation(3, [0.1, 0.2, 0.3])
+        np.testing.assert_allclose(matrix @ matrix.T, np.eye(3), atol=1e-12)
+        np.testing.assert_allclose(rotation(2, np.pi / 2), [[0, -1], [1, 0]], atol=1e-12)
+
+    def test_square_grid(self):
+        # the cell centers are at multiples of 8, so the boundaries are at 4 + multiples of 8
+        lines = grid_lines((32, 32), lattice_basis('square', 2, 8))
+        self.assertTrue(np.all(lines[4, :]))
+        self.assertTrue(np.all(lines[:, 12]))
+        self.assertFalse(np.any(lines[0:3, 0:3]))
+
+    def test_honeycomb(self):
+        basis = lattice_basis('honeycomb', 2, 10)
+        # the basis vectors have the edge length and are at 60 degrees from each other
+        np.testing.assert_allclose(np.linalg.norm(basis, axis=0), [10, 10])
+        self.assertAlmostEqual(basis[:, 0] @ basis[:, 1], 50)
+
+    def test_generate(self):
+        diagram = generate('honeycomb', 3, 16, 6, tilt=[0.1, 0.2, 0.3], seed=0)
+        self.assertEqual(diagram.shape, (16, 16, 16))
+        self.assertTrue(np.any(diagram >= 1))
+        np.testing.assert_array_equal(diagram, generate('honeycomb', 3, 16, 6, tilt=[0.1, 0.2, 0.3], seed=0))
+
+    def test_flood(self):
+        # the frontier flood finds every transition line point of a connected square grid
+        diagram = generate('square', 2, 48, 12, noise=0.05, seed=0)
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / 'square.npy'
+            save_npy(diagram, path)
+            np.random.seed(0)
+            flooder = Flooder(path)
+            flooder.run('frontier')
+        self.assertEqual(set(flooder.bCSD), set(map(tuple, np.argwhere(diagram >= 1).tolist())))
+
+
+if __name__ == '__main__':
+    unittest.main()
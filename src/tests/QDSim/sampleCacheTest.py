@@ -0,0 +1,54 @@
+import unittest
+from pathlib import Path
+
+import numpy as np
+
+from src.QDSim.QDSimulator import QDSimulator
+from src.QDSim.sampleCache import SampleCache
+from src.utilities.clock import Clock
+
+TEST1 = Path(__file__).parents[2] / 'QDSim' / 'library' / 'test1.txt'
+
+
+class SampleCacheTest(unittest.TestCase):
+
+    def test_sample(self):
+        sim = QDSimulator(TEST1)
+        cache = SampleCache(sim)
+        clock = Clock()
+        self.assertEqual(cache.sample((1, 1), clock), sim.sample((1, 1)))
+        self.assertEqual(cache.sample((1, 1), clock), sim.sample((1, 1)))
+        # the second sample is served by the cache, the simulator is queried once
+        self.assertEqual(clock.get_time(), 1)
+        self.assertEqual((cache.hits, cache.misses), (1, 1))
+
+    def test_sample_many(self):
+        sim = QDSimulator(TEST1)
+        cache = SampleCache(sim)
+        clock = Clock()
+        cache.sample((0, 0), clock)
+        indices = np.array([[0, 0], [2, 3], [2, 3], [4, 4]])
+        np.testing.assert_array_equal(cache.sample_many(indices, clock), sim.sample_many(indices))
+        # (0, 0) is a hit, (2, 3) is queried once
+        self.assertEqual(clock.get_time(), 3)
+        self.assertEqual((cache.hits, cache.misses), (2, 3))
+
+    def test_eviction(self):
+        sim = QDSimulator(TEST1)
+        cache = SampleCache(sim, maxsize=2)
+        cache.sample((0, 0))
+        cache.sample((1, 1))
+        cache.sample((0, 0))
+        # (1, 1) is the least recently used point and is evicted
+        cache.sample((2, 2))
+        self.assertEqual(len(cache), 2)
+        self.assertEqual(cache.evictions, 1)
+        cache.sample((0, 0))
+        cache.sample((1, 1))
+        stats = cache.stats()
+        self.assertEqual((stats['hits'], stats['misses'], stats['evictions']), (2, 4, 2))
+        self.assertAlmostEqual(stats['hit_rate'], 2 / 6)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,45 @@
+import tempfile
+import unittest
+from pathlib import Path
+
+import numpy as np
+
+from src.QDSim.QDSimulator import QDSimulator
+from src.QDSim.storage import ChunkedArray, convert, load_diagram, save_chunked
+
+TEST1 = Path(__file__).parents[2] / 'QDSim' / 'library' / 'test1.txt'
+
+
+class StorageTest(unittest.TestCase):
+
+    def test_convert(self):
+        path = TEST1
+        sim = QDSimulator(path)
+        indices = np.array([[0, 0], [1, 1], [9, 3], [4, 8]])
+        with tempfile.TemporaryDirectory() as tmp:
+            for name in ['test1.npy', 'test1.bin', 'test1.chunks']:
+                convert(path, Path(tmp) / name, chunks=(4, 3))
+                converted = QDSimulator(Path(tmp) / name)
+                self.assertEqual(tuple(converted.get_shape()), tuple(sim.get_shape()))
+                self.assertEqual(converted.sample((9, 3)), sim.sample((9, 3)))
+                np.testing.assert_array_equal(converted.sample_many(indices), sim.sample_many(indices))
+
+    def test_chunked_lazy(self):
+        diagram = np.arange(4 * 5 * 6, dtype=float).reshape(4, 5, 6)
+        with tempfile.TemporaryDirectory() as tmp:
+            save_chunked(diagram, Path(tmp) / 'diagram.chunks', chunks=(2, 2, 2))
+            chunked = load_diagram(Path(tmp) / 'diagram.chunks')
+            self.assertIsInstance(chunked, ChunkedArray)
+            self.assertEqual(chunked.opened_chunks(), 0)
+            self.assertEqual(chunked[1, 4, 5], diagram[1, 4, 5])
+            # only the chunk of the sampled point is opened
+            self.assertEqual(chunked.opened_chunks(), 1)
+            points = (np.array([0, 3, 3]), np.array([0, 4, 1]), np.array([5, 0, 2]))
+            np.testing.assert_array_equal(chunked[points], diagram[points])
+            np.testing.assert_array_equal(np.asarray(chunked), diagram)
+            with self.assertRaises(IndexError):
+                chunked[4, 0, 0]
+
+
+if __name__ == '__main__':
+    unittest.main()
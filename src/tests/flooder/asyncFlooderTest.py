@@ -0,0 +1,86 @@
+import contextlib
+import io
+import tempfile
+import unittest
+from pathlib import Path
+
+import numpy as np
+
+from src.QDSim.QDSimulator import QDSimulator
+from src.QDSim.asyncSimulator import AsyncLatencySimulator
+from src.QDSim.generator import generate
+from src.QDSim.storage import save_npy
+from src.flooder.asyncFlooder import AsyncFlooder
+from src.flooder.flooder import Flooder
+
+TEST1 = Path(__file__).parents[2] / 'QDSim' / 'library' / 'test1.txt'
+
+
+class AsyncFlooderTest(unittest.TestCase):
+
+    def test_async_flood(self):
+        path = TEST1
+        np.random.seed(0)
+        flooder = Flooder(path)
+        flooder.run()
+        np.random.seed(0)
+        async_sim = AsyncLatencySimulator(QDSimulator(path), latency=1e-3)
+        async_flooder = AsyncFlooder(path, async_sim, max_in_flight=2, batch_size=2)
+        async_flooder.run(mode='async')
+        # assert the async flood finds the same transition line points, each of them once
+        self.assertEqual(len(async_flooder.bCSD), len(set(async_flooder.bCSD)))
+        self.assertEqual(set(async_flooder.bCSD), set(flooder.bCSD))
+        # assert the requests overlap, without exceeding the in flight bound
+        self.assertEqual(async_sim.max_in_flight, 2)
+
+    def test_stream_flood(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            # a sparse diagram, the sequential sampling needs many rounds to reach its confidence
+            path = Path(tmp) / 'diagram.npy'
+            save_npy(generate('honeycomb', 2, 512, 128.0, noise=0.05, seed=0), path)
+            np.random.seed(0)
+            flooder = Flooder(path)
+            with contextlib.redirect_stdout(io.StringIO()):
+                flooder.run('frontier')
+            np.random.seed(0)
+            async_sim = AsyncLatencySimulator(QDSimulator(path), latency=1e-3)
+            stream_flooder = AsyncFlooder(path, async_sim, max_in_flight=4, batch_size=64, stable_rounds=1)
+            with contextlib.redirect_stdout(io.StringIO()):
+                stream_flooder.run(mode='stream')
+            # same seeds and threshold as the sequential sampling, so the same bCSD, despite the threshold shifts
+            self.assertEqual((stream_flooder.max_value, stream_flooder.min_value),
+                             (flooder.max_value, flooder.min_value))
+            self.assertGreater(stream_flooder.threshold_shifts, 0)
+            self.assertEqual(len(stream_flooder.bCSD), len(set(stream_flooder.bCSD)))
+            self.assertEqual(set(stream_flooder.bCSD), set(flooder.bCSD))
+            # the flood started while the sampling was still running
+            self.assertLess(stream_flooder.first_result, stream_flooder.seeding_time)
+
+    def test_stream_threshold_shift(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            # lines of value 2 bridged by a line of value 1, which falls below the threshold once the patch of value 3
+            # is sampled: the flood started with the lower threshold must drop the points it reached through the bridge
+            path = Path(tmp) / 'diagram.npy'
+            diagram = np.zeros((256, 256))
+            diagram[:, 100:102] = 1.0
+            diagram[[40, 41, 120, 121, 200, 201], :] = 2.0
+            diagram[230:246, 10:26] = 3.0
+            save_npy(diagram, path)
+            shifts = 0
+            for seed in range(10):
+                np.random.seed(seed)
+                flooder = Flooder(path)
+                with contextlib.redirect_stdout(io.StringIO()):
+                    flooder.run('frontier')
+                np.random.seed(seed)
+                async_sim = AsyncLatencySimulator(QDSimulator(path), latency=1e-4)
+                stream_flooder = AsyncFlooder(path, async_sim, max_in_flight=4, batch_size=64, stable_rounds=0)
+                with contextlib.redirect_stdout(io.StringIO()):
+                    stream_flooder.run(mode='stream')
+                self.assertEqual(set(stream_flooder.bCSD), set(flooder.bCSD))
+                shifts += stream_flooder.threshold_shifts
+            self.assertGreater(shifts, 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,87 @@
+import tempfile
+import unittest
+from pathlib import Path
+
+import numpy as np
+
+from src.flooder.bCSDFile import BCSDFile, BCSDWriter, morton_decode, morton_encode, save_bCSD, varint_decode, \
+    varint_encode
+from src.flooder.flooder import Flooder
+
+TEST1 = Path(__file__).parents[2] / 'QDSim' / 'library' / 'test1.txt'
+
+
+class BCSDFileTest(unittest.TestCase):
+
+    def test_morton(self):
+        shape = (5, 7, 3)
+        points = np.stack(np.unravel_index(np.arange(5 * 7 * 3), shape), axis=-1)
+        codes = morton_encode(points, shape)
+        self.assertEqual(len(np.unique(codes)), len(points))
+        np.testing.assert_array_equal(morton_decode(codes, shape), points)
+        # the bits of the coordinates are interleaved
+        self.assertEqual(morton_encode([[1, 0], [0, 1], [3, 3]], (4, 4)).tolist(), [1, 2, 15])
+        with self.assertRaises(ValueError):
+            morton_encode([[0] * 5], (2 ** 20,) * 5)
+
+    def test_varint(self):
+        values = np.array([0, 1, 127, 128, 300, 2 ** 35, 2 ** 64 - 1], dtype=np.uint64)
+        encoded = varint_encode(values)
+        self.assertEqual(len(encoded), 1 + 1 + 1 + 2 + 2 + 6 + 10)
+        np.testing.assert_array_equal(varint_decode(encoded), values)
+
+    def test_file(self):
+        np.random.seed(0)
+        shape = (40, 30, 20)
+        raster = np.random.random(shape) < 0.05
+        points = np.argwhere(raster)
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / 'test.bcsd'
+            # stream the points in shuffled batches, with duplicates
+            with BCSDWriter(path, shape, 1.0, 0.0, {'source': 'random'}, block_size=16) as writer:
+                for batch in np.array_split(np.random.permutation(points), 7):
+                    writer.append(batch)
+                writer.append(points[:10])
+            bCSD = BCSDFile(path)
+            self.assertEqual(len(bCSD), len(points))
+            self.assertEqual(bCSD.threshold, 0.5)
+            self.assertEqual(bCSD.metadata, {'source': 'random'})
+            np.testing.assert_array_equal(bCSD.to_dense(), raster)
+            # the membership queries, out of the shape too
+            queries = np.stack(np.unravel_index(np.arange(raster.size), shape), axis=-1)
+            np.testing.assert_array_equal(bCSD.contains_many(queries), raster.ravel())
+            self.assertIn(tuple(points[0]), bCSD)
+            self.assertNotIn((-1, 0, 0), bCSD)
+            self.assertNotIn((40, 0, 0), bCSD)
+
+            # a small buffer spills sorted runs to disk, merged when the writer is closed
+            spilled = Path(tmp) / 'spilled.bcsd'
+            with BCSDWriter(spilled, shape, 1.0, 0.0, block_size=16, buffer_size=50) as writer:
+                for batch in np.array_split(np.random.permutation(points), 7):
+                    writer.append(batch)
+                writer.append(points[:60])
+                self.assertGreater(len(writer.runs), 1)
+            self.assertEqual(len(BCSDFile(spilled)), len(points))
+            np.testing.assert_array_equal(BCSDFile(spilled).codes(), bCSD.codes())
+            np.testing.assert_array_equal(BCSDFile(spilled).contains_many(queries), raster.ravel())
+            self.assertEqual(sorted(p.name for p in Path(tmp).iterdir()), ['spilled.bcsd', 'test.bcsd'])
+
+            save_bCSD([], path, shape)
+            self.assertEqual(len(BCSDFile(path)), 0)
+            self.assertFalse(np.any(BCSDFile(path).to_dense()))
+
+    def test_save(self):
+        np.random.seed(0)
+        flooder = Flooder(TEST1)
+        flooder.run(mode='frontier')
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / 'test1.bcsd'
+            flooder.save(path, {'mode': 'frontier'})
+            bCSD = BCSDFile(path)
+            self.assertEqual(set(map(tuple, bCSD.points().tolist())), set(flooder.bCSD))
+            self.assertEqual(bCSD.shape, flooder.sim.get_shape())
+            self.assertEqual(bCSD.threshold, (flooder.max_value + flooder.min_value) / 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,76 @@
+import contextlib
+import io
+import os
+import tempfile
+import time
+import unittest
+from pathlib import Path
+
+import numpy as np
+
+from src.QDSim.generator import generate
+from src.QDSim.storage import save_diagram
+from src.flooder.batchCompressor import BatchCompressor, ERROR, OK, TIMEOUT, find_diagrams, main, read_manifest
+from src.flooder.bCSDFile import BCSDFile
+from src.flooder.flooder import Flooder
+
+
+class BatchCompressorTest(unittest.TestCase):
+
+    def test_batch(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            sweep = Path(tmp) / 'sweep'
+            sweep.mkdir()
+            for i, suffix in enumerate(('.npy', '.raw', '.chunks', '.txt')):
+                save_diagram(generate('honeycomb', 2, 40, 10.0, noise=0.05, seed=i), sweep / ('diagram' + str(i) + suffix))
+            (sweep / 'notes.md').write_text('not a diagram')
+            (sweep / 'broken.npy').write_bytes(b'not a numpy file')
+            diagrams = find_diagrams([sweep])
+            self.assertEqual([d.name for d in diagrams],
+                             ['broken.npy', 'diagram0.npy', 'diagram1.raw', 'diagram2.chunks', 'diagram3.txt'])
+            self.assertEqual(find_diagrams([str(sweep / 'diagram*.npy')]), [sweep / 'diagram0.npy'])
+
+            output = Path(tmp) / 'output'
+            with contextlib.redirect_stdout(io.StringIO()), contextlib.redirect_stderr(io.StringIO()):
+                summary = main([str(sweep), '--output', str(output), '--workers', '2'])
+            self.assertEqual((summary[OK], summary[ERROR], summary['skipped']), (4, 1, 0))
+            entries = read_manifest(output)
+            self.assertEqual(entries[str(sweep / 'broken.npy')]['status'], ERROR)
+            for diagram in diagrams[1:]:
+                entry = entries[str(diagram)]
+                np.random.seed(0)
+                flooder = Flooder(diagram)
+                with contextlib.redirect_stdout(io.StringIO()):
+                    expected = set(flooder.run('frontier'))
+                bCSD = BCSDFile(output / entry['output'])
+                self.assertEqual(set(map(tuple, bCSD.points().tolist())), expected)
+                self.assertEqual(entry['bCSD_size'], len(expected))
+                self.assertEqual(entry['bytes'], os.path.getsize(output / entry['output']))
+                self.assertLess(entry['samples'], entry['raster_samples'])
+
+            # a rerun only retries the failed diagrams and the modified ones
+            later = time.time() + 10
+            os.utime(sweep / 'diagram0.npy', (later, later))
+            with contextlib.redirect_stdout(io.StringIO()), contextlib.redirect_stderr(io.StringIO()):
+                summary = BatchCompressor(output, workers=2).run(diagrams)
+            self.assertEqual((summary[OK], summary[ERROR], summary['skipped']), (1, 1, 3))
+            self.assertEqual(len((output / 'manifest.jsonl').read_text().splitlines()), 7)
+
+    def test_timeout(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            diagrams = []
+            for i in range(3):
+                diagrams.append(Path(tmp) / ('diagram' + str(i) + '.npy'))
+                save_diagram(generate('honeycomb', 3, 96 if i == 1 else 16, 8.0, noise=0.05, seed=i), diagrams[-1])
+            output = Path(tmp) / 'output'
+            with contextlib.redirect_stdout(io.StringIO()):
+                # the flood of the large diagram takes more than a second, the others a few milliseconds
+                summary = BatchCompressor(output, workers=2, timeout=0.5).run(diagrams)
+            self.assertEqual((summary[OK], summary[TIMEOUT]), (2, 1))
+            entries = read_manifest(output)
+            self.assertEqual(entries[str(diagrams[1])]['status'], TIMEOUT)
+            self.assertFalse((output / 'diagram1.bcsd').exists())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,84 @@
+import tempfile
+import unittest
+from pathlib import Path
+
+import numpy as np
+
+from src.QDSim.generator import generate
+from src.QDSim.storage import save_npy
+from src.flooder.checkpoint import append_record, read_records
+from src.flooder.flooder import Flooder
+from src.utilities.clock import Clock
+
+
+class KilledError(Exception):
+    pass
+
+
+class CheckpointTest(unittest.TestCase):
+
+    def test_records(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / 'run.ckpt'
+            append_record(path, {'kind': 'start'}, {'a': np.arange(3)})
+            append_record(path, {'kind': 'step'}, {'a': np.arange(5)})
+            # a record cut by a crash is ignored
+            with open(path, 'ab') as f:
+                f.write(b'CKPT' + np.uint64(1000).tobytes() + b'partial')
+            records = read_records(path)
+            self.assertEqual([meta['kind'] for meta, _ in records], ['start', 'step'])
+            np.testing.assert_array_equal(records[1][1]['a'], np.arange(5))
+
+    def test_resume(self):
+        diagram = generate('honeycomb', 3, 24, 8, noise=0.1, seed=0)
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / 'honeycomb.npy'
+            save_npy(diagram, path)
+            np.random.seed(0)
+            reference = Flooder(path, cache_size=1000, clock=Clock())
+            reference.run('frontier')
+
+            # kill a checkpointed flood after a few steps
+            checkpoint = Path(tmp) / 'run.ckpt'
+            np.random.seed(0)
+            flooder = Flooder(path, cache_size=1000, clock=Clock(), checkpoint=checkpoint, checkpoint_interval=0)
+            sample_many = flooder.sim.sample_many
+            steps = []
+
+            def killed(indices, clock=None):
+                steps.append(len(indices))
+                if len(steps) == 8:
+                    raise KilledError()
+                return sample_many(indices, clock)
+
+            flooder.sim.sample_many = killed
+            with self.assertRaises(KilledError):
+                flooder.run('frontier')
+            self.assertLess(len(flooder.bCSD), len(reference.bCSD))
+
+            # resume in a new flooder, which continues the same checkpoint file
+            resumed = Flooder(path, cache_size=1000, clock=Clock(), checkpoint=checkpoint, checkpoint_interval=0)
+            resumed.resume(checkpoint)
+            self.assertEqual(resumed.bCSD, reference.bCSD)
+            self.assertEqual(resumed.clock.get_time(), reference.clock.get_time())
+            self.assertEqual(resumed.clock.unique, reference.clock.unique)
+            self.assertEqual(sorted(component['size'] for component in resumed.components()),
+                             sorted(component['size'] for component in reference.components()))
+            self.assertGreater(len(resumed.sim), 0)
+            # a finished flood resumes to its bCSD without sampling
+            done = Flooder(path, clock=Clock())
+            self.assertEqual(done.resume(checkpoint), reference.bCSD)
+            self.assertEqual(read_records(checkpoint)[-1][0]['kind'], 'done')
+
+            # a new run starts the checkpoint file anew
+            np.random.seed(0)
+            Flooder(path, checkpoint=checkpoint, checkpoint_interval=0).run('frontier')
+            kinds = [meta['kind'] for meta, _ in read_records(checkpoint)]
+            self.assertEqual((kinds[0], kinds.count('start'), kinds[-1]), ('start', 1, 'done'))
+            # the other flood modes do not write checkpoints
+            with self.assertRaises(ValueError):
+                Flooder(path, checkpoint=checkpoint).run('queue')
+
+
+if __name__ == '__main__':
+    unittest.main()
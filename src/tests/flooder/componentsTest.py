@@ -0,0 +1,65 @@
+import concurrent.futures
+import tempfile
+import unittest
+from pathlib import Path
+
+import numpy as np
+
+from src.QDSim.storage import save_npy
+from src.flooder.components import label_points, label_tiles
+from src.flooder.flooder import Flooder
+from src.utilities.clock import Clock
+
+
+def make_lines() -> np.ndarray:
+    # three transition lines: a diagonal, a horizontal line and a vertical line touching it at a corner
+    diagram = np.zeros((20, 30))
+    diagram[np.arange(10), np.arange(10)] = 1
+    diagram[15, 2:25] = 1
+    diagram[0:10, 20] = 1
+    diagram[10, 21] = 1
+    return diagram
+
+
+class ComponentsTest(unittest.TestCase):
+
+    def test_label_points(self):
+        points = np.argwhere(make_lines())
+        labels = label_points(points, (20, 30))
+        self.assertEqual(len(np.unique(labels)), 3)
+        self.assertEqual(sorted(np.bincount(labels).tolist()), [10, 11, 23])
+        # the tiled labeling gives the same partition, in a thread pool too
+        for tile in [4, (3, 7), 64]:
+            tiled = label_tiles(points, (20, 30), tile=tile)
+            self.assertEqual(len(set(zip(labels.tolist(), tiled.tolist()))), 3)
+        with concurrent.futures.ThreadPoolExecutor(2) as executor:
+            tiled = label_tiles(points, (20, 30), tile=5, executor=executor)
+        self.assertEqual(len(set(zip(labels.tolist(), tiled.tolist()))), 3)
+
+    def test_flood_components(self):
+        diagram = make_lines()
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / 'lines.npy'
+            save_npy(diagram, path)
+            flooder = Flooder(path, clock=Clock())
+            # two seeds on the diagonal, whose floods meet, one on the horizontal line
+            flooder.seed(np.array([[0, 0], [9, 9], [15, 10], [5, 5]]), np.array([1.0, 1.0, 1.0, 0.0]))
+            flooder.frontier_flood(flooder.to_process)
+            samples = flooder.clock.get_time()
+            # the flood labels its transition line points, with a union-find entry per seed
+            self.assertEqual(sum(len(labels) for labels in flooder.labels), len(flooder.bCSD))
+            self.assertEqual(len(flooder.union_find), 3)
+            components = sorted(flooder.components(), key=lambda component: component['size'])
+            self.assertEqual(flooder.clock.get_time(), samples)
+            self.assertEqual([component['size'] for component in components], [10, 23])
+            np.testing.assert_array_equal(components[1]['bounding_box'][0], [15, 2])
+            np.testing.assert_array_equal(components[1]['bounding_box'][1], [15, 24])
+            # the queue flood does not label the components, they are labeled from the bCSD
+            flooder = Flooder(path)
+            flooder.seed(np.array([[0, 0], [15, 10], [4, 20]]), np.array([1.0, 1.0, 1.0]))
+            flooder.flood(flooder.to_process)
+            self.assertEqual(sorted(component['size'] for component in flooder.components(tile=8)), [10, 11, 23])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,23 +1,35 @@
+import contextlib
+import io
+import tempfile
 import unittest
+from pathlib import Path
 
+import numpy as np
+
+from src.QDSim.generator import generate
+from src.QDSim.storage import save_npy
 from src.flooder.flooder import Flooder
+from src.utilities.clock import Clock
+from src.utilities.neighbours import neighbor_offsets
+
+TEST1 = Path(__file__).parents[2] / 'QDSim' / 'library' / 'test1.txt'
 
 
 class FlooderTest(unittest.TestCase):
 
     def test_load(self):
-        path = '/Users/corrado/Desktop/CSDcompressor/src/QDSim/library/test1.txt'
+        path = TEST1
         flooder = Flooder(path)
 
     def test_estimate_batch_size(self):
-        path = '/Users/corrado/Desktop/CSDcompressor/src/QDSim/library/test1.txt'
+        path = TEST1
         flooder = Flooder(path)
         batch_size = flooder.estimate_batch_size()
         # assert batch_size is an integer and equal 5
         self.assertEqual(batch_size, 14)
 
     def test_sampling(self):
-        path = '/Users/corrado/Desktop/CSDcompressor/src/QDSim/library/test1.txt'
+        path = TEST1
         flooder = Flooder(path)
         batch_size = flooder.estimate_batch_size()
         to_process = flooder.random_sampling(batch_size)
@@ -25,7 +37,7 @@ class FlooderTest(unittest.TestCase):
         self.assertTrue(to_process)
 
     def test_normalize(self):
-        path = '/Users/corrado/Desktop/CSDcompressor/src/QDSim/library/test1.txt'
+        path = TEST1
         flooder = Flooder(path)
         batch_size = flooder.estimate_batch_size()
         to_process = flooder.random_sampling(batch_size)
@@ -33,7 +45,7 @@ class FlooderTest(unittest.TestCase):
         self.assertEqual(flooder.normalize(0.9), 1)
 
     def test_get_neighbors(self):
-        path = '/Users/corrado/Desktop/CSDcompressor/src/QDSim/library/test1.txt'
+        path = TEST1
         flooder = Flooder(path)
         batch_size = flooder.estimate_batch_size()
         to_process = flooder.random_sampling(batch_size)
@@ -42,7 +54,7 @@ class FlooderTest(unittest.TestCase):
 
 
     def test_compress(self):
-        path = '/Users/corrado/Desktop/CSDcompressor/src/QDSim/library/test1.txt'
+        path = TEST1
         flooder = Flooder(path)
         batch_size = flooder.estimate_batch_size()
         to_process = flooder.random_sampling(batch_size)
@@ -51,12 +63,127 @@ class FlooderTest(unittest.TestCase):
         self.assertTrue(flooder.bCSD)
 
     def test_run(self):
-        path = '/Users/corrado/Desktop/CSDcompressor/src/QDSim/library/test1.txt'
+        path = TEST1
         flooder = Flooder(path)
         flooder.run()
         # assert bCSD is not empty
         self.assertTrue(flooder.bCSD)
 
+    def test_frontier_flood(self):
+        path = TEST1
+        np.random.seed(0)
+        flooder = Flooder(path)
+        flooder.run()
+        np.random.seed(0)
+        frontier_flooder = Flooder(path)
+        frontier_flooder.run(mode='frontier')
+        # assert the two floods find the same transition line points, each of them once
+        self.assertEqual(len(frontier_flooder.bCSD), len(set(frontier_flooder.bCSD)))
+        self.assertEqual(set(frontier_flooder.bCSD), set(flooder.bCSD))
+        self.assertEqual(set(frontier_flooder.bCSD), {(i, i) for i in range(10)})
+
+    def test_cache(self):
+        path = TEST1
+        np.random.seed(0)
+        flooder = Flooder(path)
+        flooder.run()
+        np.random.seed(0)
+        cached_flooder = Flooder(path, cache_size=50)
+        cached_flooder.run()
+        # assert the cache does not change the result, and serves the repeated neighbor samples
+        self.assertEqual(cached_flooder.bCSD, flooder.bCSD)
+        self.assertGreater(cached_flooder.sim.stats()['hits'], 0)
+
+    def test_report(self):
+        path = TEST1
+        for mode in ['queue', 'frontier']:
+            np.random.seed(0)
+            flooder = Flooder(path, clock=Clock())
+            flooder.run(mode, sampling='batch')
+            report = flooder.report()
+            self.assertEqual(list(report['phases']), ['estimate', 'random_sampling', 'flood'])
+            self.assertEqual(report['samples'], sum(phase['samples'] for phase in report['phases'].values()))
+            self.assertEqual(report['bCSD_size'], len(flooder.bCSD))
+            # the queue flood samples the neighbors of each point again,
+            # the frontier flood samples each point once, it only repeats some of the random samples
+            if mode == 'queue':
+                self.assertGreater(report['repeated_samples'], report['phases']['random_sampling']['samples'])
+            else:
+                self.assertLessEqual(report['repeated_samples'], report['phases']['random_sampling']['samples'])
+        self.assertIsNone(Flooder(path).report())
+        flooder = Flooder(path, clock=Clock())
+        flooder.run()
+        self.assertEqual(list(flooder.report()['phases']), ['random_sampling', 'flood'])
+
+    def test_trace_flood(self):
+        path = TEST1
+        np.random.seed(0)
+        flooder = Flooder(path)
+        with contextlib.redirect_stdout(io.StringIO()):
+            flooder.run(mode='trace')
+        self.assertEqual(set(flooder.bCSD), {(i, i) for i in range(10)})
+        # a thin line with a bend in 3 dimensions
+        diagram = np.zeros((28, 28, 28))
+        for i in range(12):
+            diagram[2 + i, 2 + i, 2 + i] = 1
+            diagram[13, 14 + i, 13 - i] = 1
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / 'bend.npy'
+            save_npy(diagram, path)
+            samples = {}
+            for mode in ['frontier', 'trace']:
+                flooder = Flooder(path, clock=Clock())
+                with contextlib.redirect_stdout(io.StringIO()):
+                    flooder.seed(np.array([[2, 2, 2], [0, 0, 0]]), np.array([1, 0]))
+                    flooder.flood_modes()[mode](flooder.to_process)
+                samples[mode] = flooder.clock.get_time()
+                # assert the tracer finds the transition line points of the frontier flood, each one once
+                self.assertEqual(set(flooder.bCSD), set(map(tuple, np.argwhere(diagram >= 1).tolist())))
+                self.assertEqual(len(flooder.bCSD), len(set(flooder.bCSD)))
+            self.assertLess(samples['trace'] * 3, samples['frontier'])
+
+    def test_sequential_sampling(self):
+        path = TEST1
+        np.random.seed(0)
+        flooder = Flooder(path, clock=Clock())
+        to_process = flooder.sequential_sampling(round_size=8, min_seeds=3)
+        # assert the sampling stops with enough transition line points, sampled once each
+        self.assertGreaterEqual(to_process.qsize(), 3)
+        self.assertEqual(flooder.clock.get_repeated(), 0)
+        self.assertEqual(flooder.normalize(0.1), 0)
+        self.assertEqual(flooder.normalize(0.9), 1)
+        # assert the budget bounds the samples
+        flooder = Flooder(path, clock=Clock())
+        flooder.sequential_sampling(round_size=8, min_seeds=100, budget=20)
+        self.assertEqual(flooder.clock.get_time(), 20)
+        # assert no transition line point, p = 0, exhausts the budget instead of dividing by zero:
+        # the threshold of these huge values overflows to infinity, above all the samples
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / 'huge.npy'
+            save_npy(np.full((16, 16), 1.7e308), path)
+            flooder = Flooder(path, clock=Clock())
+            with contextlib.redirect_stdout(io.StringIO()):
+                to_process = flooder.sequential_sampling(round_size=8, min_seeds=0, budget=40)
+            self.assertTrue(to_process.empty())
+            self.assertEqual(flooder.clock.get_time(), 40)
+
+    def test_stencil(self):
+        # a transition line with a gap of one point
+        diagram = np.zeros((5, 12))
+        diagram[2, :] = 1
+        diagram[2, 6] = 0
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / 'gap.npy'
+            save_npy(diagram, path)
+            # the d-infinity neighbors at distance 1 stop at the gap, a wider stencil jumps it
+            for stencil, expected in [(None, 6), (neighbor_offsets(2, 2), 11), (neighbor_offsets(2, 2, 'l1'), 11)]:
+                flooder = Flooder(path, stencil=stencil)
+                flooder.seed(np.array([[2, 0], [0, 0]]), np.array([1.0, 0.0]))
+                flooder.frontier_flood(flooder.to_process)
+                self.assertEqual(len(flooder.bCSD), expected)
+            with self.assertRaises(ValueError):
+                Flooder(path, stencil=np.array([[0, 1, 0]]))
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,93 @@
+import contextlib
+import io
+import json
+import tempfile
+import unittest
+from pathlib import Path
+
+import numpy as np
+
+from src.QDSim.generator import generate, grid_lines, lattice_basis
+from src.QDSim.storage import save_npy
+from src.flooder.flooder import Flooder
+from src.flooder.gridFitter import GridFitter, fit_grid, grid_residuals, split_parameters
+from src.utilities.clock import Clock
+
+
+class GridFitterTest(unittest.TestCase):
+
+    def test_residuals(self):
+        rng = np.random.default_rng(0)
+        for kind, dimension in (('square', 2), ('honeycomb', 3)):
+            shape = (24,) * dimension
+            parameters = np.concatenate([[7.0], rng.uniform(0, 5, dimension),
+                                         rng.uniform(-0.3, 0.3, dimension * (dimension - 1) // 2)])
+            edge, intercept, tilt = split_parameters(parameters, dimension)
+            lines = grid_lines(shape, lattice_basis(kind, dimension, edge, tilt), intercept)
+            points = np.argwhere(np.ones(shape, dtype=bool)).astype(float)
+            residuals, jacobian = grid_residuals(points, kind, parameters)
+            # the transition line points are the points within half the line width of a cell boundary
+            np.testing.assert_array_equal(np.abs(residuals) < 0.5, lines.ravel())
+            self.assertTrue(np.all(residuals >= 0))
+            # the analytic Jacobian matches the finite differences, except at the ties between two boundaries
+            numeric = np.empty_like(jacobian)
+            for k in range(len(parameters)):
+                step = np.zeros(len(parameters))
+                step[k] = 1e-6
+                plus, _ = grid_residuals(points, kind, parameters + step, jacobian=False)
+                minus, _ = grid_residuals(points, kind, parameters - step, jacobian=False)
+                numeric[:, k] = (plus - minus) / 2e-6
+            self.assertGreater(np.mean(np.max(np.abs(numeric - jacobian), axis=1) < 1e-5), 0.999)
+
+    def test_fit_grid(self):
+        np.random.seed(0)
+        for kind, dimension, size, edge, tilt in (('square', 2, 128, 12.0, [0.3]), ('honeycomb', 2, 128, 12.0, [-0.2]),
+                                                  ('honeycomb', 3, 48, 9.0, [0.1, -0.15, 0.2])):
+            shape = (size,) * dimension
+            lines = grid_lines(shape, lattice_basis(kind, dimension, edge, tilt), 2.0)
+            points = np.argwhere(lines)
+            parameters, residuals = fit_grid(points[np.random.choice(len(points), 600, replace=False)], shape, kind)
+            fitted_edge, intercept, fitted_tilt = split_parameters(parameters, dimension)
+            self.assertAlmostEqual(fitted_edge, edge, delta=0.05)
+            self.assertLess(np.sqrt(np.mean(residuals ** 2)), 0.35)
+            fitted = grid_lines(shape, lattice_basis(kind, dimension, fitted_edge, fitted_tilt), intercept)
+            self.assertGreater(np.sum(fitted & lines) / np.sum(fitted | lines), 0.9)
+
+    def test_compress(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / 'diagram.npy'
+            diagram = generate('honeycomb', 2, 256, 16.0, tilt=0.25, intercept=3.0, noise=0.05, seed=0)
+            save_npy(diagram, path)
+            np.random.seed(0)
+            fitter = GridFitter(path, 'honeycomb', clock=Clock())
+            with contextlib.redirect_stdout(io.StringIO()):
+                grid = fitter.run()
+                np.random.seed(0)
+                flooder = Flooder(path, clock=Clock())
+                flooder.run('frontier')
+            self.assertAlmostEqual(grid['edge'], 16.0, delta=0.05)
+            self.assertAlmostEqual(grid['tilt'][0], 0.25, delta=0.01)
+            self.assertGreaterEqual(grid['accuracy'], fitter.accuracy)
+            self.assertEqual(fitter.report()['parameters'], 4)
+            # the grid needs a fraction of the samples of the flood
+            self.assertLess(fitter.clock.get_time(), flooder.clock.get_time() / 4)
+            lines = diagram >= 0.5
+            fitted = fitter.rasterize()
+            self.assertGreater(np.sum(fitted & lines) / np.sum(fitted | lines), 0.9)
+            fitter.save_grid(Path(tmp) / 'grid.json')
+            with open(Path(tmp) / 'grid.json') as f:
+                self.assertEqual(json.load(f)['kind'], 'honeycomb')
+
+    def test_flat(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / 'flat.npy'
+            save_npy(np.zeros((16, 16)), path)
+            fitter = GridFitter(path)
+            with contextlib.redirect_stdout(io.StringIO()):
+                self.assertIsNone(fitter.run())
+            with self.assertRaises(ValueError):
+                GridFitter(path, 'triangle')
+
+
+if __name__ == '__main__':
+    unittest.main()
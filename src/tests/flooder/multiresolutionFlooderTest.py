@@ -0,0 +1,49 @@
+import tempfile
+import unittest
+from pathlib import Path
+
+import numpy as np
+
+from src.QDSim.generator import generate
+from src.QDSim.storage import save_npy
+from src.flooder.multiresolutionFlooder import MultiresolutionFlooder, cell_skeleton
+from src.utilities.clock import Clock
+
+
+class MultiresolutionFlooderTest(unittest.TestCase):
+
+    def test_cell_skeleton(self):
+        # the boundary of a 3 x 3 square, all the corners of a unit cube, the 12 edges of a 5 x 5 x 5 cube
+        self.assertEqual(len(cell_skeleton(2, 2)), 8)
+        self.assertEqual(len(cell_skeleton(3, 1)), 8)
+        self.assertEqual(len(cell_skeleton(3, 4)), 8 + 12 * 3)
+
+    def test_multiresolution_flood(self):
+        diagram = generate('honeycomb', 2, 50, 12, tilt=0.2, noise=0.05, seed=0)
+        expected = set(map(tuple, np.argwhere(diagram >= 1).tolist()))
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / 'honeycomb.npy'
+            save_npy(diagram, path)
+            # the refinement alone finds every transition line point of a 2-d diagram
+            flooder = MultiresolutionFlooder(path, stride=8, close=False, clock=Clock())
+            flooder.run()
+            self.assertEqual(set(flooder.bCSD), expected)
+            self.assertEqual(flooder.clock.get_repeated(), 0)
+            self.assertLess(flooder.clock.get_time(), diagram.size)
+            # a coarse leaf relies on the closing flood
+            flooder = MultiresolutionFlooder(path, stride=16, leaf=16)
+            flooder.run()
+            self.assertEqual(set(flooder.bCSD), expected)
+
+    def test_flat(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / 'flat.npy'
+            save_npy(np.zeros((20, 20)), path)
+            flooder = MultiresolutionFlooder(path)
+            self.assertEqual(flooder.run(), [])
+            with self.assertRaises(ValueError):
+                MultiresolutionFlooder(path, stride=6)
+
+
+if __name__ == '__main__':
+    unittest.main()
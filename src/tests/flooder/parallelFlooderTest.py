@@ -0,0 +1,142 @@
+import contextlib
+import io
+import math
+import multiprocessing
+import multiprocessing.queues
+import tempfile
+import time
+import unittest
+from pathlib import Path
+from unittest import mock
+
+import numpy as np
+
+from src.QDSim.QDSimulator import QDSimulator
+from src.QDSim.storage import save_npy
+from src.flooder.flooder import Flooder
+from src.flooder.parallelFlooder import ParallelFlooder, shard_boundaries, shard_owner
+from src.utilities.clock import Clock
+
+TEST1 = Path(__file__).parents[2] / 'QDSim' / 'library' / 'test1.txt'
+
+
+class SlowShardSimulator(QDSimulator):
+    """
+    A simulator answering slowly the requests of the points from the given row on, i.e. of the last shards.
+    """
+
+    def __init__(self, path: Path, row: int, latency: float = 0.05):
+        super().__init__(path)
+        self.row = row
+        self.latency = latency
+
+    def sample_many(self, indices: np.ndarray, clock=None) -> np.ndarray:
+        indices = np.asarray(indices, dtype=np.intp).reshape(-1, len(self.get_shape()))
+        if np.any(indices[:, 0] >= self.row):
+            time.sleep(self.latency)
+        return super().sample_many(indices, clock)
+
+
+class SlowSeedQueue(multiprocessing.queues.Queue):
+    """
+    A queue delaying the seed messages sent by the parent process, so that a shard can flood its seeds
+    before the seeds of the other shards are sent.
+    """
+
+    def __init__(self, maxsize: int = 0):
+        super().__init__(maxsize, ctx=multiprocessing.get_context())
+
+    def put(self, obj, block=True, timeout=None):
+        super().put(obj, block, timeout)
+        if obj is not None and multiprocessing.parent_process() is None and len(obj[0]):
+            time.sleep(0.2)
+
+
+class FailingSimulator(QDSimulator):
+    """
+    A simulator failing on the requests of the points from the given row on.
+    """
+
+    def __init__(self, path: Path, row: int):
+        super().__init__(path)
+        self.row = row
+
+    def sample_many(self, indices: np.ndarray, clock=None) -> np.ndarray:
+        indices = np.asarray(indices, dtype=np.intp).reshape(-1, len(self.get_shape()))
+        if np.any(indices[:, 0] >= self.row):
+            raise OSError('the simulator crashed')
+        return super().sample_many(indices, clock)
+
+
+class ParallelFlooderTest(unittest.TestCase):
+
+    def test_shards(self):
+        boundaries = shard_boundaries((10, 10), 3)
+        self.assertEqual(boundaries.tolist(), [0, 3, 6, 10])
+        points = np.array([[0, 5], [2, 9], [3, 0], [9, 9]])
+        self.assertEqual(shard_owner(points, boundaries).tolist(), [0, 0, 1, 2])
+
+    def test_parallel_flood(self):
+        path = TEST1
+        np.random.seed(0)
+        flooder = Flooder(path)
+        flooder.run()
+        for workers in [1, 3]:
+            np.random.seed(0)
+            parallel_flooder = ParallelFlooder(path, workers=workers)
+            parallel_flooder.run(mode='parallel')
+            # assert the parallel flood finds the same transition line points, each of them once
+            self.assertEqual(len(parallel_flooder.bCSD), len(set(parallel_flooder.bCSD)))
+            self.assertEqual(set(parallel_flooder.bCSD), set(flooder.bCSD))
+
+    def test_unique_samples(self):
+        # the points sampled by the parent and by a worker are counted once as unique samples
+        np.random.seed(0)
+        parallel_flooder = ParallelFlooder(TEST1, workers=2, clock=Clock())
+        with contextlib.redirect_stdout(io.StringIO()):
+            parallel_flooder.run(mode='parallel')
+        clock = parallel_flooder.clock
+        self.assertEqual(clock.unique, len(clock.get_seen()))
+        self.assertGreater(clock.get_repeated(), 0)
+        self.assertLessEqual(clock.unique, math.prod(parallel_flooder.sim.get_shape()))
+
+    def diagram(self, tmp: str) -> Path:
+        # a short line inside the first shard, flooded at once, and a line crossing the slow shards
+        diagram = np.zeros((64, 64))
+        diagram[5, :10] = 1.0
+        diagram[:, 40] = 1.0
+        path = Path(tmp) / 'diagram.npy'
+        save_npy(diagram, path)
+        return path
+
+    def test_slow_shard(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = self.diagram(tmp)
+            seeds = [(5, 0), (60, 40)]
+            flooder = Flooder(path)
+            flooder.min_value, flooder.max_value = 0.0, 1.0
+            flooder.to_process.put_many(np.array(seeds))
+            with contextlib.redirect_stdout(io.StringIO()):
+                flooder.run('frontier', sampling=None)
+            # the first shard floods its seeds before the other seeds are sent,
+            # and before the messages of the slow shards cross the boundaries
+            parallel_flooder = ParallelFlooder(SlowShardSimulator(path, 16), workers=4)
+            parallel_flooder.min_value, parallel_flooder.max_value = 0.0, 1.0
+            parallel_flooder.to_process.put_many(np.array(seeds))
+            with contextlib.redirect_stdout(io.StringIO()), mock.patch('multiprocessing.Queue', SlowSeedQueue):
+                parallel_flooder.run('parallel', sampling=None)
+            self.assertEqual(set(parallel_flooder.bCSD), set(flooder.bCSD))
+            self.assertEqual(len(parallel_flooder.bCSD), 10 + 64)
+
+    def test_dead_worker(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            parallel_flooder = ParallelFlooder(FailingSimulator(self.diagram(tmp), 32), workers=2)
+            parallel_flooder.min_value, parallel_flooder.max_value = 0.0, 1.0
+            parallel_flooder.to_process.put_many(np.array([(5, 0), (10, 40)]))
+            with contextlib.redirect_stdout(io.StringIO()), contextlib.redirect_stderr(io.StringIO()):
+                with self.assertRaises(RuntimeError):
+                    parallel_flooder.run('parallel', sampling=None)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,82 @@
+import tempfile
+import tracemalloc
+import unittest
+from pathlib import Path
+
+import numpy as np
+
+from src.QDSim.generator import generate
+from src.QDSim.storage import save_npy
+from src.flooder.bCSDFile import BCSDFile
+from src.flooder.flooder import Flooder
+from src.flooder.tiledFlooder import SpillBuffer, TiledFlooder
+from src.utilities.clock import Clock
+
+
+class TiledFlooderTest(unittest.TestCase):
+
+    def test_spill_buffer(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            buffer = SpillBuffer(Path(tmp), 1024)
+            for i in range(10):
+                buffer.push(i % 3, np.arange(10 * i, 10 * i + 10, dtype=np.int64))
+            self.assertGreater(buffer.spilled, 0)
+            self.assertLessEqual(buffer.nbytes, 1024)
+            for key in range(3):
+                values = np.concatenate(list(buffer.drain(key, 7)))
+                self.assertEqual(sorted(values.tolist()),
+                                 [v for i in range(key, 10, 3) for v in range(10 * i, 10 * i + 10)])
+            self.assertEqual(buffer.nbytes, 0)
+            self.assertEqual(list(Path(tmp).iterdir()), [])
+
+    def test_tiled_flood(self):
+        diagram = generate('honeycomb', 2, 120, 12, tilt=0.2, noise=0.05, seed=0)
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / 'honeycomb.npy'
+            save_npy(diagram, path)
+            np.random.seed(0)
+            expected = Flooder(path, clock=Clock())
+            expected.run('frontier', 'batch')
+            # a memory limit holding a few bitmaps of the 64 tiles, the others are evicted and reloaded
+            np.random.seed(0)
+            spill = Path(tmp) / 'spill'
+            flooder = TiledFlooder(path, tile=15, memory_limit=16384, spill_dir=spill, clock=Clock())
+            flooder.run(sampling='batch')
+            self.assertEqual(set(flooder.bCSD), set(expected.bCSD))
+            self.assertEqual(len(flooder.bCSD), len(expected.bCSD))
+            # the points are sampled once, like in the frontier flood
+            self.assertEqual(flooder.clock.get_time(), expected.clock.get_time())
+            self.assertEqual(flooder.clock.get_repeated(), expected.clock.get_repeated())
+            self.assertGreater(flooder.store.evictions, 0)
+            self.assertGreater(flooder.store.loads, 0)
+            self.assertGreater(flooder.store.pending.spilled, 0)
+            self.assertEqual(list(spill.iterdir()), [])
+
+            # the bCSD written to a .bcsd file
+            np.random.seed(0)
+            flooder = TiledFlooder(path, tile=32, output=Path(tmp) / 'honeycomb.bcsd')
+            flooder.run(sampling='batch')
+            self.assertEqual(flooder.bCSD, [])
+            self.assertEqual(set(map(tuple, BCSDFile(flooder.output).points().tolist())), set(expected.bCSD))
+
+    def test_memory_limit(self):
+        diagram = generate('honeycomb', 3, 48, 10, tilt=0.2, noise=0.05, seed=0)
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / 'honeycomb.npy'
+            save_npy(diagram, path)
+            limit = 2 ** 19
+            flooder = TiledFlooder(path, tile=16, memory_limit=limit)
+            np.random.seed(0)
+            to_process = flooder.random_sampling(flooder.estimate_batch_size())
+            tracemalloc.start()
+            flooder.flood_tiles(to_process, Path(tmp))
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            self.assertLess(peak, limit)
+            self.assertEqual(flooder.collect(), int(np.sum(diagram >= 1)))
+            with self.assertRaises(ValueError):
+                TiledFlooder(path, tile=16, memory_limit=1024)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,62 @@
+import json
+import unittest
+
+import numpy as np
+
+from src.utilities.clock import Clock
+
+
+class ClockTest(unittest.TestCase):
+
+    def test_tick(self):
+        clock = Clock()
+        clock.tick()
+        clock.tick(3)
+        self.assertEqual(clock.get_time(), 4)
+
+    def test_record(self):
+        clock = Clock(sample_latency=2.0, request_latency=10.0)
+        clock.record(np.array([[0, 0], [1, 1], [1, 1]]), (3, 3))
+        clock.record(np.array([[1, 1], [2, 2]]), (3, 3))
+        self.assertEqual(clock.get_time(), 5)
+        self.assertEqual(clock.requests, 2)
+        self.assertEqual(clock.unique, 3)
+        self.assertEqual(clock.get_repeated(), 2)
+        self.assertEqual(clock.get_virtual_time(), 2 * 10.0 + 5 * 2.0)
+
+    def test_record_sparse(self):
+        # the unique samples of a space of 10^16 points are counted without a bitmap of the whole space
+        clock = Clock()
+        shape = (10 ** 4,) * 4
+        clock.record(np.array([[0, 0, 0, 0], [9999, 9999, 9999, 9999]]), shape)
+        clock.record(np.array([[9999, 9999, 9999, 9999], [1, 2, 3, 4]]), shape)
+        self.assertEqual(clock.unique, 3)
+        self.assertEqual(clock.report()['raster_samples'], 10 ** 16)
+
+    def test_mark(self):
+        # a marked point is not counted, neither when marked nor when sampled again
+        clock = Clock()
+        self.assertEqual(clock.mark(np.array([4, 0]), (3, 3)), 2)
+        self.assertEqual((clock.time, clock.requests, clock.unique), (0, 0, 0))
+        clock.record(np.array([[1, 1], [2, 2]]), (3, 3))
+        self.assertEqual(clock.unique, 1)
+        self.assertEqual(clock.get_seen().tolist(), [0, 4, 8])
+
+    def test_phase(self):
+        clock = Clock()
+        with clock.phase('sampling'):
+            clock.record(np.array([[0, 0], [1, 1]]), (3, 3))
+        with clock.phase('flood'):
+            clock.record(np.array([[2, 2]]), (3, 3))
+        with clock.phase('flood'):
+            clock.record(np.array([[2, 1]]), (3, 3))
+        report = json.loads(clock.to_json())
+        self.assertEqual(report['phases']['sampling']['samples'], 2)
+        self.assertEqual(report['phases']['flood']['samples'], 2)
+        self.assertEqual(report['phases']['flood']['requests'], 2)
+        self.assertGreaterEqual(report['phases']['flood']['wall_time'], 0)
+        self.assertEqual(report['raster_samples'], 9)
+
+
+if __name__ == '__main__':
+    unittest.main()
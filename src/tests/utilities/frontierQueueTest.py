@@ -0,0 +1,73 @@
+import queue
+import threading
+import unittest
+
+import numpy as np
+
+from src.utilities.frontierQueue import FrontierQueue, ThreadSafeFrontierQueue
+from src.utilities.orderedSetQueue import OrderedSetQueue
+
+
+class FrontierQueueTest(unittest.TestCase):
+
+    def test_orderedSetQueue(self):
+        # assert the FrontierQueue behaves like the OrderedSetQueue
+        reference, frontier = OrderedSetQueue(), FrontierQueue((5, 5))
+        for point in [(0, 1), (2, 3), (0, 1), (4, 4), (1, 0)]:
+            reference.put(point)
+            frontier.put(point)
+        self.assertEqual(frontier.qsize(), reference.qsize())
+        self.assertIn((2, 3), frontier)
+        self.assertNotIn((3, 2), frontier)
+        while not reference.empty():
+            self.assertEqual(frontier.get(), reference.get())
+        self.assertTrue(frontier.empty())
+        with self.assertRaises(queue.Empty):
+            frontier.get()
+
+    def test_fifo(self):
+        frontier = FrontierQueue((10, 10, 10), order='fifo', capacity=2)
+        np.random.seed(0)
+        points = np.random.randint(0, 10, (500, 3))
+        unique = np.array(list(dict.fromkeys(map(tuple, points.tolist()))))
+        # interleave the bulk puts and gets to wrap around the ring buffer, a point already queued is skipped
+        frontier.put_many(points[:7])
+        got = [frontier.get_many(3)]
+        frontier.put_many(points[3:7])
+        frontier.put_many(unique[7:])
+        got.append(frontier.get_many())
+        np.testing.assert_array_equal(np.concatenate(got), unique)
+        # a point got can be put again, unless the queue remembers it
+        frontier.put_many(points[:1])
+        self.assertEqual(len(frontier), 1)
+        remember = FrontierQueue((10, 10, 10), remember=True)
+        remember.put_many(points)
+        remember.get_many()
+        remember.put_many(points)
+        self.assertTrue(remember.empty())
+
+    def test_zorder(self):
+        frontier = FrontierQueue((4, 4))
+        frontier.put_many([[3, 3], [0, 1], [2, 0], [1, 0]])
+        np.testing.assert_array_equal(frontier.get_many(zorder=True), [[1, 0], [0, 1], [2, 0], [3, 3]])
+
+    def test_thread_safe(self):
+        frontier = ThreadSafeFrontierQueue((100, 100), order='fifo')
+        points = np.stack(np.unravel_index(np.arange(10000), (100, 100)), axis=-1)
+
+        def put():
+            for batch in np.array_split(points, 100):
+                frontier.put_many(batch)
+
+        threads = [threading.Thread(target=put) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        # each point is queued once
+        self.assertEqual(len(frontier), 10000)
+        self.assertEqual(len(np.unique(frontier.get_flat())), 10000)
+
+
+if __name__ == '__main__':
+    unittest.main()
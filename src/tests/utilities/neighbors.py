@@ -1,18 +1,43 @@
 import unittest
 
-from src.utilities.neighbours import d_infinity_neighbours
+import numpy as np
+
+from src.utilities.neighbours import d_infinity_neighbors, neighbor_offsets, neighbors_many, unique_neighbors
 
 
 class NeighboursTest(unittest.TestCase):
 
     def test_1_infinity_neighbours(self): # test d_infinity_neighbours
         self.assertEqual(
-            d_infinity_neighbours((1, 1), [3, 3]),
+            d_infinity_neighbors((1, 1), [3, 3]),
             [(0, 0), (0, 1), (0, 2), (1, 0), (1, 2), (2, 0), (2, 1), (2, 2)])
         self.assertEqual(
-            d_infinity_neighbours((0, 0), [3, 3]),
+            d_infinity_neighbors((0, 0), [3, 3]),
             [(0, 1), (1, 0), (1, 1)])
 
+    def test_2_infinity_neighbours(self):
+        self.assertEqual(len(d_infinity_neighbors((2, 2), [5, 5], 2)), 24)
+        self.assertEqual(len(d_infinity_neighbors((0, 0), [5, 5], 2)), 8)
+
+    def test_offsets(self):
+        self.assertEqual(neighbor_offsets(3).shape, (26, 3))
+        self.assertEqual(neighbor_offsets(3, 1, 'l1').shape, (6, 3))
+        self.assertEqual(neighbor_offsets(2, 2, 'l1').shape, (12, 2))
+        # the offsets are memoized and read-only
+        self.assertIs(neighbor_offsets(3), neighbor_offsets(3))
+        self.assertFalse(neighbor_offsets(3).flags.writeable)
+        with self.assertRaises(ValueError):
+            neighbor_offsets(2, 1, 'l2')
+
+    def test_neighbors_many(self):
+        points = np.array([[0, 0], [1, 1]])
+        neighbors = neighbors_many(points, (3, 3), neighbor_offsets(2, 1, 'l1'))
+        self.assertEqual(sorted(map(tuple, neighbors.tolist())), [(0, 1), (0, 1), (1, 0), (1, 0), (1, 2), (2, 1)])
+        # a custom stencil
+        stencil = np.array([[0, 2]])
+        self.assertEqual(neighbors_many(points, (3, 3), stencil).tolist(), [[0, 2]])
+        self.assertEqual(unique_neighbors(points, (3, 3), neighbor_offsets(2, 1, 'l1')).tolist(), [1, 3, 5, 7])
+
 
 if __name__ == '__main__':
     unittest.main()
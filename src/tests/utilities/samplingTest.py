@@ -1,14 +1,20 @@
 import unittest
+from pathlib import Path
 
 import numpy as np
 
 from src.QDSim.QDSimulator import QDSimulator
-from src.utilities.sampling import random_sampling, batch_random_sampling
+from src.utilities.clock import Clock
+from src.utilities.sampling import random_sampling, batch_random_sampling, make_sampler, SAMPLERS, Sampler, \
+    SampledSet, SobolSampler, LatinHypercubeSampler, StratifiedSampler
+
+TEST1 = Path(__file__).parents[2] / 'QDSim' / 'library' / 'test1.txt'
+
 
 class SamplingTest(unittest.TestCase):
 
     def test_sample(self):
-        path = '/Users/corrado/Desktop/CSDcompressor/src/QDSim/library/test1.txt'
+        path = TEST1
         # read a tensor from a file
         sim = QDSimulator(path)
         # sample an element from the tensor
@@ -18,17 +24,73 @@ class SamplingTest(unittest.TestCase):
         print('CSD[', i, '] = ', s)
 
     def test_sample_batch(self):
-        path = '/Users/corrado/Desktop/CSDcompressor/src/QDSim/library/test1.txt'
+        path = TEST1
         # sample a batch of elements from the tensor
         batch_size = 10
         # read a tensor from a file
         sim = QDSimulator(path)
         # sample a batch of elements from the tensor
-        batch = batch_random_sampling(sim, batch_size)
+        coords, values = batch_random_sampling(sim, batch_size)
         # check that the sampled elements are in the tensor
-        for i in batch.keys():
-            self.assertEqual(sim.sample(i), batch[i])
-            print('CSD[', i, '] = ', batch[i])
+        for i, v in zip(coords, values):
+            self.assertEqual(sim.sample(i), v)
+            print('CSD[', i, '] = ', v)
+        # check that duplicate draws are sampled only once
+        self.assertLessEqual(len(coords), batch_size)
+        self.assertEqual(len(np.unique(coords, axis=0)), len(coords))
+
+    def test_sample_batch_clock(self):
+        path = TEST1
+        sim = QDSimulator(path)
+        clock = Clock()
+        coords, values = batch_random_sampling(sim, 5000, clock)
+        # the 10x10 tensor has only 100 distinct points, the clock counts each of them once
+        self.assertEqual(len(coords), 100)
+        self.assertEqual(clock.get_time(), 100)
+
+    def test_samplers(self):
+        shape = (16, 8, 4)
+        for name in SAMPLERS:
+            sampler = make_sampler(name, shape)
+            indices = np.concatenate([sampler.draw(64), sampler.draw(64)])
+            # check that the indices are in the space
+            self.assertEqual(indices.shape, (128, 3))
+            self.assertTrue(np.all((indices >= 0) & (indices < shape)))
+        with self.assertRaises(ValueError):
+            make_sampler('unknown', shape)
+
+    def test_low_discrepancy(self):
+        # the first 16 points of the unshifted Sobol sequence hit each cell of a 4x4 grid once, and so do the
+        # latin hypercube and the stratified grid
+        sampler = SobolSampler((4, 4))
+        sampler.shift[:] = 0
+        self.assertEqual(len(np.unique(sampler.draw(16), axis=0)), 16)
+        indices = LatinHypercubeSampler((16, 16)).draw(16)
+        self.assertEqual(sorted(indices[:, 0]), list(range(16)))
+        self.assertEqual(sorted(indices[:, 1]), list(range(16)))
+        self.assertEqual(len(np.unique(StratifiedSampler((4, 4)).draw(16), axis=0)), 16)
+
+    def test_incomplete_sampler(self):
+        # a sampler without the unit method fails when it is constructed, not when it draws
+        class IncompleteSampler(Sampler):
+            pass
+
+        with self.assertRaises(TypeError):
+            IncompleteSampler((4, 4))
+
+    def test_sample_batch_sampler(self):
+        sim = QDSimulator(TEST1)
+        coords, values = batch_random_sampling(sim, 16, sampler=make_sampler('halton', sim.get_shape()))
+        for i, v in zip(coords, values):
+            self.assertEqual(sim.sample(i), v)
+
+    def test_sampled_set(self):
+        sampled = SampledSet((4, 5))
+        self.assertEqual(sampled.add(np.array([[3, 4], [0, 1], [3, 4]])).tolist(), [[0, 1], [3, 4]])
+        # the points sampled before are skipped
+        self.assertEqual(sampled.add(np.array([[1, 0], [0, 1]])).tolist(), [[1, 0]])
+        self.assertEqual(sampled.add(np.array([[3, 4]])).shape, (0, 2))
+        self.assertEqual(len(sampled), 3)
 
 
 if __name__ == '__main__':
@@ -0,0 +1,29 @@
+import unittest
+
+import numpy as np
+
+from src.utilities.unionFind import UnionFind
+
+
+class UnionFindTest(unittest.TestCase):
+
+    def test_union(self):
+        union_find = UnionFind(6)
+        union_find.union([0, 4], [3, 5])
+        np.testing.assert_array_equal(union_find.find(np.arange(6)), [0, 1, 2, 0, 4, 4])
+        # a chain of unions joins the two sets through their roots
+        union_find.union([5, 2], [3, 1])
+        np.testing.assert_array_equal(union_find.find(np.arange(6)), [0, 1, 1, 0, 0, 0])
+        np.testing.assert_array_equal(union_find.compact([5, 2, 0]), [0, 1, 0])
+        self.assertEqual(union_find.add(2).tolist(), [6, 7])
+        self.assertEqual(len(union_find), 8)
+
+    def test_path(self):
+        # a path 0 - 1 - ... - 999 given in reverse order joins a single set
+        union_find = UnionFind(1000)
+        union_find.union(np.arange(999, 0, -1), np.arange(998, -1, -1))
+        self.assertFalse(np.any(union_find.find(np.arange(1000))))
+
+
+if __name__ == '__main__':
+    unittest.main()
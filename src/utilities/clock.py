@@ -1,11 +1,145 @@
+import contextlib
+import json
+import math
+import time
+
+import numpy as np
+
+
 class Clock:
+    """
+    A virtual timer measuring the cost of a compression method in simulator samples.
+
+    The simulators record every request on the clock, with the sampled points, so the clock counts the samples,
+    the unique and the repeated ones, and the requests. The virtual time of a run is computed with a simple latency model:
+    virtual_time = requests * request_latency + samples * sample_latency
+    which is what a run would cost on a real simulator or instrument, and what a dense raster scan of the whole
+    diagram costs: volume * sample_latency (+ request_latency).
 
-    def __init__(self):
+    The phases of a run are measured with the phase context manager, recording their wall time and samples.
+    """
+
+    def __init__(self, sample_latency: float = 1.0, request_latency: float = 0.0):
+        """
+        :param sample_latency: the virtual cost of a sampled point, e.g. in seconds
+        :param request_latency: the virtual cost of a request to the simulator, whatever its number of points
+        """
         self.time = 0
+        self.requests = 0
+        self.unique = 0
+        self.sample_latency = sample_latency
+        self.request_latency = request_latency
+        self.phases = dict()
+        # the linear indexes of the sampled points, a set growing with the samples rather than a bitmap of the whole
+        # space, so that a clock costs nothing on the lazy, out-of-core or high-dimensional diagrams
+        self.__seen = set()
+        self.__shape = None
 
-    def tick(self):
-        self.time += 1
+    def tick(self, n: int = 1):
+        self.time += n
 
     def get_time(self):
         return self.time
 
+    def record(self, indices: np.ndarray, shape: tuple):
+        """
+        Record a request to the simulator.
+
+        :param indices: integer array of shape (N, d), the sampled points
+        :param shape: the dimensions of the simulated space
+        """
+        self.requests += 1
+        self.tick(len(indices))
+        flat = np.ravel_multi_index(tuple(np.asarray(indices, dtype=np.intp).reshape(-1, len(shape)).T), shape)
+        self.unique += self.mark(flat, shape)
+
+    def mark(self, flat: np.ndarray, shape: tuple) -> int:
+        """
+        Mark points as sampled without counting a request nor samples, e.g. to restore a clock from a checkpoint
+        before adding its counters.
+
+        :param flat: the linear (C order) indexes of the points
+        :param shape: the dimensions of the simulated space
+        :return: the number of points which were not marked yet
+        """
+        if self.__shape != tuple(shape):
+            self.__shape = tuple(shape)
+            self.__seen = set()
+        seen = len(self.__seen)
+        self.__seen.update(np.asarray(flat).ravel().tolist())
+        return len(self.__seen) - seen
+
+    def get_seen(self) -> np.ndarray:
+        """
+        :return: the sorted linear indexes of the unique sampled points
+        """
+        return np.sort(np.fromiter(self.__seen, dtype=np.intp, count=len(self.__seen)))
+
+    def add(self, samples: int, requests: int = 0, unique: int = None):
+        """
+        Add the counters of a run measured elsewhere, e.g. by a worker process sampling a disjoint set of points.
+        A point is counted as unique only the first time it is sampled, whatever the phase or the process sampling it:
+        if the run may have sampled points already seen by this clock, pass the result of mark as unique.
+
+        :param unique: the unique samples, defaults to samples
+        """
+        self.tick(samples)
+        self.requests += requests
+        self.unique += samples if unique is None else unique
+
+    def get_repeated(self) -> int:
+        return self.time - self.unique
+
+    def get_virtual_time(self) -> float:
+        return self.requests * self.request_latency + self.time * self.sample_latency
+
+    @contextlib.contextmanager
+    def phase(self, name: str):
+        """
+        Measure the wall time and the samples of a phase of a run.
+        A phase entered more than once accumulates its measures.
+        """
+        samples, requests = self.time, self.requests
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            measures = self.phases.setdefault(name, {'wall_time': 0.0, 'samples': 0, 'requests': 0})
+            measures['wall_time'] += time.perf_counter() - start
+            measures['samples'] += self.time - samples
+            measures['requests'] += self.requests - requests
+
+    def report(self) -> dict:
+        """
+        :return: a machine-readable report of the run, see to_json
+        """
+        phases = dict()
+        for name, measures in self.phases.items():
+            phases[name] = dict(measures, virtual_time=measures['requests'] * self.request_latency
+                                + measures['samples'] * self.sample_latency)
+        report = {
+            'samples': self.time,
+            'unique_samples': self.unique,
+            'repeated_samples': self.get_repeated(),
+            'requests': self.requests,
+            'sample_latency': self.sample_latency,
+            'request_latency': self.request_latency,
+            'virtual_time': self.get_virtual_time(),
+            'phases': phases,
+        }
+        if self.__shape is not None:
+            # the cost of a dense raster scan of the whole diagram, in a single request
+            report['raster_samples'] = math.prod(self.__shape)
+            report['raster_virtual_time'] = self.request_latency + math.prod(self.__shape) * self.sample_latency
+        return report
+
+    def to_json(self, path=None) -> str:
+        """
+        :param path: if given, the report is also written to this file
+        :return: the report as a JSON string
+        """
+        report = json.dumps(self.report(), indent=2)
+        if path is not None:
+            with open(path, 'w') as f:
+                f.write(report)
+        return report
@@ -0,0 +1,221 @@
+"""
+Compact frontier queues of the points of an N-d space, a replacement of the OrderedSetQueue for large floods.
+
+The points are stored as int64 linear (C order) indexes in a ring buffer, 8 bytes per queued point,
+and their membership in a bitmap of the space, 1 bit per point of the space,
+instead of a tuple, a linked list node and a dict entry per point.
+"""
+
+import math
+import queue
+import threading
+
+import numpy as np
+
+from src.utilities.morton import morton_encode
+
+ORDERS = ('fifo', 'lifo')
+
+
+class FrontierQueue:
+    """
+    A queue of distinct points of an N-d space: a point already in the queue is not added again.
+
+    It is a drop-in replacement of the OrderedSetQueue of the floods, with the put, get, empty and qsize methods
+    of queue.Queue on coordinate tuples, and the bulk put_many and get_many methods on integer arrays of shape (N, d).
+    """
+
+    def __init__(self, shape: tuple, order: str = 'lifo', remember: bool = False, capacity: int = 1024):
+        """
+        :param shape: the dimensions of the space
+        :param order: 'fifo' to get the points in the order they were put, or 'lifo' to get the last one first,
+            like the OrderedSetQueue
+        :param remember: if True, a point is queued at most once even after it is got, the queue is then
+            also the visited set of a flood
+        :param capacity: the initial capacity of the ring buffer, it doubles when it is full
+        """
+        if order not in ORDERS:
+            raise ValueError('Unknown order ' + str(order) + ', expected one of ' + str(ORDERS))
+        self.shape = tuple(int(s) for s in shape)
+        self.order = order
+        self.remember = remember
+        # the bitmap is a bytearray for the fast single point operations, and a numpy view of it for the bulk ones
+        self.__bytes = bytearray((math.prod(self.shape) + 7) // 8)
+        self.__bits = np.frombuffer(self.__bytes, dtype=np.uint8)
+        self.__strides = tuple(math.prod(self.shape[axis + 1:]) for axis in range(len(self.shape)))
+        self.__buffer = np.empty(max(1, capacity), dtype=np.int64)
+        self.__head = 0
+        self.__size = 0
+
+    def __len__(self) -> int:
+        return self.__size
+
+    def qsize(self) -> int:
+        return self.__size
+
+    def empty(self) -> bool:
+        return self.__size == 0
+
+    def nbytes(self) -> int:
+        """
+        :return: the memory size of the ring buffer and of the bitmap, in bytes
+        """
+        return self.__buffer.nbytes + self.__bits.nbytes
+
+    def __contains__(self, point: tuple) -> bool:
+        return bool(self.contains_flat(np.array([np.ravel_multi_index(point, self.shape)]))[0])
+
+    def contains_flat(self, flat: np.ndarray) -> np.ndarray:
+        """
+        :param flat: the linear indexes of some points
+        :return: a boolean array, True for the points in the queue, or ever put in the queue if remember is True
+        """
+        flat = np.asarray(flat, dtype=np.int64)
+        return ((self.__bits[flat >> 3] >> (flat & 7).astype(np.uint8)) & 1).astype(bool)
+
+    def put(self, point: tuple, block: bool = True, timeout: float = None):
+        """
+        :param point: the coordinates of a point, block and timeout are ignored, the queue is unbounded
+        """
+        flat = 0
+        for c, n, stride in zip(point, self.shape, self.__strides):
+            if not 0 <= c < n:
+                raise ValueError('Point ' + str(point) + ' out of the shape ' + str(self.shape))
+            flat += int(c) * stride
+        byte, bit = flat >> 3, 1 << (flat & 7)
+        if self.__bytes[byte] & bit:
+            return
+        self.__bytes[byte] |= bit
+        if self.__size == len(self.__buffer):
+            self.__grow(self.__size + 1)
+        self.__buffer[(self.__head + self.__size) % len(self.__buffer)] = flat
+        self.__size += 1
+
+    def get(self, block: bool = True, timeout: float = None) -> tuple:
+        """
+        :return: the coordinates of a point, block and timeout are ignored
+        """
+        if self.__size == 0:
+            raise queue.Empty
+        if self.order == 'fifo':
+            flat = int(self.__buffer[self.__head])
+            self.__head = (self.__head + 1) % len(self.__buffer)
+        else:
+            flat = int(self.__buffer[(self.__head + self.__size - 1) % len(self.__buffer)])
+        self.__size -= 1
+        if not self.remember:
+            self.__bytes[flat >> 3] &= ~(1 << (flat & 7)) & 0xff
+        point = []
+        for stride in self.__strides:
+            c, flat = divmod(flat, stride)
+            point.append(c)
+        return tuple(point)
+
+    def put_many(self, points: np.ndarray):
+        """
+        :param points: integer array of shape (N, d)
+        """
+        points = np.asarray(points, dtype=np.intp).reshape(-1, len(self.shape))
+        self.put_flat(np.ravel_multi_index(tuple(points.T), self.shape))
+
+    def get_many(self, n: int = None, zorder: bool = False) -> np.ndarray:
+        """
+        :param n: the maximum number of points to get, defaults to all the queued points
+        :param zorder: if True, the points got are sorted in Morton order, so that the points close in space,
+            hence in the diagram storage, are sampled together
+        :return: integer array of shape (k, d), k <= n
+        """
+        flat = self.get_flat(n)
+        points = np.stack(np.unravel_index(flat, self.shape), axis=-1).reshape(-1, len(self.shape))
+        if zorder:
+            points = points[np.argsort(morton_encode(points, self.shape), kind='stable')]
+        return points
+
+    def put_flat(self, flat: np.ndarray):
+        """
+        :param flat: the linear indexes of the points to put, the points already in the queue are skipped
+        """
+        flat = np.asarray(flat, dtype=np.int64).ravel()
+        # deduplicate keeping the first occurrences in order, and skip the points already queued
+        _, first = np.unique(flat, return_index=True)
+        flat = flat[np.sort(first)]
+        flat = flat[~self.contains_flat(flat)]
+        if len(flat) == 0:
+            return
+        np.bitwise_or.at(self.__bits, flat >> 3, np.left_shift(1, flat & 7).astype(np.uint8))
+
+        if self.__size + len(flat) > len(self.__buffer):
+            self.__grow(self.__size + len(flat))
+        self.__write((self.__head + self.__size) % len(self.__buffer), flat)
+        self.__size += len(flat)
+
+    def get_flat(self, n: int = None) -> np.ndarray:
+        """
+        :param n: the maximum number of points to get, defaults to all the queued points
+        :return: the linear indexes of the points got
+        """
+        n = self.__size if n is None else min(n, self.__size)
+        if self.order == 'fifo':
+            flat = self.__slots(self.__head, n)
+            self.__head = (self.__head + n) % len(self.__buffer)
+        else:
+            # the last points first
+            flat = self.__slots(self.__head + self.__size - n, n)[::-1]
+        self.__size -= n
+        if not self.remember:
+            np.bitwise_and.at(self.__bits, flat >> 3, ~np.left_shift(1, flat & 7).astype(np.uint8))
+        return flat
+
+    def __grow(self, size: int):
+        # double the capacity of the ring buffer until it holds size points, and unwrap it
+        capacity = len(self.__buffer)
+        while capacity < size:
+            capacity *= 2
+        buffer = np.empty(capacity, dtype=np.int64)
+        buffer[:self.__size] = self.__slots(self.__head, self.__size)
+        self.__buffer, self.__head = buffer, 0
+
+    def __slots(self, start: int, n: int) -> np.ndarray:
+        # a copy of the n slots of the ring buffer from start, wrapping around
+        start %= len(self.__buffer)
+        end = start + n
+        if end <= len(self.__buffer):
+            return self.__buffer[start:end].copy()
+        return np.concatenate([self.__buffer[start:], self.__buffer[:end - len(self.__buffer)]])
+
+    def __write(self, start: int, flat: np.ndarray):
+        # write flat in the ring buffer from start, wrapping around
+        split = min(len(flat), len(self.__buffer) - start)
+        self.__buffer[start:start + split] = flat[:split]
+        self.__buffer[:len(flat) - split] = flat[split:]
+
+
+class ThreadSafeFrontierQueue(FrontierQueue):
+    """
+    A FrontierQueue whose methods hold a lock, so it can be shared by threads.
+    A bulk method is atomic: a point put by several threads at the same time is queued once.
+    """
+
+    def __init__(self, shape: tuple, order: str = 'lifo', remember: bool = False, capacity: int = 1024):
+        super().__init__(shape, order, remember, capacity)
+        self.__lock = threading.RLock()
+
+    def put_flat(self, flat: np.ndarray):
+        with self.__lock:
+            super().put_flat(flat)
+
+    def get_flat(self, n: int = None) -> np.ndarray:
+        with self.__lock:
+            return super().get_flat(n)
+
+    def put(self, point: tuple, block: bool = True, timeout: float = None):
+        with self.__lock:
+            super().put(point, block, timeout)
+
+    def get(self, block: bool = True, timeout: float = None) -> tuple:
+        with self.__lock:
+            return super().get(block, timeout)
+
+    def contains_flat(self, flat: np.ndarray) -> np.ndarray:
+        with self.__lock:
+            return super().contains_flat(flat)
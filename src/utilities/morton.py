@@ -0,0 +1,48 @@
+"""
+Morton (Z-order) codes of the points of an N-d space, their bits interleave the bits of the coordinates,
+so that the points close in space have close codes.
+"""
+
+import numpy as np
+
+
+def morton_bits(shape: tuple) -> int:
+    """
+    :return: the number of bits per coordinate of the Morton codes of a space of the given shape
+    """
+    bits = max(1, int(max(shape) - 1).bit_length())
+    if bits * len(shape) > 64:
+        raise ValueError('The Morton codes of shape ' + str(tuple(shape)) + ' do not fit in 64 bits')
+    return bits
+
+
+def morton_encode(points: np.ndarray, shape: tuple) -> np.ndarray:
+    """
+    Interleave the bits of the coordinates of the points, the bit b of the axis a is the bit b * d + a of the code.
+
+    :param points: integer array of shape (N, d)
+    :param shape: the dimensions of the space
+    :return: the Morton codes of the points, an uint64 array of shape (N,)
+    """
+    dimension = len(shape)
+    points = np.asarray(points, dtype=np.uint64).reshape(-1, dimension)
+    codes = np.zeros(len(points), dtype=np.uint64)
+    for bit in range(morton_bits(shape)):
+        for axis in range(dimension):
+            codes |= ((points[:, axis] >> np.uint64(bit)) & np.uint64(1)) << np.uint64(bit * dimension + axis)
+    return codes
+
+
+def morton_decode(codes: np.ndarray, shape: tuple) -> np.ndarray:
+    """
+    :param codes: the Morton codes, see morton_encode
+    :param shape: the dimensions of the space
+    :return: the points, an integer array of shape (N, d)
+    """
+    dimension = len(shape)
+    codes = np.asarray(codes, dtype=np.uint64)
+    points = np.zeros((len(codes), dimension), dtype=np.uint64)
+    for bit in range(morton_bits(shape)):
+        for axis in range(dimension):
+            points[:, axis] |= ((codes >> np.uint64(bit * dimension + axis)) & np.uint64(1)) << np.uint64(bit)
+    return points.astype(np.intp)
@@ -1,5 +1,93 @@
+import functools
 import itertools
 
+import numpy as np
+
+
+NORMS = ('inf', 'l1')
+
+
+@functools.lru_cache(maxsize=None)
+def neighbor_offsets(dimension: int, distance: int = 1, norm: str = 'inf') -> np.ndarray:
+    """
+    This method generates the offsets of the neighbors of the origin in a n-dimensional space, within a distance
+    by the given norm, so that the neighbors of any batch of points can be obtained by broadcasting:
+    points[:, None, :] + offsets.
+    The offsets are memoized for each (dimension, distance, norm), the returned array is read-only.
+
+    Any other integer array of shape (n, dimension) can be used as a custom stencil in place of these offsets.
+
+    :param dimension: the number of dimensions of the space
+    :param distance: the distance from the point
+    :param norm: 'inf' for the d-infinity norm ||x - y|| = max(|x_i - y_i|),
+        or 'l1' for the d-1 norm ||x - y|| = sum(|x_i - y_i|)
+
+    :return: an integer array of shape (n, dimension), the null vector excluded, in itertools.product order
+    """
+    if distance < 0:
+        raise ValueError('Distance must be a positive integer')
+    if norm not in NORMS:
+        raise ValueError('Unknown norm ' + str(norm) + ', expected one of ' + str(NORMS))
+
+    steps = range(-distance, distance + 1)
+    offsets = np.array(list(itertools.product(steps, repeat=dimension)), dtype=np.intp).reshape(-1, dimension)
+    if norm == 'l1':
+        offsets = offsets[np.sum(np.abs(offsets), axis=1) <= distance]
+    # remove the null vector
+    offsets = offsets[np.any(offsets != 0, axis=1)]
+    offsets.setflags(write=False)
+    return offsets
+
+
+def neighbors_many(points: np.ndarray, shape: tuple, offsets: np.ndarray) -> np.ndarray:
+    """
+    This method generates the neighbors of many points at once, by broadcasting the offsets over the points.
+    The neighbors outside the space are dropped, a neighbor shared by two points appears twice.
+
+    :param points: integer array of shape (N, d)
+    :param shape: the dimensions of the space
+    :param offsets: the stencil, e.g. from neighbor_offsets
+
+    :return: an integer array of shape (M, d), M <= N * len(offsets)
+    """
+    dimension = len(shape)
+    points = np.asarray(points, dtype=np.intp).reshape(-1, dimension)
+    neighbors = (points[:, None, :] + offsets[None, :, :]).reshape(-1, dimension)
+    return neighbors[np.all((neighbors >= 0) & (neighbors < shape), axis=1)]
+
+
+def neighbor_pairs(points: np.ndarray, shape: tuple, offsets: np.ndarray) -> tuple:
+    """
+    This method generates the neighbors of many points at once, like neighbors_many, with the point of each neighbor.
+
+    :param points: integer array of shape (N, d)
+    :param shape: the dimensions of the space
+    :param offsets: the stencil, e.g. from neighbor_offsets
+
+    :return: the index in points of the point of each neighbor, an integer array of shape (M,),
+        and the neighbors, an integer array of shape (M, d)
+    """
+    dimension = len(shape)
+    points = np.asarray(points, dtype=np.intp).reshape(-1, dimension)
+    neighbors = (points[:, None, :] + offsets[None, :, :]).reshape(-1, dimension)
+    sources = np.repeat(np.arange(len(points)), len(offsets))
+    inside = np.all((neighbors >= 0) & (neighbors < shape), axis=1)
+    return sources[inside], neighbors[inside]
+
+
+def unique_neighbors(points: np.ndarray, shape: tuple, offsets: np.ndarray) -> np.ndarray:
+    """
+    This method generates the neighbors of many points at once, as sorted unique linear (C order) indexes.
+
+    :param points: integer array of shape (N, d)
+    :param shape: the dimensions of the space
+    :param offsets: the stencil, e.g. from neighbor_offsets
+
+    :return: a sorted integer array of linear indexes
+    """
+    neighbors = neighbors_many(points, shape, offsets)
+    return np.unique(np.ravel_multi_index(tuple(neighbors.T), shape))
+
 
 def d_infinity_neighbors(point: tuple, shape: list, distance: int = 1) -> list:
     """
@@ -7,11 +95,8 @@ def d_infinity_neighbors(point: tuple, shape: list, distance: int = 1) -> list:
     The d-infinity neighbors are the points that are at a distance of d from the given point by the d-infinity norm:
     ||x - y|| = max(|x_i - y_i|).
 
-    To achieve this, the method uses itertools.product Cartesian product of your current location with each coordinate
-    perturbed by d in each direction.
-
-    E.g. d = 1. You'll have a list of triples derived from your current point as such: diag_coord = [(x-1, x, x+1) for x in point]
-    Now, you take the product of all those triples, recombine each set, and you have your diagonals.
+    To achieve this, the method uses the memoized offsets of neighbor_offsets, the Cartesian product of
+    [-distance, distance] in each dimension, and drops the neighbors outside the space.
 
     :param point: tuple representing the point
     :param shape: list representing the dimensions of the space
@@ -19,27 +104,17 @@ def d_infinity_neighbors(point: tuple, shape: list, distance: int = 1) -> list:
 
     :return: list of tuples representing the coordinates of the d-infinity neighbors points of the given point
     """
-    if distance < 0:
-        raise ValueError('Distance must be a positive integer')
-    # TODO: implement for d > 1
-    if distance != 1:
-        raise ValueError('Not implemented yet')
+    offsets = neighbor_offsets(len(shape), distance)
+    return list(map(tuple, neighbors_many(np.array([point]), tuple(shape), offsets).tolist()))
 
-    # compute the number of dimensions
-    dimension = len(shape)
 
-    # init neighbors list
-    neighbors = []
-
-    # generate the neighbors
-    for delta in itertools.product([-1, 0, 1], repeat=dimension):
-        # if the delta is the null vector, skip it
-        if all([x == 0 for x in delta]):
-            continue
-        # get the coordinates of the neighbor
-        neighbor = tuple([point[i] + delta[i] for i in range(dimension)])
-        # check if the neighbor is in the simulator space
-        if all(0 <= neighbor[i] < shape[i] for i in range(dimension)):
-            neighbors.append(neighbor)
-
-    return neighbors
+def d_infinity_offsets(dimension: int, distance: int = 1) -> np.ndarray:
+    """
+    This method generates the offsets of the d-infinity neighbors of the origin, see neighbor_offsets.
+
+    :param dimension: the number of dimensions of the space
+    :param distance: the distance from the point
+
+    :return: an integer array of shape ((2 * distance + 1) ^ dimension - 1, dimension), the null vector excluded
+    """
+    return neighbor_offsets(dimension, distance, 'inf')
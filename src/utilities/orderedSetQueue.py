@@ -1,9 +1,9 @@
 from queue import Queue
 
-import collections
+import collections.abc
 
 
-class OrderedSet(collections.MutableSet):
+class OrderedSet(collections.abc.MutableSet):
 
     def __init__(self, iterable=None):
         self.end = end = []
@@ -1,6 +1,9 @@
+from abc import ABC, abstractmethod
+
 import numpy as np
 
 from src.QDSim.QDSimulator import QDSimulator
+from src.utilities.clock import Clock
 
 def random_sampling(sim: QDSimulator) -> tuple:
     """
@@ -19,18 +22,244 @@ def random_sampling(sim: QDSimulator) -> tuple:
     # return the element at the sampled indices
     return indices, sim.sample(indices)
 
-def batch_random_sampling(sim: QDSimulator, batch_size: int) -> list:
+def random_indices(shape: tuple, batch_size: int) -> np.ndarray:
+    """
+    Draw a batch of random indices from a space of the given shape, all at once.
+
+    :param shape: the dimensions of the space
+    :param batch_size: the number of indices to draw
+    :return: an integer array of shape (batch_size, d), one row of coordinates per draw
+    """
+    return np.random.randint(0, shape, size=(batch_size, len(shape)))
+
+
+def unique_indices(indices: np.ndarray, shape: tuple) -> np.ndarray:
+    """
+    Remove the duplicate rows of an index array.
+    The rows are linearized with np.ravel_multi_index so the deduplication is a 1-d np.unique,
+    which is much faster than np.unique(axis=0) on large batches.
+
+    :param indices: an integer array of shape (N, d)
+    :param shape: the dimensions of the space
+    :return: the unique rows of indices, in linearized (C) order
+    """
+    flat = np.unique(np.ravel_multi_index(tuple(indices.T), shape))
+    return np.stack(np.unravel_index(flat, shape), axis=-1)
+
+
+class SampledSet:
+    """
+    The points sampled so far, to draw rounds of new points.
+    Their linear indexes are kept in a hash set growing with the samples rather than a bitmap of the whole space,
+    so a round is deduplicated in O(round size) whatever the number of points sampled before.
+    """
+
+    def __init__(self, shape: tuple):
+        self.shape = tuple(shape)
+        self.__seen = set()
+
+    def __len__(self) -> int:
+        return len(self.__seen)
+
+    def add(self, indices: np.ndarray) -> np.ndarray:
+        """
+        Add a round of points, and keep the ones not sampled before.
+
+        :param indices: an integer array of shape (N, d), possibly with duplicate rows
+        :return: the unique rows of indices not sampled before, in linearized (C) order
+        """
+        flat = np.unique(np.ravel_multi_index(tuple(np.asarray(indices).reshape(-1, len(self.shape)).T), self.shape))
+        flat = np.fromiter((index for index in flat.tolist() if index not in self.__seen), dtype=np.intp)
+        self.__seen.update(flat.tolist())
+        return np.stack(np.unravel_index(flat, self.shape), axis=-1).reshape(-1, len(self.shape))
+
+
+class Sampler(ABC):
+    """
+    A strategy to draw the indices of the points to sample from a space of the given shape.
+    Subclasses generate points in the unit hypercube [0, 1)^d with the unit method, which draw scales to indices.
+    A sampler is stateful: successive draws continue the same sequence, so they do not repeat the same points.
+    """
+
+    def __init__(self, shape: tuple):
+        self.shape = tuple(shape)
+        self.dimension = len(self.shape)
+
+    @abstractmethod
+    def unit(self, n: int) -> np.ndarray:
+        """
+        :param n: the number of points to draw
+        :return: an array of shape (n, d) of points in [0, 1)^d
+        """
+
+    def draw(self, n: int) -> np.ndarray:
+        """
+        :param n: the number of indices to draw
+        :return: an integer array of shape (n, d), one row of coordinates per draw
+        """
+        indices = np.floor(self.unit(n) * self.shape).astype(np.intp)
+        return np.minimum(indices, np.array(self.shape) - 1)
+
+
+class UniformSampler(Sampler):
+    """
+    Uniform i.i.d. indices, the seeds can cluster and leave gaps.
+    """
+
+    def unit(self, n: int) -> np.ndarray:
+        return np.random.random_sample((n, self.dimension))
+
+    def draw(self, n: int) -> np.ndarray:
+        return random_indices(self.shape, n)
+
+
+class HaltonSampler(Sampler):
+    """
+    The Halton low-discrepancy sequence: the radical inverse of the point index in the base of the i-th prime
+    for the i-th dimension, randomized with a random shift modulo 1 (Cranley-Patterson rotation).
+    """
+
+    PRIMES = (2, 3, 5, 7, 11, 13, 17, 19, 23, 29, 31, 37, 41, 43, 47, 53, 59, 61, 67, 71)
+
+    def __init__(self, shape: tuple):
+        super().__init__(shape)
+        if self.dimension > len(self.PRIMES):
+            raise ValueError('The Halton sampler supports up to ' + str(len(self.PRIMES)) + ' dimensions')
+        self.index = 1
+        self.shift = np.random.random_sample(self.dimension)
+
+    @staticmethod
+    def radical_inverse(indexes: np.ndarray, base: int) -> np.ndarray:
+        result = np.zeros(len(indexes))
+        fraction = 1.0 / base
+        indexes = indexes.copy()
+        while np.any(indexes > 0):
+            result += (indexes % base) * fraction
+            indexes //= base
+            fraction /= base
+        return result
+
+    def unit(self, n: int) -> np.ndarray:
+        indexes = np.arange(self.index, self.index + n, dtype=np.int64)
+        self.index += n
+        points = np.stack([self.radical_inverse(indexes, base) for base in self.PRIMES[:self.dimension]], axis=-1)
+        return (points + self.shift) % 1.0
+
+
+class SobolSampler(Sampler):
+    """
+    The Sobol low-discrepancy sequence, with the direction numbers of Joe and Kuo, randomized with a random digital shift.
+    The points are generated in Gray code order, in bulk.
+    """
+
+    BITS = 52
+    # (degree s, coefficients a, initial direction numbers m) of the primitive polynomials, from the second dimension on
+    DIRECTIONS = (
+        (1, 0, (1,)),
+        (2, 1, (1, 3)),
+        (3, 1, (1, 3, 1)),
+        (3, 2, (1, 1, 1)),
+        (4, 1, (1, 1, 3, 3)),
+        (4, 4, (1, 3, 5, 13)),
+        (5, 2, (1, 1, 5, 5, 17)),
+        (5, 4, (1, 1, 5, 5, 5)),
+        (5, 7, (1, 1, 7, 11, 19)),
+    )
+
+    def __init__(self, shape: tuple):
+        super().__init__(shape)
+        if self.dimension > len(self.DIRECTIONS) + 1:
+            raise ValueError('The Sobol sampler supports up to ' + str(len(self.DIRECTIONS) + 1) + ' dimensions')
+        self.directions = np.stack([self.direction_numbers(i) for i in range(self.dimension)])
+        self.index = 0
+        self.shift = np.random.randint(0, 2 ** self.BITS, size=self.dimension, dtype=np.uint64)
+
+    def direction_numbers(self, dimension: int) -> np.ndarray:
+        if dimension == 0:
+            m = [1] * self.BITS
+        else:
+            s, a, m = self.DIRECTIONS[dimension - 1]
+            m = list(m)
+            for k in range(s, self.BITS):
+                value = m[k - s] ^ (m[k - s] << s)
+                for j in range(1, s):
+                    if (a >> (s - 1 - j)) & 1:
+                        value ^= m[k - j] << j
+                m.append(value)
+        return np.array([m[k] << (self.BITS - 1 - k) for k in range(self.BITS)], dtype=np.uint64)
+
+    def unit(self, n: int) -> np.ndarray:
+        indexes = np.arange(self.index, self.index + n, dtype=np.uint64)
+        self.index += n
+        # the i-th point is the xor of the direction numbers of the bits set in the Gray code of i
+        gray = indexes ^ (indexes >> np.uint64(1))
+        points = np.zeros((n, self.dimension), dtype=np.uint64)
+        for bit in range(int(self.index).bit_length()):
+            points ^= np.where(((gray >> np.uint64(bit)) & np.uint64(1)).astype(bool)[:, None], self.directions[:, bit], 0)
+        return (points ^ self.shift).astype(np.float64) / 2.0 ** self.BITS
+
+
+class LatinHypercubeSampler(Sampler):
+    """
+    Latin hypercube sampling: each dimension is split in n strata, and each stratum of each dimension holds one point.
+    """
+
+    def unit(self, n: int) -> np.ndarray:
+        strata = np.stack([np.random.permutation(n) for _ in range(self.dimension)], axis=-1)
+        return (strata + np.random.random_sample((n, self.dimension))) / max(n, 1)
+
+
+class StratifiedSampler(Sampler):
+    """
+    Stratified (jittered) grid sampling: the space is split in a regular grid of k^d cells, with k^d <= n,
+    and each cell holds one uniform point. The remaining points are uniform.
+    """
+
+    def unit(self, n: int) -> np.ndarray:
+        k = int(np.floor(n ** (1 / self.dimension) + 1e-9))
+        cells = np.stack(np.unravel_index(np.arange(k ** self.dimension), (k,) * self.dimension), axis=-1)
+        grid = (cells + np.random.random_sample(cells.shape)) / max(k, 1)
+        rest = np.random.random_sample((n - len(grid), self.dimension))
+        return np.concatenate([grid, rest])[np.random.permutation(n)]
+
+
+SAMPLERS = {
+    'uniform': UniformSampler,
+    'halton': HaltonSampler,
+    'sobol': SobolSampler,
+    'latin_hypercube': LatinHypercubeSampler,
+    'stratified': StratifiedSampler,
+}
+
+
+def make_sampler(name: str, shape: tuple) -> Sampler:
+    """
+    :param name: the name of a sampler, one of SAMPLERS
+    :param shape: the dimensions of the space
+    :return: a new sampler
+    """
+    if name not in SAMPLERS:
+        raise ValueError('Unknown sampler ' + str(name) + ', expected one of ' + str(list(SAMPLERS)))
+    return SAMPLERS[name](shape)
+
+
+def batch_random_sampling(sim: QDSimulator, batch_size: int, clock: Clock = None, sampler: Sampler = None) -> tuple:
     """
     Given an N-dimensional tensor of floats, sample a batch of random float element from it.
-    Return a dict containing the indices of the sampled element and the element itself.
+    All the indices are drawn at once and sampled with a single bulk call to the simulator.
+    Duplicate draws are sampled only once.
 
     Parameters:
-    tensor (np.ndarray): a tensor of floats
-    batch_size (int): the number of elements to sample
+    sim (QDSimulator): the simulator to sample
+    batch_size (int): the number of elements to draw
+    clock (Clock): optional clock, ticked once per sampled element
+    sampler (Sampler): the strategy drawing the indices, defaults to uniform random indices
 
-    :return a dict such that each key, value pair contains:
-    a tuple of the indices of the sampled element as the key
-    the element itself as the value
+    :return a tuple containing:
+    an integer array of shape (n, d) with the unique sampled indices, n <= batch_size
+    an array of shape (n,) with the sampled elements
     """
-    # TODO parallelize this
-    return dict(random_sampling(sim) for _ in range(batch_size))
+    shape = sim.get_shape()
+    drawn = random_indices(shape, batch_size) if sampler is None else sampler.draw(batch_size)
+    indices = unique_indices(drawn, shape)
+    return indices, sim.sample_many(indices, clock)
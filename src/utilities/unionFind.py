@@ -0,0 +1,71 @@
+import numpy as np
+
+
+class UnionFind:
+    """
+    A disjoint-set forest of integer labels, with vectorized unions.
+
+    The parent array is kept flat: after each union every label points directly to the root of its set,
+    the smallest label of the set, so a find is a single array lookup.
+    """
+
+    def __init__(self, size: int = 0):
+        """
+        :param size: the initial number of labels, each in its own set
+        """
+        self.parent = np.arange(size, dtype=np.int64)
+
+    def __len__(self) -> int:
+        return len(self.parent)
+
+    def add(self, n: int) -> np.ndarray:
+        """
+        :param n: the number of new labels, each in its own set
+        :return: the new labels
+        """
+        labels = np.arange(len(self.parent), len(self.parent) + n, dtype=np.int64)
+        self.parent = np.concatenate([self.parent, labels])
+        return labels
+
+    def find(self, labels: np.ndarray) -> np.ndarray:
+        """
+        :param labels: an integer array of labels
+        :return: the roots of the sets of the labels
+        """
+        return self.parent[np.asarray(labels, dtype=np.int64)]
+
+    def union(self, a: np.ndarray, b: np.ndarray):
+        """
+        Merge the sets of the labels a[i] and b[i] for each i.
+
+        The roots are hooked to the smallest root of their pairs, then the paths are compressed by pointer jumping,
+        until all the pairs have the same root.
+
+        :param a: an integer array of labels
+        :param b: an integer array of labels of the same shape
+        """
+        a = np.asarray(a, dtype=np.int64).ravel()
+        b = np.asarray(b, dtype=np.int64).ravel()
+        while True:
+            root_a, root_b = self.parent[a], self.parent[b]
+            different = root_a != root_b
+            if not np.any(different):
+                return
+            a, b = a[different], b[different]
+            low = np.minimum(root_a[different], root_b[different])
+            high = np.maximum(root_a[different], root_b[different])
+            np.minimum.at(self.parent, high, low)
+            # compress the paths
+            while True:
+                grandparent = self.parent[self.parent]
+                if np.array_equal(grandparent, self.parent):
+                    break
+                self.parent = grandparent
+
+    def compact(self, labels: np.ndarray) -> np.ndarray:
+        """
+        :param labels: an integer array of labels
+        :return: the sets of the labels, numbered from 0 in the order of their roots
+        """
+        _, compact = np.unique(self.find(labels), return_inverse=True)
+        return compact.reshape(np.shape(labels))